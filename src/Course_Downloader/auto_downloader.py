@@ -1,4 +1,3 @@
-import yt_dlp
 import re
 import os
 import sys
@@ -26,6 +25,8 @@ def process_queue():
 
     print(f"📦 Found {len(queue_files)} course(s) in the queue. Starting batch download...\n")
 
+    import yt_dlp  # slow to import; skipped when the queue is empty
+
     # 3. Loop through every JSON file found
     for file_name in queue_files:
         file_path = os.path.join(queue_dir, file_name)
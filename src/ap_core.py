@@ -1,8 +1,18 @@
 # ap_core.py
 import os
+import json
+import time
+import platform
+import tempfile
 import subprocess
-from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+import ap_trace as trace
 
 # ---------- URL + path helpers ----------
 
@@ -33,29 +43,1187 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
+# ---------- Supervised ffmpeg ----------
+
+# The ffmpeg run_ffmpeg starts (a fake one can stand in for it)
+FFMPEG_BINARY = os.environ.get("AP_FFMPEG", "ffmpeg")
+# A run whose output time has not advanced for this long is killed and retried
+FFMPEG_STALL_SECONDS = float(os.environ.get("AP_FFMPEG_STALL", 120))
+FFMPEG_RETRIES = 2
+# Pause before retry n is FFMPEG_BACKOFF_SECONDS * 2**(n-1), at most FFMPEG_BACKOFF_MAX
+FFMPEG_BACKOFF_SECONDS = 5
+FFMPEG_BACKOFF_MAX = 120
+
+
+def configure_ffmpeg(stall_seconds: float = None, retries: int = None, binary: str = None):
+    """Overrides the run_ffmpeg defaults for this process (e.g. from CLI flags)."""
+    global FFMPEG_STALL_SECONDS, FFMPEG_RETRIES, FFMPEG_BINARY
+    if stall_seconds is not None:
+        FFMPEG_STALL_SECONDS = stall_seconds
+    if retries is not None:
+        FFMPEG_RETRIES = retries
+    if binary:
+        FFMPEG_BINARY = binary
+
+
+class FfmpegResult:
+    """
+    What run_ffmpeg did: true when ffmpeg finally exited with code 0, so
+    callers that only want success can keep using it as a bool.
+    """
+
+    def __init__(self):
+        self.ok = False
+        self.attempts = 0
+        self.stalls = 0
+        self.returncode = None
+        self.bytes = 0            # output file size, or ffmpeg's total_size
+        self.duration = 0.0       # wall seconds over all attempts
+        self.out_time = 0.0       # media seconds written by the last attempt
+        self.error = None
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return (f"FfmpegResult(ok={self.ok}, attempts={self.attempts}, stalls={self.stalls}, "
+                f"bytes={self.bytes}, duration={self.duration:.1f}, error={self.error!r})")
+
+
+def _kill_tree(proc):
+    """Kills ffmpeg and anything it started (wrapper scripts hold the pipes open otherwise)."""
+    if proc.poll() is None:
+        if os.name == "nt":
+            proc.kill()
+        else:
+            import signal
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                proc.kill()
+    proc.wait()
+
+
+def _read_progress(stream, state: dict):
+    """Follows ffmpeg's -progress key=value lines; notes when output time or size last moved."""
+    for line in stream:
+        key, _, value = line.strip().partition("=")
+        if key in ("out_time_us", "out_time_ms", "total_size") and value.isdigit():
+            value = int(value) / 1e6 if key != "total_size" else int(value)
+            field = "size" if key == "total_size" else "out_time"
+            if value > state[field]:
+                state[field] = value
+                state["advanced"] = time.time()
+
+
+def run_ffmpeg(cmd, output_path: str = None, stall_seconds: float = None, retries: int = None,
+               retry_errors: bool = False, quiet: bool = False) -> FfmpegResult:
+    """
+    Runs an ffmpeg command line under a watchdog.  ffmpeg reports its
+    progress on a pipe; when the output time and size stop advancing for
+    `stall_seconds` the process is killed and started again, after an
+    exponential backoff, up to `retries` more times.  Failed runs are
+    retried the same way only with `retry_errors` (network downloads;
+    an encode that failed once fails again).
+
+    cmd[0] == "ffmpeg" is replaced by FFMPEG_BINARY.  `output_path` is
+    removed before a retry and sized afterwards; `quiet` drops stderr.
+    """
+    stall_seconds = FFMPEG_STALL_SECONDS if stall_seconds is None else stall_seconds
+    retries = FFMPEG_RETRIES if retries is None else retries
+    binary = FFMPEG_BINARY if cmd[0] == "ffmpeg" else cmd[0]
+    full_cmd = [binary, "-nostdin", "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+
+    result = FfmpegResult()
+    started = time.time()
+    while True:
+        result.attempts += 1
+        state = {"out_time": 0.0, "size": 0, "advanced": time.time()}
+        stalled = False
+        first_byte = None
+        proc = subprocess.Popen(
+            full_cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL if quiet else None,
+            text=True,
+            errors="replace",
+            # Own process group, so a kill reaches the whole tree
+            start_new_session=os.name != "nt",
+        )
+        reader = threading.Thread(target=_read_progress, args=(proc.stdout, state), daemon=True)
+        reader.start()
+        try:
+            while True:
+                try:
+                    proc.wait(timeout=0.1)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                now = time.time()
+                if first_byte is None and output_path and trace.enabled() and _file_size(output_path) > 0:
+                    first_byte = now
+                    trace.record("ttfb", started, first_byte)
+                if stall_seconds and now - state["advanced"] > stall_seconds:
+                    stalled = True
+                    _kill_tree(proc)
+                    break
+        finally:
+            _kill_tree(proc)
+        reader.join(timeout=5)
+
+        result.returncode = proc.returncode
+        result.out_time = state["out_time"]
+        if stalled:
+            result.stalls += 1
+            result.error = f"stalled for {stall_seconds:g}s at {state['out_time']:.0f}s of output"
+        elif proc.returncode:
+            result.error = f"exit code {proc.returncode}"
+        else:
+            result.ok = True
+            result.error = None
+            break
+
+        if result.attempts > retries or not (stalled or retry_errors):
+            break
+        delay = min(FFMPEG_BACKOFF_MAX, FFMPEG_BACKOFF_SECONDS * 2 ** (result.attempts - 1))
+        print(f"    ⏸️ ffmpeg {result.error}; retry {result.attempts}/{retries} in {delay:g}s")
+        time.sleep(delay)
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+
+    result.duration = time.time() - started
+    result.bytes = _file_size(output_path) if output_path else state["size"]
+    return result
+
+
 # ---------- Download 240p from m3u8 ----------
 
-def download_with_ffmpeg(playlist_url: str, mp4_path: str) -> bool:
-    """HLS → MP4 via ffmpeg, stream copy."""
+def download_with_ffmpeg(playlist_url: str, mp4_path: str, fragmented: bool = False,
+                         retry_errors: bool = True):
+    """
+    HLS → MP4 via ffmpeg, stream copy, under the run_ffmpeg watchdog.
+    Returns its FfmpegResult (true on success).  With `fragmented`, see
+    download_fragmented: the file is playable while it downloads and an
+    interrupted download resumes where it stopped.  Callers with their own
+    retry loop pass retry_errors=False so only stalls are retried here.
+    """
+    if fragmented:
+        return download_fragmented(playlist_url, mp4_path)
+
     # Extract only the filename for display purposes
     file_name = os.path.basename(mp4_path)
     
     cmd = [
-        "ffmpeg", "-y",
+        FFMPEG_BINARY, "-y",
         "-loglevel", "warning",
         "-i", playlist_url,
         "-c", "copy",
         mp4_path,
     ]
+    with trace.span("download", host=urlparse(playlist_url).netloc) as span:
+        result = run_transfer(cmd, mp4_path, retry_errors=retry_errors)
+        span["bytes"] = result.bytes
+        span["attempts"] = result.attempts
+        if result:
+            # Using the extracted file_name here
+            print(f"    ✔ Created: {file_name}")
+        else:
+            span["status"] = "failed"
+            print("    ffmpeg failed:", result.error)
+        return result
+
+
+def run_transfer(cmd, output_path: str, retries: int = None, retry_errors: bool = True) -> FfmpegResult:
+    """
+    run_ffmpeg with the defaults of a download: stalled and, unless
+    retry_errors is off, failed transfers are retried.
+    """
+    return run_ffmpeg(cmd, output_path, retries=retries, retry_errors=retry_errors)
+
+
+# ---------- HLS playlists ----------
+
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class CancelledFetch(Exception):
+    """Raised inside the losing attempt of a hedged fetch."""
+
+
+class FetchCancel:
+    """
+    Cancellation shared by the attempts of one hedged fetch.  Works like a
+    threading.Event, and set() also shuts down the sockets the attempts
+    registered, so a loser blocked waiting for headers or for the next
+    bytes returns at once instead of holding its pool thread until the
+    socket timeout.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._sockets = []
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            _shutdown(sock)
+
+    def register(self, sock):
+        with self._lock:
+            if not self._event.is_set():
+                self._sockets.append(sock)
+                return
+        _shutdown(sock)
+
+
+def _shutdown(sock):
+    import socket
+
     try:
-        subprocess.run(cmd, check=True)
-        # Using the extracted file_name here
-        print(f"    ✔ Created: {file_name}")
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+def _cancellable_opener(cancel: FetchCancel):
+    """urllib opener whose connections register their socket with `cancel`."""
+    import http.client
+    import urllib.request
+
+    class Connection(http.client.HTTPConnection):
+        def connect(self):
+            super().connect()
+            cancel.register(self.sock)
+
+    class SecureConnection(http.client.HTTPSConnection):
+        def connect(self):
+            super().connect()
+            cancel.register(self.sock)
+
+    class Handler(urllib.request.HTTPHandler):
+        def http_open(self, req):
+            return self.do_open(Connection, req)
+
+    class SecureHandler(urllib.request.HTTPSHandler):
+        def https_open(self, req):
+            return self.do_open(SecureConnection, req, context=self._context)
+
+    return urllib.request.build_opener(Handler, SecureHandler)
+
+
+def http_get(url: str, timeout: float = 30, cancel=None,
+             chunk_size: int = 256 * 1024) -> bytes:
+    """
+    GET a URL into memory.  A set `cancel` (threading.Event or FetchCancel)
+    stops it before the request and between chunks; a FetchCancel also
+    aborts a read that is blocked on the socket.
+    """
+    import urllib.request  # pulls in http.client/ssl; only the python engine needs it
+
+    def check():
+        if cancel is not None and cancel.is_set():
+            raise CancelledFetch(url)
+
+    check()
+    req = urllib.request.Request(url, headers=HTTP_HEADERS)
+    open_url = _cancellable_opener(cancel).open if isinstance(cancel, FetchCancel) else urllib.request.urlopen
+    chunks = []
+    try:
+        with open_url(req, timeout=timeout) as resp:
+            while True:
+                check()
+                chunk = resp.read(chunk_size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except Exception:
+        # A shut down socket surfaces as a reset or an incomplete read
+        check()
+        raise
+    # ...or as an early end of a body without Content-Length
+    check()
+    return b"".join(chunks)
+
+
+class Playlist:
+    """The parts of an m3u8 (master or media) this project cares about."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.variants = []          # [(bandwidth, absolute url)] for master playlists
+        self.segments = []          # [{"uri", "duration", "seq"}]
+        self.target_duration = None
+        self.media_sequence = 0
+        self.endlist = False
+        self.encrypted = False      # EXT-X-KEY with a METHOD other than NONE
+        self.init_section = None    # EXT-X-MAP (fMP4 segments)
+
+    @property
+    def is_master(self) -> bool:
+        return bool(self.variants)
+
+    @property
+    def duration(self) -> float:
+        return sum(seg["duration"] for seg in self.segments)
+
+
+def _attributes(line: str) -> dict:
+    """KEY=value,KEY="quoted, value" -> dict."""
+    attrs = {}
+    rest = line.split(":", 1)[1] if ":" in line else ""
+    key, value, quoted, in_value = "", "", False, False
+    for ch in rest + ",":
+        if in_value:
+            if ch == '"':
+                quoted = not quoted
+            elif ch == "," and not quoted:
+                attrs[key.strip()] = value
+                key, value, in_value = "", "", False
+            else:
+                value += ch
+        elif ch == "=":
+            in_value = True
+        else:
+            key += ch
+    return attrs
+
+
+def parse_m3u8(text: str, url: str) -> Playlist:
+    playlist = Playlist(url)
+    pending_duration = None
+    pending_bandwidth = None
+    seq = 0
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-STREAM-INF"):
+            pending_bandwidth = int(_attributes(line).get("BANDWIDTH", 0) or 0)
+        elif line.startswith("#EXTINF:"):
+            pending_duration = float(line[len("#EXTINF:"):].split(",", 1)[0] or 0)
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist.target_duration = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            playlist.media_sequence = seq = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-ENDLIST"):
+            playlist.endlist = True
+        elif line.startswith("#EXT-X-KEY"):
+            playlist.encrypted = playlist.encrypted or _attributes(line).get("METHOD", "NONE") != "NONE"
+        elif line.startswith("#EXT-X-MAP"):
+            playlist.init_section = urljoin(url, _attributes(line).get("URI", ""))
+        elif line.startswith("#"):
+            continue
+        elif pending_bandwidth is not None:
+            playlist.variants.append((pending_bandwidth, urljoin(url, line)))
+            pending_bandwidth = None
+        else:
+            playlist.segments.append({
+                "uri": urljoin(url, line),
+                "duration": pending_duration or 0.0,
+                "seq": seq,
+            })
+            pending_duration = None
+            seq += 1
+
+    return playlist
+
+
+def fetch_playlist(url: str, timeout: float = 30) -> Playlist:
+    """Fetches a media playlist, following a master playlist to its first variant."""
+    playlist = parse_m3u8(http_get(url, timeout).decode("utf-8", "replace"), url)
+    if playlist.is_master:
+        playlist = parse_m3u8(http_get(playlist.variants[0][1], timeout).decode("utf-8", "replace"),
+                              playlist.variants[0][1])
+    return playlist
+
+
+# ---------- Hedged segment fetching ----------
+
+def mirror_url(url: str, primary_base: str, mirror: str) -> str:
+    """
+    Rewrites a segment URL onto a mirror.  A mirror with a path replaces the
+    playlist's base directory; a bare host (https://cdn2.example.com) only
+    swaps scheme and host.
+    """
+    m = urlparse(mirror)
+    if m.path.strip("/"):
+        if url.startswith(primary_base):
+            return mirror.rstrip("/") + "/" + url[len(primary_base):]
+        return url
+    return urlparse(url)._replace(scheme=m.scheme, netloc=m.netloc).geturl()
+
+
+class LatencyTracker:
+    """Rolling window of segment fetch times with percentile lookups."""
+
+    def __init__(self, window: int = 200, min_samples: int = 8):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class HedgedFetcher:
+    """
+    Fetches segments with tail-latency protection.  When an attempt runs
+    longer than the `percentile` of recent segment latencies, a duplicate
+    request is sent, rotating through the mirrors; the first response wins
+    and the others are cancelled.  Failed attempts fail over immediately.
+
+    With `workers` concurrent fetch() calls the pool gets room for every
+    attempt of every segment (workers * max_attempts), so a hedge never
+    queues behind the stuck attempts it is meant to bypass.
+    """
+
+    def __init__(self, primary_base: str, mirrors=None, percentile: float = 0.95,
+                 timeout: float = 30, max_attempts: int = None, pool_size: int = 16,
+                 min_delay: float = 0.05, workers: int = None):
+        self.primary_base = primary_base
+        self.mirrors = list(mirrors or [])
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.timeout = timeout
+        self.max_attempts = max_attempts or len(self.mirrors) + 2
+        self.latency = LatencyTracker()
+        self.hedges = 0
+        self.hedge_wins = 0
+        if workers:
+            pool_size = workers * self.max_attempts
+        self._pool = ThreadPoolExecutor(max_workers=pool_size)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def candidates(self, url: str):
+        return [url] + [mirror_url(url, self.primary_base, m) for m in self.mirrors]
+
+    def fetch(self, url: str) -> bytes:
+        urls = self.candidates(url)
+        cancel = FetchCancel()
+        started = time.monotonic()
+        attempts = []   # futures in launch order
+        pending = set()
+        last_error = None
+
+        def launch():
+            future = self._pool.submit(http_get, urls[len(attempts) % len(urls)], self.timeout, cancel)
+            attempts.append(future)
+            pending.add(future)
+
+        launch()
+        hedge_after = self.latency.percentile(self.percentile)
+        if hedge_after is not None:
+            hedge_after = max(hedge_after, self.min_delay)
+
+        while pending:
+            timeout = None
+            if hedge_after is not None and len(attempts) < self.max_attempts:
+                timeout = max(0.0, started + hedge_after * len(attempts) - time.monotonic())
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                with self._lock:
+                    self.hedges += 1
+                launch()
+                continue
+
+            for future in done:
+                pending.discard(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                cancel.set()
+                self.latency.add(time.monotonic() - started)
+                if future is not attempts[0]:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return data
+
+            if not pending and len(attempts) < self.max_attempts:
+                launch()
+
+        raise IOError(f"All {len(attempts)} attempt(s) failed for {url}: {last_error}")
+
+    def summary(self) -> str:
+        p50 = self.latency.percentile(0.5)
+        p99 = self.latency.percentile(0.99)
+        timing = f", p50 {p50:.2f}s / p99 {p99:.2f}s" if p50 is not None else ""
+        return f"{self.hedges} hedge(s), {self.hedge_wins} won{timing}"
+
+
+# ---------- Streaming remux ----------
+
+# Segments fetched ahead of the one being written, and the cap on the bytes
+# of finished segments waiting behind a slow one
+REORDER_WINDOW_PER_WORKER = 4
+REORDER_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _in_order(fetch, segments, workers: int, window: int = None, max_bytes: int = REORDER_MAX_BYTES):
+    """
+    Yields segment bodies in playlist order.  Up to `workers` fetches run at
+    once and at most `window` segments are in flight or waiting behind the
+    next one to be yielded; once the waiting bodies reach `max_bytes`, no
+    new fetch starts until the head arrives.  So memory stays bounded, and
+    a slow segment (or a slow consumer) holds the fetchers back.
+    """
+    window = max(window or workers * REORDER_WINDOW_PER_WORKER, workers)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        queue = deque()
+        segments = iter(segments)
+        exhausted = False
+
+        def buffered():
+            return sum(len(f.result()) for f in queue if f.done() and f.exception() is None)
+
+        try:
+            while True:
+                # A new fetch starts only when a worker is free and the window
+                # (segments and bytes) has room behind the head
+                running = sum(1 for f in queue if not f.done())
+                while (not exhausted and running < workers and len(queue) < window
+                       and buffered() < max_bytes):
+                    seg = next(segments, None)
+                    if seg is None:
+                        exhausted = True
+                        break
+                    queue.append(ex.submit(fetch, seg["uri"]))
+                    running += 1
+                if not queue:
+                    return
+                if queue[0].done():
+                    yield queue.popleft().result()
+                else:
+                    wait([f for f in queue if not f.done()], return_when=FIRST_COMPLETED)
+        finally:
+            # Consumer gone (error, Ctrl+C): don't fetch what nobody will write
+            for future in queue:
+                future.cancel()
+
+
+class RemuxPipe:
+    """
+    A long-running `ffmpeg -f mpegts -i pipe:0 -c copy` writing `path`.
+    Segments go to its stdin as they arrive, so the MP4 is the only thing
+    that touches the disk.  A full pipe blocks write(), which in turn holds
+    back the fetchers feeding it.
+    """
+
+    def __init__(self, path: str, movflags: str = None):
+        self.path = path
+        cmd = [
+            FFMPEG_BINARY, "-y",
+            "-loglevel", "warning",
+            "-f", "mpegts", "-i", "pipe:0",
+            "-c", "copy",
+        ]
+        if movflags:
+            cmd += ["-movflags", movflags]
+        self._proc = subprocess.Popen(cmd + ["-f", "mp4", path], stdin=subprocess.PIPE)
+
+    def write(self, data: bytes):
+        try:
+            self._proc.stdin.write(data)
+        except (BrokenPipeError, ValueError) as e:
+            raise IOError(f"ffmpeg stopped accepting segments (exit code {self._proc.poll()}): {e}")
+
+    def flush(self):
+        try:
+            self._proc.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def close(self) -> bool:
+        """Ends the input and waits for ffmpeg to finish the file; True on success."""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        return self._proc.wait() == 0
+
+    def abort(self):
+        if self._proc.poll() is None:
+            self._proc.kill()
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        self._proc.wait()
+
+
+def download_hls(playlist_url: str, mp4_path: str, mirrors=None, workers: int = 4,
+                 fragmented: bool = False, live: bool = False,
+                 stop: threading.Event = None, retry_errors: bool = True) -> bool:
+    """
+    HLS → MP4 with segments fetched by Python (hedged, with mirror
+    failover) and streamed in order into ffmpeg, which remuxes them with
+    stream copy as they arrive (no temporary .ts on disk).  Encrypted or fMP4
+    playlists are handed to download_with_ffmpeg unchanged.  `fragmented`
+    writes fragmented MP4 and resumes from an interrupted .part.mp4.
+    `live` follows a growing playlist until it ends or `stop` is set (see
+    download_live).  `retry_errors` is passed on to download_with_ffmpeg.
+    """
+    if live:
+        return download_live(playlist_url, mp4_path, mirrors=mirrors, workers=workers, stop=stop)
+
+    file_name = os.path.basename(mp4_path)
+    host = urlparse(playlist_url).netloc
+    try:
+        with trace.span("playlist", host=host):
+            playlist = fetch_playlist(playlist_url)
+    except Exception as e:
+        print(f"    Playlist fetch failed: {e}")
+        return False
+
+    if not playlist.endlist:
+        print(f"    ⚠️ {file_name}: playlist is still live (no #EXT-X-ENDLIST); only the current window is downloaded")
+    if playlist.encrypted or playlist.init_section:
+        return download_with_ffmpeg(playlist_url, mp4_path, fragmented=fragmented, retry_errors=retry_errors)
+
+    segments = playlist.segments
+    out_path, resume = partial_path_for(mp4_path), None
+    if fragmented:
+        resume = fragmented_resume_point(out_path, playlist)
+        if resume:
+            segments = segments[resume[1]:]
+            out_path = rest_path_for(mp4_path)
+
+    base = playlist.url.rsplit("/", 1)[0] + "/"
+    fetcher = HedgedFetcher(base, mirrors, workers=workers)
+    pipe = None
+    done = False
+
+    try:
+        # Inside the try: a missing ffmpeg is an OSError like any other
+        pipe = RemuxPipe(out_path, FRAGMENTED_MOVFLAGS if fragmented else None)
+        with trace.span("download", host=host, segments=len(segments)) as span:
+            span["bytes"] = 0
+            started = time.time()
+            for data in _in_order(fetcher.fetch, segments, workers):
+                if not span["bytes"]:
+                    trace.record("ttfb", started, time.time(), host=host)
+                pipe.write(data)
+                span["bytes"] += len(data)
+            span["hedges"], span["hedge_wins"] = fetcher.hedges, fetcher.hedge_wins
+
+        # ffmpeg has been remuxing all along; what is left is the trailer
+        with trace.span("mux") as span:
+            if not pipe.close():
+                raise IOError("ffmpeg could not remux the segments")
+            span["bytes"] = _file_size(out_path)
+        done = True
+        if fragmented:
+            if not finish_fragmented(mp4_path, resume):
+                return False
+        else:
+            os.replace(out_path, mp4_path)
+        print(f"    ✔ Created: {file_name} ({len(segments)} segments, {fetcher.summary()})")
+        return True
+    except IOError as e:
+        print("    HLS download failed:", e)
+        return False
+    finally:
+        fetcher.close()
+        if not done:
+            if pipe is not None:
+                pipe.abort()
+            # A fragmented part file is kept to resume from; anything else is garbage
+            if not fragmented and os.path.exists(out_path):
+                os.remove(out_path)
+
+
+# ---------- Fragmented MP4 output ----------
+
+# moov first with no samples, then one moof+mdat per keyframe: every
+# complete fragment on disk is playable, and nothing is rewritten at the end
+FRAGMENTED_MOVFLAGS = "+frag_keyframe+empty_moov+default_base_moof"
+
+
+def partial_path_for(mp4_path: str) -> str:
+    """'lecture.mp4' → 'lecture.part.mp4' (still opens in players while downloading)."""
+    return os.path.splitext(mp4_path)[0] + ".part.mp4"
+
+
+def rest_path_for(mp4_path: str) -> str:
+    return os.path.splitext(mp4_path)[0] + ".rest.mp4"
+
+
+def trim_torn_fragments(path: str) -> int:
+    """
+    Cuts a crashed fragmented MP4 back to its last complete moof+mdat pair
+    by walking the top-level boxes.  Returns the new size.
+    """
+    size = os.path.getsize(path)
+    good = pos = 0
+    pending_moof = False
+    with open(path, "rb") as f:
+        while pos + 8 <= size:
+            f.seek(pos)
+            header = f.read(16)
+            box_size = int.from_bytes(header[:4], "big")
+            box_type = header[4:8]
+            if box_size == 1:
+                box_size = int.from_bytes(header[8:16], "big")
+            if box_size < 8 or pos + box_size > size:
+                break
+            pos += box_size
+            if box_type == b"moof":
+                pending_moof = True
+            elif box_type == b"mdat" or not pending_moof:
+                pending_moof = False
+                good = pos
+    if good < size:
+        with open(path, "r+b") as f:
+            f.truncate(good)
+    return good
+
+
+def probe_start_time(path: str) -> float:
+    """First presentation timestamp in seconds (B-frame delay shifts it past 0)."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=start_time",
+        "-of", "csv=p=0",
+        path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+        return float(out) if out and out != "N/A" else 0.0
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return 0.0
+
+
+def fragmented_resume_point(part_path: str, playlist):
+    """
+    (outpoint, segment index) to continue an interrupted fragmented download
+    from, or None to start over.  The part file is kept up to the start of
+    the segment that was in flight (the outpoint, in the part file's own
+    timestamps); that segment is fetched again.
+    """
+    if not os.path.exists(part_path) or playlist.encrypted:
+        return None
+    trim_torn_fragments(part_path)
+    have = probe_duration(part_path)
+    if not have:
+        return None
+
+    start = 0.0
+    index = 0
+    for i, seg in enumerate(playlist.segments):
+        if start + seg["duration"] > have + 0.05:
+            break
+        start += seg["duration"]
+        index = i + 1
+    if index == 0 or index >= len(playlist.segments):
+        return None
+    return probe_start_time(part_path) + start, index
+
+
+def write_rest_playlist(playlist, first_index: int, path: str):
+    """Media playlist of the remaining segments, with absolute URIs."""
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{int(playlist.target_duration or 10)}",
+        f"#EXT-X-MEDIA-SEQUENCE:{playlist.segments[first_index]['seq']}",
+    ]
+    if playlist.init_section:
+        lines.append(f'#EXT-X-MAP:URI="{playlist.init_section}"')
+    for seg in playlist.segments[first_index:]:
+        lines += [f"#EXTINF:{seg['duration']:.6f},", seg["uri"]]
+    lines.append("#EXT-X-ENDLIST")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def finish_fragmented(mp4_path: str, resume) -> bool:
+    """
+    Moves a finished .part.mp4 into place.  After a resume, the kept part
+    (cut at the resume point) and the newly downloaded rest are joined
+    with the concat demuxer, stream copy.
+    """
+    part_path = partial_path_for(mp4_path)
+    if not resume:
+        os.replace(part_path, mp4_path)
+        return True
+
+    rest_path = rest_path_for(mp4_path)
+    list_path = mp4_path + ".concat.txt"
+    tmp_path = os.path.splitext(mp4_path)[0] + ".join.mp4"
+    quote = lambda p: os.path.abspath(p).replace("'", "'\\''")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write(f"file '{quote(part_path)}'\noutpoint {resume[0]:.6f}\nfile '{quote(rest_path)}'\n")
+    cmd = [
+        FFMPEG_BINARY, "-y",
+        "-loglevel", "warning",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-c", "copy",
+        "-movflags", FRAGMENTED_MOVFLAGS,
+        tmp_path,
+    ]
+    try:
+        with trace.span("mux", step="join") as span:
+            subprocess.run(cmd, check=True)
+            span["bytes"] = _file_size(tmp_path)
+        os.replace(tmp_path, mp4_path)
+        os.remove(part_path)
         return True
     except subprocess.CalledProcessError as e:
-        print("    ffmpeg failed:", e)
+        print("    Joining resumed download failed:", e)
+        return False
+    finally:
+        for leftover in (list_path, rest_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def download_fragmented(playlist_url: str, mp4_path: str) -> bool:
+    """
+    HLS → fragmented MP4 via ffmpeg, stream copy.  The download goes to
+    'name.part.mp4', which can be played (or copied) at any point; when it
+    finishes it is renamed, with no faststart pass.  If a .part.mp4 is
+    left from an earlier run, only the remaining segments are downloaded.
+    """
+    file_name = os.path.basename(mp4_path)
+    part_path = partial_path_for(mp4_path)
+    source, out_path, resume = playlist_url, part_path, None
+
+    if os.path.exists(part_path):
+        try:
+            with trace.span("playlist", host=urlparse(playlist_url).netloc):
+                playlist = fetch_playlist(playlist_url)
+            resume = fragmented_resume_point(part_path, playlist)
+        except Exception:
+            resume = None
+        if resume:
+            print(f"    ↻ Resuming {file_name} at {resume[0]:.0f}s (segment {resume[1]})")
+            source = mp4_path + ".rest.m3u8"
+            write_rest_playlist(playlist, resume[1], source)
+            out_path = rest_path_for(mp4_path)
+
+    cmd = [
+        FFMPEG_BINARY, "-y",
+        "-loglevel", "warning",
+        "-protocol_whitelist", "file,http,https,tcp,tls,crypto",
+        "-i", source,
+        "-c", "copy",
+        "-movflags", FRAGMENTED_MOVFLAGS,
+        out_path,
+    ]
+    try:
+        with trace.span("download", host=urlparse(playlist_url).netloc, resumed=bool(resume)) as span:
+            # No restarts from scratch here: a stalled attempt ends, and the
+            # caller's next attempt resumes from what reached the .part.mp4
+            result = run_transfer(cmd, out_path, retries=0)
+            span["bytes"] = result.bytes
+            span["attempts"] = result.attempts
+            if not result:
+                span["status"] = "failed"
+                print("    ffmpeg failed:", result.error)
+                return result
+        if not finish_fragmented(mp4_path, resume):
+            return False
+        print(f"    ✔ Created: {file_name}")
+        return result
+    finally:
+        if source != playlist_url and os.path.exists(source):
+            os.remove(source)
+
+
+# ---------- Live / event playlists ----------
+
+# A live capture without #EXT-X-ENDLIST stops once the playlist has not
+# grown for this many target durations (the stream is gone)
+LIVE_STALL_TARGETS = 6
+
+
+def _strong_last_modified(last_modified: str, date: str) -> bool:
+    """
+    Last-Modified has one-second resolution, so a playlist rewritten in the
+    same second as the response would look unchanged to If-Modified-Since.
+    Only a Last-Modified at least a second older than the Date is safe.
+    """
+    from email.utils import parsedate_to_datetime
+    try:
+        return (parsedate_to_datetime(date) - parsedate_to_datetime(last_modified)).total_seconds() >= 1
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def poll_playlist(url: str, validators: dict = None, timeout: float = 30):
+    """
+    Conditional GET of a media playlist.  Returns (Playlist, validators),
+    or (None, validators) when the server answers 304 Not Modified; pass
+    the validators back in on the next poll.
+    """
+    import urllib.request
+    import urllib.error
+
+    validators = validators or {}
+    headers = dict(HTTP_HEADERS)
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read()
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            date = resp.headers.get("Date")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, validators
+        raise
+
+    fresh = {}
+    if etag:
+        fresh["etag"] = etag
+    if last_modified and _strong_last_modified(last_modified, date):
+        fresh["last_modified"] = last_modified
+    return parse_m3u8(body.decode("utf-8", "replace"), url), fresh
+
+
+class LiveOutput:
+    """
+    A fragmented MP4 that grows segment by segment.  fMP4 segments already
+    are moof+mdat fragments and are appended as-is after the init section;
+    MPEG-TS goes through a RemuxPipe.
+    """
+
+    def __init__(self, path: str, init_data: bytes = None):
+        self.path = path
+        self._file = self._pipe = None
+        if init_data is not None:
+            self._file = open(path, "wb")
+            self._file.write(init_data)
+        else:
+            self._pipe = RemuxPipe(path, FRAGMENTED_MOVFLAGS)
+
+    def write(self, data: bytes):
+        # Flushed per segment, so the part file keeps up with the capture
+        if self._file is not None:
+            self._file.write(data)
+            self._file.flush()
+        else:
+            self._pipe.write(data)
+            self._pipe.flush()
+
+    def close(self) -> bool:
+        if self._file is not None:
+            self._file.close()
+            return True
+        return self._pipe.close()
+
+
+def download_live(playlist_url: str, mp4_path: str, mirrors=None, workers: int = 4,
+                  stall_targets: int = LIVE_STALL_TARGETS, stop: threading.Event = None) -> bool:
+    """
+    Captures a live or event playlist while it is still growing.  The media
+    playlist is polled every target duration (half that after an unchanged
+    poll, as the HLS spec asks) with conditional requests; only the newly
+    appended segments are fetched, concurrently, and appended in order to
+    'name.part.mp4', which plays at any point.  The capture ends at
+    #EXT-X-ENDLIST, when the playlist stops growing, or when `stop` is set,
+    and is then renamed into place.  Ctrl+C only reaches the main thread, so
+    a caller running captures in worker threads sets `stop` from there;
+    called directly, Ctrl+C stops the capture as well.
+    """
+    stop = stop or threading.Event()
+    file_name = os.path.basename(mp4_path)
+    host = urlparse(playlist_url).netloc
+    try:
+        with trace.span("playlist", host=host):
+            playlist = fetch_playlist(playlist_url)
+    except Exception as e:
+        print(f"    Playlist fetch failed: {e}")
         return False
 
+    if playlist.encrypted:
+        print("    Encrypted live playlist: leaving it to ffmpeg")
+        return download_with_ffmpeg(playlist_url, mp4_path, fragmented=True)
+
+    media_url = playlist.url
+    target = playlist.target_duration or 6.0
+    base = media_url.rsplit("/", 1)[0] + "/"
+    fetcher = HedgedFetcher(base, mirrors, workers=workers)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    part_path = partial_path_for(mp4_path)
+
+    # (segment, future, last poll that did not list it yet) in playlist order;
+    # written minus that poll bounds how far the capture trails the live edge
+    pending = deque()
+    lags = []
+    counts = {"written": 0, "lost": 0}
+    state = {"next_seq": playlist.segments[0]["seq"] if playlist.segments else playlist.media_sequence}
+
+    def enqueue(pl, seen):
+        """Queues the segments of `pl` not seen before; returns how many."""
+        if pl.segments and pl.segments[0]["seq"] > state["next_seq"]:
+            skipped = pl.segments[0]["seq"] - state["next_seq"]
+            counts["lost"] += skipped
+            print(f"    ⚠️ {skipped} segment(s) left the live window before they were fetched")
+        fresh = [seg for seg in pl.segments if seg["seq"] >= state["next_seq"]]
+        for seg in fresh:
+            pending.append((seg, pool.submit(fetcher.fetch, seg["uri"]), seen))
+        if pl.segments:
+            state["next_seq"] = max(state["next_seq"], pl.segments[-1]["seq"] + 1)
+        return len(fresh)
+
+    output = None
+    try:
+        init_data = fetcher.fetch(playlist.init_section) if playlist.init_section else None
+        output = LiveOutput(part_path, init_data)
+        print(f"    ● Capturing {file_name} (polling every {target:g}s)")
+
+        with trace.span("download", host=host, live=True) as span:
+            span["bytes"] = 0
+            # Segments already in the window are a backlog, not live arrivals
+            enqueue(playlist, None)
+            ended = playlist.endlist
+            validators = {}
+            now = time.monotonic()
+            last_poll = last_growth = now
+            next_poll = now + target
+
+            try:
+                while pending or not ended:
+                    if stop.is_set():
+                        raise KeyboardInterrupt
+                    while pending and pending[0][1].done():
+                        seg, future, seen = pending.popleft()
+                        try:
+                            data = future.result()
+                        except Exception as e:
+                            counts["lost"] += 1
+                            print(f"    ⚠️ Segment {seg['seq']} lost: {e}")
+                            continue
+                        output.write(data)
+                        span["bytes"] += len(data)
+                        counts["written"] += 1
+                        if seen is not None:
+                            lags.append(time.monotonic() - seen)
+
+                    now = time.monotonic()
+                    if not ended and now >= next_poll:
+                        added = 0
+                        try:
+                            with trace.span("playlist", host=host, live=True) as poll:
+                                fresh, validators = poll_playlist(media_url, validators)
+                                poll["changed"] = fresh is not None
+                            if fresh is not None:
+                                added = enqueue(fresh, last_poll)
+                                ended = fresh.endlist
+                        except Exception as e:
+                            print(f"    ⚠️ Playlist poll failed: {e}")
+                        last_poll = now
+                        if added:
+                            last_growth = now
+                        elif not ended and now - last_growth > stall_targets * target:
+                            print(f"    ⚠️ No new segments for {now - last_growth:.0f}s and no #EXT-X-ENDLIST; stopping")
+                            ended = True
+                        next_poll = now + (target if added else target / 2)
+                        continue
+
+                    if pending:
+                        wait([pending[0][1]], timeout=None if ended else max(0.0, next_poll - now))
+                    elif not ended:
+                        stop.wait(max(0.0, next_poll - now))
+            except KeyboardInterrupt:
+                print("    ⏹ Capture stopped; keeping what was recorded")
+                span["status"] = "stopped"
+
+            span["segments"], span["lost"] = counts["written"], counts["lost"]
+
+        ok = output.close()
+        output = None
+        if not ok or not counts["written"]:
+            print(f"    Live capture failed: {'ffmpeg remux error' if not ok else 'no segments'}")
+            return False
+        os.replace(part_path, mp4_path)
+
+        lag = f", at most {max(lags):.1f}s behind the live edge" if lags else ""
+        lost = f", {counts['lost']} lost" if counts["lost"] else ""
+        print(f"    ✔ Captured: {file_name} ({counts['written']} segments{lost}{lag})")
+        return True
+    except IOError as e:
+        print("    Live capture failed:", e)
+        return False
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        fetcher.close()
+        if output is not None:
+            output.close()
+
+
+# ---------- Download verification ----------
+
+# A download passes when its container duration is within this much of the
+# playlist's #EXTINF total (seconds, plus a fraction of the expected length)
+VERIFY_TOLERANCE_SECONDS = 2.0
+VERIFY_TOLERANCE_RATIO = 0.01
+
+
+def probe_duration(path: str):
+    """Container duration in seconds from ffprobe (header only, no decode), or None."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "csv=p=0",
+        path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+        return float(out) if out and out != "N/A" else None
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+
+def playlist_duration(playlist_url: str):
+    """Sum of #EXTINF values of the (first variant's) media playlist, or None."""
+    try:
+        playlist = fetch_playlist(playlist_url)
+    except Exception:
+        return None
+    return playlist.duration if playlist.segments else None
+
+
+def check_duration(duration, expected):
+    """(ok, detail) for a probed duration against the expected one (None = unknown)."""
+    if not duration:
+        return False, "unreadable or empty container"
+    if expected is None:
+        return True, f"{duration:.1f}s (no playlist duration to compare)"
+    allowed = VERIFY_TOLERANCE_SECONDS + VERIFY_TOLERANCE_RATIO * expected
+    if abs(duration - expected) > allowed:
+        return False, f"{duration:.1f}s but playlist says {expected:.1f}s"
+    return True, f"{duration:.1f}s of {expected:.1f}s"
+
 
 # ---------- Black-screen creation (reusable) ----------
 
@@ -74,14 +1242,177 @@ def get_black_output_path(input_path: str) -> str:
     return os.path.join(black_folder, black_name)
 
 
+# ---------- Black-screen encoder autotuning ----------
+
+# Chosen settings are cached per machine + ffmpeg version (+ CPU/GPU)
+ENCODER_CACHE_PATH = os.environ.get(
+    "AP_ENCODER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".ap_tools", "encoder_profiles.json"),
+)
+
+# Largest acceptable video bitrate for a black frame, and the synthetic
+# sample length every candidate encodes
+BLACK_MAX_KBPS = 4.0
+BLACK_SAMPLE_SECONDS = 120
+
+# (name, frame size, frame rate, ffmpeg video args)
+BLACK_CPU_CANDIDATES = [
+    ("x264 ultrafast 426x240@25", "426x240", 25, ["-c:v", "libx264", "-preset", "ultrafast"]),
+    ("x264 ultrafast still 426x240@5", "426x240", 5,
+     ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage", "-g", "300"]),
+    ("x264 ultrafast still 426x240@1", "426x240", 1,
+     ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage", "-g", "60"]),
+    ("x264 veryfast still 426x240@1", "426x240", 1,
+     ["-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage", "-g", "60"]),
+    ("x264 ultrafast still 256x144@1", "256x144", 1,
+     ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage", "-g", "60"]),
+]
+BLACK_GPU_CANDIDATES = [
+    ("nvenc p1 426x240@1", "426x240", 1, ["-c:v", "h264_nvenc", "-preset", "p1", "-g", "60"]),
+    ("nvenc fast 426x240@25", "426x240", 25, ["-c:v", "h264_nvenc", "-preset", "fast"]),
+]
+
+# Used when ffmpeg cannot be benchmarked at all (same as before autotuning)
+BLACK_FALLBACK = {
+    "name": "x264 ultrafast 426x240@25",
+    "size": "426x240",
+    "rate": 25,
+    "args": ["-c:v", "libx264", "-preset", "ultrafast"],
+}
+
+_encoder_lock = threading.Lock()
+_encoder_settings = {}
+
+
+# FFMPEG_BINARY -> its version line, asked once per process
+_ffmpeg_versions = {}
+
+
+def ffmpeg_version() -> str:
+    """First line of `ffmpeg -version` for FFMPEG_BINARY (asked once per process)."""
+    binary = FFMPEG_BINARY
+    if binary not in _ffmpeg_versions:
+        try:
+            out = subprocess.run([binary, "-version"], capture_output=True, text=True, check=True).stdout
+            _ffmpeg_versions[binary] = out.splitlines()[0] if out else "unknown"
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            _ffmpeg_versions[binary] = "unknown"
+    return _ffmpeg_versions[binary]
+
+
+def benchmark_black_encoder(size: str, rate: int, args, seconds: int = BLACK_SAMPLE_SECONDS):
+    """
+    Encodes `seconds` of synthetic black video with the given settings.
+    Returns (wall seconds, kbit/s) or None when the encoder fails.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "sample.mp4")
+        cmd = [
+            FFMPEG_BINARY, "-y",
+            "-loglevel", "error",
+            "-f", "lavfi", "-i", f"color=black:s={size}:r={rate}",
+            "-t", str(seconds),
+        ] + list(args) + ["-pix_fmt", "yuv420p", out]
+        started = time.perf_counter()
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+        elapsed = time.perf_counter() - started
+        return elapsed, os.path.getsize(out) * 8 / 1000 / seconds
+
+
+def tune_black_encoder(use_gpu: bool = False) -> dict:
+    """
+    Micro-benchmarks the candidate settings and returns the fastest one
+    whose bitrate is within BLACK_MAX_KBPS (the smallest if none is).
+    """
+    candidates = (BLACK_GPU_CANDIDATES if use_gpu else []) + BLACK_CPU_CANDIDATES
+    measured = []
+    for name, size, rate, args in candidates:
+        result = benchmark_black_encoder(size, rate, args)
+        if result is None:
+            print(f"    {name}: not available")
+            continue
+        elapsed, kbps = result
+        print(f"    {name}: {elapsed:.2f}s, {kbps:.2f} kbit/s")
+        measured.append({"name": name, "size": size, "rate": rate, "args": args,
+                         "seconds": round(elapsed, 3), "kbps": round(kbps, 3)})
+
+    if not measured:
+        return dict(BLACK_FALLBACK, measured=[])
+    fitting = [m for m in measured if m["kbps"] <= BLACK_MAX_KBPS]
+    best = min(fitting, key=lambda m: m["seconds"]) if fitting else min(measured, key=lambda m: m["kbps"])
+    return {
+        "name": best["name"],
+        "size": best["size"],
+        "rate": best["rate"],
+        "args": best["args"],
+        "measured": measured,
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _load_encoder_cache() -> dict:
+    try:
+        with open(ENCODER_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def black_length_args(source_path: str):
+    """
+    Output length for a black video over `source_path`'s audio.  At low
+    frame rates -shortest overshoots by several seconds (muxer
+    interleaving), so the probed duration is used when available.
+    """
+    duration = probe_duration(source_path)
+    return ["-t", f"{duration:.3f}"] if duration else ["-shortest"]
+
+
+def black_encoder_settings(use_gpu: bool = False, retune: bool = False) -> dict:
+    """
+    Settings ({name, size, rate, args}) for black-screen encodes.  Tuned
+    once per machine + ffmpeg version and kept in ENCODER_CACHE_PATH; every
+    later call (any thread, any run) reads the cached choice.
+    """
+    key = f"{platform.node()}|{ffmpeg_version()}|{'gpu' if use_gpu else 'cpu'}"
+    with _encoder_lock:
+        if key in _encoder_settings and not retune:
+            return _encoder_settings[key]
+
+        cache = _load_encoder_cache()
+        settings = None if retune else cache.get(key)
+        if settings is None:
+            print(f"⚙️ Tuning black-screen encoder ({'GPU + CPU' if use_gpu else 'CPU'}), one time per machine...")
+            settings = tune_black_encoder(use_gpu)
+            print(f"    → {settings['name']}")
+            cache[key] = settings
+            try:
+                os.makedirs(os.path.dirname(ENCODER_CACHE_PATH), exist_ok=True)
+                tmp_path = ENCODER_CACHE_PATH + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f, indent=2)
+                os.replace(tmp_path, ENCODER_CACHE_PATH)
+            except OSError as e:
+                print(f"    ⚠️ Could not save encoder profile: {e}")
+
+        _encoder_settings[key] = settings
+        return settings
+
+
 def create_black_video(
     input_path: str,
     overwrite: bool = False,
     use_gpu: bool = False,
-) -> None:
+    encoder: dict = None,
+):
     """
     Turn one video into black-screen + original audio.
     Can be called from downloader OR from a standalone CLI.
+    `encoder` pins the settings (as from black_encoder_settings) instead of
+    the tuned choice.  Returns the FfmpegResult, or None when skipped.
     """
     output_path = get_black_output_path(input_path)
 
@@ -96,44 +1427,246 @@ def create_black_video(
     print(f"\nSource : {input_path}")
     print(f"Black  : {output_path}")
 
-    codec = "libx264"
-    preset = "ultrafast"
-
-    if use_gpu:
-        # best-effort NVENC check (safe to ignore if fails)
-        try:
-            subprocess.run(
-                ["ffmpeg", "-h", "encoder=h264_nvenc"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=True,
-            )
-            codec = "h264_nvenc"
-            preset = "fast"
-            print("    Using GPU encoder h264_nvenc")
-        except Exception:
-            print("    h264_nvenc not available, falling back to libx264")
+    # Tuned once (GPU candidates only benchmarked with use_gpu), then cached
+    encoder = encoder or black_encoder_settings(use_gpu)
 
     cmd = [
-        "ffmpeg",
+        FFMPEG_BINARY,
         "-y",
         "-loglevel", "error",
         "-i", input_path,
-        "-f", "lavfi", "-i", "color=black:s=426x240:r=25",
+        "-f", "lavfi", "-i", f"color=black:s={encoder['size']}:r={encoder['rate']}",
         "-map", "1:v",
         "-map", "0:a",
-        "-shortest",
-        "-c:v", codec,
-        "-preset", preset,
+    ] + black_length_args(input_path) + encoder["args"] + [
+        "-pix_fmt", "yuv420p",
         "-c:a", "copy",
         output_path,
     ]
 
+    with trace.span("encode", codec=encoder["name"]) as span:
+        result = run_ffmpeg(cmd, output_path)
+        span["bytes"] = result.bytes
+        span["attempts"] = result.attempts
+        if result:
+            print("  ✔ Black-screen video created")
+        else:
+            span["status"] = "failed"
+            print("  ✖ ffmpeg failed:", result.error)
+    return result
+
+
+# ---------- Audio extraction ----------
+
+# Source audio codec -> container it can be stream-copied into
+AUDIO_COPY_CONTAINERS = {
+    "aac": ".m4a",
+    "opus": ".opus",
+    "mp3": ".mp3",
+    "vorbis": ".ogg",
+}
+
+# Re-encode settings per profile: (extension, ffmpeg audio args)
+AUDIO_ENCODE_PROFILES = {
+    # Same as the old extract_audio.ps1: VBR mp3, best quality
+    "mp3": (".mp3", ["-c:a", "libmp3lame", "-q:a", "0"]),
+    # Lectures: mono Opus tuned for voice, ~11 MB per hour
+    "speech": (".opus", ["-ac", "1", "-c:a", "libopus", "-b:a", "24k", "-application", "voip"]),
+}
+
+
+def probe_audio_codec(path: str):
+    """Codec name of the first audio stream (e.g. 'aac', 'opus'), or None."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name",
+        "-of", "csv=p=0",
+        path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    return out.strip().splitlines()[0] if out.strip() else None
+
+
+def is_up_to_date(output_path: str, input_path: str) -> bool:
+    return (
+        os.path.exists(output_path)
+        and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    )
+
+
+def extract_audio(input_path: str, profile: str = "auto", overwrite: bool = False):
+    """
+    Pull the audio track out of one video, next to the source.
+      auto   - stream copy when the codec fits a container (aac->.m4a,
+               opus->.opus, mp3->.mp3), otherwise re-encode like 'mp3'
+      mp3    - always re-encode to VBR mp3
+      speech - always re-encode to low-bitrate mono Opus
+    Skips when an output newer than the source already exists.
+    Returns the output path, or None on failure.
+    """
+    base, _ = os.path.splitext(input_path)
+
+    codec = probe_audio_codec(input_path) if profile == "auto" else None
+    if codec in AUDIO_COPY_CONTAINERS:
+        ext = AUDIO_COPY_CONTAINERS[codec]
+        audio_args = ["-c:a", "copy"]
+    else:
+        ext, audio_args = AUDIO_ENCODE_PROFILES["mp3" if profile == "auto" else profile]
+
+    output_path = base + ext
+    if not overwrite and is_up_to_date(output_path, input_path):
+        print(f"⏭️  Up to date: {output_path}")
+        return output_path
+
+    # Write under a temporary name so a crash never leaves a "current" half file
+    tmp_path = f"{base}.tmp{ext}"
+    cmd = [
+        FFMPEG_BINARY, "-y",
+        "-loglevel", "error",
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-vn",
+        *audio_args,
+        tmp_path,
+    ]
+
     try:
         subprocess.run(cmd, check=True)
-        print("  ✔ Black-screen video created")
+        os.replace(tmp_path, output_path)
+        mode = "copied" if audio_args == ["-c:a", "copy"] else "encoded"
+        print(f"🎵 Audio {mode}: {output_path}")
+        return output_path
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Audio extraction failed for {input_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+
+# ---------- Storage recompression ----------
+
+# Slide-and-voice lectures: low-motion video at a high CRF plus the speech
+# Opus track.  Each profile lists encoders in order of preference.
+RECOMPRESS_PROFILES = {
+    "hevc": [
+        ("libx265", ["-preset", "medium", "-crf", "30", "-tag:v", "hvc1"]),
+    ],
+    "av1": [
+        ("libsvtav1", ["-preset", "8", "-crf", "40", "-g", "300"]),
+        ("libaom-av1", ["-cpu-used", "8", "-row-mt", "1", "-crf", "40", "-b:v", "0", "-g", "300"]),
+    ],
+    "h264": [
+        ("libx264", ["-preset", "slow", "-crf", "30", "-tune", "stillimage"]),
+    ],
+}
+RECOMPRESS_AUDIO_ARGS = AUDIO_ENCODE_PROFILES["speech"][1]
+
+# Keep a recompressed file only when it saves at least this fraction
+RECOMPRESS_MIN_SAVING = 0.10
+
+# FFMPEG_BINARY -> encoder names, asked once per process
+_encoders = {}
+
+
+def available_encoders() -> set:
+    """Encoder names the FFMPEG_BINARY build offers (asked once per process)."""
+    binary = FFMPEG_BINARY
+    if binary not in _encoders:
+        try:
+            out = subprocess.run([binary, "-hide_banner", "-encoders"], capture_output=True, text=True).stdout
+        except FileNotFoundError:
+            out = ""
+        _encoders[binary] = {line.split()[1] for line in out.splitlines() if line[:1] == " " and len(line.split()) > 1}
+    return _encoders[binary]
+
+
+def recompress_encoder(profile: str):
+    """(encoder, args) of the first encoder of `profile` this ffmpeg has, or None."""
+    have = available_encoders()
+    return next(((enc, args) for enc, args in RECOMPRESS_PROFILES[profile] if enc in have), None)
+
+
+def _encoder_thread_args(encoder: str, threads: int):
+    """Caps one encode at `threads` threads (ffmpeg's -threads alone does not bind x265/SVT)."""
+    if not threads:
+        return []
+    args = ["-threads", str(threads)]
+    if encoder == "libx265":
+        args += ["-x265-params", f"pools={threads}:frame-threads={min(threads, 2)}:log-level=error"]
+    elif encoder == "libsvtav1":
+        args += ["-svtav1-params", f"lp={threads}"]
+    return args
+
+
+def recompress_path_for(input_path: str) -> str:
+    return os.path.splitext(input_path)[0] + ".recompress.mp4"
+
+
+def recompress_video(input_path: str, profile: str = "hevc", threads: int = 0) -> dict:
+    """
+    Re-encodes one finished video to `profile` next to the original.  The
+    original is only replaced once the new file's ffprobe duration matches
+    it and the file is meaningfully smaller.  Returns {status, before,
+    after, detail}; status is 'replaced', 'kept' (no worthwhile saving),
+    or 'failed'.
+    """
+    before = _file_size(input_path)
+    result = {"status": "failed", "before": before, "after": before, "detail": ""}
+    chosen = recompress_encoder(profile)
+    if chosen is None:
+        result["detail"] = f"this ffmpeg has no encoder for '{profile}'"
+        return result
+    encoder, encoder_args = chosen
+
+    expected = probe_duration(input_path)
+    if not expected:
+        result["detail"] = "original is unreadable"
+        return result
+
+    tmp_path = recompress_path_for(input_path)
+    cmd = [
+        FFMPEG_BINARY, "-y",
+        "-loglevel", "error",
+        "-i", input_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", encoder, *encoder_args,
+        "-pix_fmt", "yuv420p",
+        *_encoder_thread_args(encoder, threads),
+        *RECOMPRESS_AUDIO_ARGS,
+        "-movflags", "+faststart",
+        tmp_path,
+    ]
+    try:
+        with trace.span("encode", step="recompress", encoder=encoder) as span:
+            subprocess.run(cmd, check=True)
+            span["bytes"] = _file_size(tmp_path)
+
+        with trace.span("verify", step="recompress"):
+            ok, detail = check_duration(probe_duration(tmp_path), expected)
+        after = _file_size(tmp_path)
+        if not ok:
+            result["detail"] = f"duration check failed: {detail}"
+        elif after > before * (1 - RECOMPRESS_MIN_SAVING):
+            result.update(status="kept", detail=f"only {_pct(before, after)} smaller with {encoder}")
+        else:
+            # The original goes only now, after the check
+            os.replace(tmp_path, input_path)
+            result.update(status="replaced", after=after, detail=f"{encoder}, {_pct(before, after)} smaller, {detail}")
     except subprocess.CalledProcessError as e:
-        print("  ✖ ffmpeg failed:", e)
+        result["detail"] = f"ffmpeg failed: {e}"
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+
+def _pct(before: int, after: int) -> str:
+    return f"{100 * (before - after) / before:.0f}%" if before else "0%"
 
 
 # ---------- Generic parallel helper ----------
@@ -148,15 +1681,247 @@ def run_in_parallel(func, items, max_workers: int = 2):
                 print(f"❌ Error processing {futures[f]}: {e}")
 
 
+def run_streaming(func, items, max_workers: int = 2, queue_size: int = None, limiter=None,
+                  stop: threading.Event = None) -> int:
+    """
+    Like run_in_parallel, but `items` is consumed lazily: at most
+    `queue_size` (default 2 x workers) items are pulled ahead of the running
+    jobs.  The first job starts as soon as the first item is parsed and the
+    input never has to fit in memory.  Returns the number of items run.
+
+    With a ResizableLimiter, the limiter decides how many jobs run at once
+    (max_workers is then only the upper bound) and may change it mid-run.
+
+    Ctrl+C is only delivered to the main thread.  With `stop`, it sets the
+    event for the running jobs to see, drops the queued ones and waits for
+    the running ones to wind down instead of raising.
+    """
+    slots = limiter or threading.BoundedSemaphore(queue_size or max_workers * 2)
+    count = 0
+    running = set()
+
+    def finished(future, item):
+        running.discard(future)
+        slots.release()
+        if future.cancelled():
+            return
+        try:
+            future.result()
+        except Exception as e:
+            print(f"❌ Error processing {item}: {e}")
+
+    ex = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for item in items:
+            slots.acquire()
+            future = ex.submit(func, item)
+            running.add(future)
+            future.add_done_callback(lambda f, item=item: finished(f, item))
+            count += 1
+        ex.shutdown(wait=True)
+    except KeyboardInterrupt:
+        if stop is None:
+            raise
+        print("\n⏹ Stopping: finishing the running jobs (Ctrl+C again to abort)...")
+        stop.set()
+        ex.shutdown(wait=False, cancel_futures=True)
+        # Wait on the jobs themselves; the interrupted shutdown may not join again
+        wait(list(running))
+    finally:
+        ex.shutdown(wait=True)
+
+    return count
+
+
+# ---------- Throughput-driven autoscaling ----------
+
+class ResizableLimiter:
+    """A semaphore whose capacity can be changed while jobs are running."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+
+class ThroughputMonitor:
+    """
+    Measures aggregate download throughput by watching the output files of
+    in-flight jobs grow, and counts failed and stalled jobs.
+    """
+
+    def __init__(self, stall_seconds: float = 60):
+        self.stall_seconds = stall_seconds
+        self.completed_bytes = 0
+        self.errors = 0
+        self._jobs = {}  # path -> [last size, time it last grew, files written]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, path: str, *partials: str):
+        """
+        Wrap one download.  The body should set `job["ok"] = False` on
+        failure; an exception counts as a failure too.  `partials` are the
+        files written before `path` appears (.part.mp4, .rest.mp4); the
+        job's size is the sum of all of them.
+        """
+        job = {"ok": True}
+        paths = (path,) + partials
+        with self._lock:
+            self._jobs[path] = [0, time.monotonic(), paths]
+        try:
+            yield job
+        except Exception:
+            job["ok"] = False
+            raise
+        finally:
+            size = sum(_file_size(p) for p in paths)
+            with self._lock:
+                self._jobs.pop(path, None)
+                self.completed_bytes += size
+                if not job["ok"]:
+                    self.errors += 1
+
+    def sample(self):
+        """(total bytes so far, error count, number of stalled jobs)."""
+        now = time.monotonic()
+        with self._lock:
+            in_flight = 0
+            stalled = 0
+            for state in self._jobs.values():
+                size = sum(_file_size(p) for p in state[2])
+                if size > state[0]:
+                    state[0], state[1] = size, now
+                elif now - state[1] > self.stall_seconds:
+                    stalled += 1
+                in_flight += size
+            return self.completed_bytes + in_flight, self.errors, stalled
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class AutoScaler(threading.Thread):
+    """
+    Hill-climbs the limiter's concurrency toward peak throughput.  Every
+    `interval` seconds the bytes/sec seen at the current level is recorded;
+    an unmeasured neighbour level is explored, otherwise the scaler moves to
+    whichever neighbour is clearly faster, or stays put at a peak.  Failed
+    or stalled jobs (CDN throttling, disk thrash) back off one step at once.
+    Measurements expire after `memory` intervals so the climb restarts when
+    conditions change.  Every decision is logged.
+    """
+
+    def __init__(self, limiter, monitor, min_workers: int, max_workers: int,
+                 interval: float = 20, tolerance: float = 0.05, memory: int = 10, log=None):
+        super().__init__(daemon=True)
+        self.limiter = limiter
+        self.monitor = monitor
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.interval = interval
+        self.tolerance = tolerance
+        self.memory = memory
+        self.log = log or _autoscale_log
+        self.rates = {}  # level -> (smoothed bytes/sec, window number)
+        self._window = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def decide(self, limit, rate, new_errors, stalled):
+        """Returns (new limit, reason)."""
+        if new_errors or stalled:
+            self.rates.pop(limit, None)
+            return max(self.min_workers, limit - 1), f"{new_errors} failed / {stalled} stalled job(s)"
+        if self.limiter.active < limit:
+            return limit, "not saturated (queue drained or starting up)"
+
+        old = self.rates.get(limit)
+        smoothed = rate if old is None else 0.5 * old[0] + 0.5 * rate
+        self.rates[limit] = (smoothed, self._window)
+        self.rates = {
+            level: (r, w) for level, (r, w) in self.rates.items()
+            if self._window - w < self.memory
+        }
+
+        up, down = limit + 1, limit - 1
+        if self._faster(down, limit):
+            return down, f"{down} worker(s) measured faster"
+        if up <= self.max_workers and up not in self.rates:
+            return up, "exploring upward"
+        if self._faster(up, limit):
+            return up, f"{up} worker(s) measured faster"
+        if down >= self.min_workers and down not in self.rates:
+            return down, "exploring downward"
+        return limit, "at peak"
+
+    def _faster(self, level, than):
+        return (
+            level in self.rates
+            and self.rates[level][0] > self.rates[than][0] * (1 + self.tolerance)
+        )
+
+    def run(self):
+        last_bytes, last_errors, _ = self.monitor.sample()
+        last_time = time.monotonic()
+
+        while not self._stop_event.wait(self.interval):
+            self._window += 1
+            total, errors, stalled = self.monitor.sample()
+            now = time.monotonic()
+            rate = (total - last_bytes) / (now - last_time)
+
+            old_limit = self.limiter.limit
+            new_limit, reason = self.decide(old_limit, rate, errors - last_errors, stalled)
+            if new_limit != old_limit:
+                self.limiter.set_limit(new_limit)
+
+            self.log(rate, self.limiter.active, errors - last_errors, stalled, old_limit, new_limit, reason)
+            last_bytes, last_errors, last_time = total, errors, now
+
+
+def _autoscale_log(rate, active, errors, stalled, old_limit, new_limit, reason):
+    stamp = datetime.now().strftime("%H:%M:%S")
+    change = f"{old_limit} → {new_limit}" if new_limit != old_limit else f"stay at {old_limit}"
+    print(
+        f"[{stamp}] ⚖️ autoscale: {rate / (1024 * 1024):.2f} MB/s, {active} active, "
+        f"{errors} error(s), {stalled} stalled → {change} worker(s) ({reason})"
+    )
+
 
 def create_black_video_from_audio(
     path: str,
     overwrite: bool = False,
     use_gpu: bool = False,
+    encoder: dict = None,
 ):
     """
     Convert an audio file (.opus) into a black video with silent audio.
     Output: audio.opus -> audio_black.mp4
+    `encoder` pins the settings instead of the tuned choice.
+    Returns the FfmpegResult, or None when skipped.
     """
 
     base, _ = os.path.splitext(path)
@@ -166,30 +1931,30 @@ def create_black_video_from_audio(
         print(f"⏭️  Skipping (exists): {output}")
         return
 
-    video_filter = "color=c=black:s=1280x720:r=30"
+    encoder = encoder or black_encoder_settings(use_gpu)
+    video_filter = f"color=c=black:s={encoder['size']}:r={encoder['rate']}"
 
     cmd = [
-        "ffmpeg",
+        FFMPEG_BINARY,
         "-y" if overwrite else "-n",
         "-f", "lavfi",
         "-i", video_filter,   # black video source
         "-i", path,           # audio input
-        "-shortest",          # match audio duration
         "-map", "0:v:0",
         "-map", "1:a:0",
-        "-c:v", "libx264",
+    ] + black_length_args(path) + encoder["args"] + [
         "-pix_fmt", "yuv420p",
         "-c:a", "aac",
         output,
     ]
 
-    try:
-        subprocess.run(
-            cmd,
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        print(f"⬛ Black video created from audio: {output}")
-    except subprocess.CalledProcessError:
-        print(f"❌ Failed to process audio: {path}")
\ No newline at end of file
+    with trace.span("encode", codec=encoder["name"]) as span:
+        result = run_ffmpeg(cmd, output, quiet=True)
+        span["bytes"] = result.bytes
+        span["attempts"] = result.attempts
+        if result:
+            print(f"⬛ Black video created from audio: {output}")
+        else:
+            span["status"] = "failed"
+            print(f"❌ Failed to process audio: {path} ({result.error})")
+    return result
\ No newline at end of file
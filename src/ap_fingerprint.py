@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+"""
+Duplicate lecture detection by audio fingerprint.
+
+The same lecture often lands under two course folders with two names.  Each
+video's audio is decoded once at a low sample rate (4 kHz mono, in a process
+pool) and reduced to a compact fingerprint: 4 frames per second, 3 bits per
+frame, each bit the sign of how the energy balance between two neighbouring
+speech bands changed since the previous frame.  Re-encodes, other bitrates
+and other resolutions of the same recording give nearly the same bits.
+
+Fingerprints live in a SQLite index in the library root, with short runs of
+frames from the start of every file as lookup keys, so a file or a download
+is only compared bit by bit with the few lectures that share a key.
+
+USAGE EXAMPLES:
+---------------
+1. Fingerprint new/changed videos and list duplicates:
+   python ap_fingerprint.py report
+
+2. Replace duplicates by hardlinks to one copy (per drive and extension):
+   python ap_fingerprint.py link
+
+3. Skip lectures already in the library while downloading (checks the
+   first 2 minutes of each stream before fetching the rest):
+   python downloader.py --file list.txt --folder course --skip-duplicates
+
+Note: Requires 'ffmpeg' installed in system PATH.
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+OUTPUT_ROOT = "output_videos"
+DB_FILENAME = ".fingerprints.sqlite"
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".m4v", ".webm", ".ts")
+# Downloads in progress and tool temporaries
+SKIP_SUFFIXES = (".part.mp4", ".rest.mp4", ".join.mp4", ".recompress.mp4")
+
+SAMPLE_RATE = 4000
+FRAME_SAMPLES = 1000                     # 0.25 s per frame
+FRAME_SECONDS = FRAME_SAMPLES / SAMPLE_RATE
+BANDS = [(150, 400), (400, 900), (900, 1500), (1500, 1900)]
+SILENCE_DB = -120.0
+
+# Lookup keys: runs of KEY_FRAMES frames, taken from the first PREFIX_SECONDS.
+# Short runs survive bit errors; a candidate needs MIN_VOTES keys agreeing
+# on the same alignment before it is compared bit by bit.
+KEY_FRAMES = 4
+MIN_VOTES = 2
+PREFIX_SECONDS = 120
+PREFIX_FRAMES = int(PREFIX_SECONDS / FRAME_SECONDS)
+
+# Unrelated audio differs in about half the bits, a low-bitrate re-encode in under a fifth
+MATCH_MAX_BER = 0.25
+# Whole files count as duplicates only when their lengths are this close
+MIN_LENGTH_RATIO = 0.9
+
+_POPCOUNT = [bin(i).count("1") for i in range(1 << (len(BANDS) - 1))]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,   -- relative to the library root, '/' separated
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    frames      INTEGER,
+    codes       BLOB,               -- one byte (3 bits) per frame
+    error       TEXT,
+    scanned_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keys (
+    key         INTEGER NOT NULL,
+    pos         INTEGER NOT NULL,   -- first frame of the run
+    path        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS keys_key ON keys(key);
+CREATE INDEX IF NOT EXISTS keys_path ON keys(path);
+"""
+
+
+# ---------- Fingerprints ----------
+
+def _filter_graph() -> str:
+    n = len(BANDS)
+    split = "".join(f"[s{i}]" for i in range(n))
+    bands = "".join(
+        f"[s{i}]bandpass=f={(lo + hi) / 2:g}:width_type=h:w={hi - lo}[b{i}];"
+        for i, (lo, hi) in enumerate(BANDS)
+    )
+    merged = "".join(f"[b{i}]" for i in range(n))
+    return (
+        f"[0:a:0]aresample={SAMPLE_RATE},aformat=channel_layouts=mono,asplit={n}{split};{bands}"
+        f"{merged}amerge=inputs={n},asetnsamples=n={FRAME_SAMPLES}:p=0,"
+        "astats=metadata=1:reset=1:measure_perchannel=RMS_level:measure_overall=none,"
+        "ametadata=mode=print:file=-"
+    )
+
+
+def band_levels(source: str, seconds: float = None):
+    """
+    Per-frame RMS level (dB) of each band, computed by ffmpeg from a low
+    sample rate decode.  `source` is a file or a URL (an HLS playlist
+    included); `seconds` reads only the start of it.  Raises RuntimeError
+    when ffmpeg fails (no audio stream, unreachable URL, ...).
+    """
+    cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+    if seconds:
+        cmd += ["-t", str(seconds)]
+    cmd += ["-i", source, "-filter_complex", _filter_graph(), "-f", "null", "-"]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode:
+        lines = proc.stderr.strip().splitlines()
+        if lines and "matches no streams" in lines[-1]:
+            raise RuntimeError("no audio stream")
+        raise RuntimeError(lines[-1] if lines else f"ffmpeg exit code {proc.returncode}")
+    out = proc.stdout
+
+    frames = []
+    for line in out.splitlines():
+        if line.startswith("frame:"):
+            frames.append([SILENCE_DB] * len(BANDS))
+        elif line.startswith("lavfi.astats.") and frames:
+            key, _, value = line.partition("=")
+            band = int(key.split(".")[2]) - 1
+            frames[-1][band] = max(SILENCE_DB, float(value))
+    return frames
+
+
+def fingerprint(source: str, seconds: float = None) -> bytes:
+    """One byte per frame (after the first): bit b is set when band b gained on band b+1."""
+    levels = band_levels(source, seconds)
+    codes = bytearray()
+    for prev, cur in zip(levels, levels[1:]):
+        code = 0
+        for b in range(len(BANDS) - 1):
+            if (cur[b] - cur[b + 1]) - (prev[b] - prev[b + 1]) > 0:
+                code |= 1 << b
+        codes.append(code)
+    return bytes(codes)
+
+
+def bit_error_rate(a: bytes, b: bytes, offset: int = 0):
+    """
+    (share of differing bits, frames compared) with frame i of `a` lined
+    up against frame i + offset of `b`.
+    """
+    pairs = zip(a[max(0, -offset):], b[max(0, offset):])
+    frames = errors = 0
+    for x, y in pairs:
+        errors += _POPCOUNT[x ^ y]
+        frames += 1
+    if not frames:
+        return 1.0, 0
+    return errors / (frames * (len(BANDS) - 1)), frames
+
+
+def lookup_keys(codes: bytes, step: int):
+    """(key, frame) for runs of KEY_FRAMES in the first PREFIX_FRAMES; silence and steady tones carry none."""
+    end = min(len(codes), PREFIX_FRAMES) - KEY_FRAMES + 1
+    for pos in range(0, max(0, end), step):
+        run = codes[pos:pos + KEY_FRAMES]
+        if run.count(run[0]) != KEY_FRAMES:
+            yield int.from_bytes(run, "big"), pos
+
+
+def _fingerprint_job(path: str) -> bytes:
+    """Process pool entry point."""
+    return fingerprint(path)
+
+
+# ---------- Index ----------
+
+class FingerprintIndex:
+    """The fingerprint catalog of one library.  Safe to share between threads."""
+
+    def __init__(self, root: str = OUTPUT_ROOT, db_path: str = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or os.path.join(self.root, DB_FILENAME)
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM files WHERE codes IS NOT NULL").fetchone()[0]
+
+    def abspath(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split("/"))
+
+    # ----- scanning -----
+
+    def _walk(self):
+        """Yields (rel path, size, mtime) of every finished lecture video; black and partial files are skipped."""
+        for dirpath, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d != "black" and not d.startswith(".")]
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            for f in files:
+                low = f.lower()
+                if f.startswith(".") or "_black" in f or not low.endswith(VIDEO_EXTENSIONS) or low.endswith(SKIP_SUFFIXES):
+                    continue
+                st = os.stat(os.path.join(dirpath, f))
+                rel = f if rel_dir == "." else f"{rel_dir}/{f}"
+                yield rel, st.st_size, st.st_mtime
+
+    def _store(self, rel: str, size: int, mtime: float, codes: bytes = None, error: str = None):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, frames, codes, error, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (rel, size, mtime, len(codes) if codes else None, codes, error, time.time()),
+            )
+            self.db.execute("DELETE FROM keys WHERE path = ?", (rel,))
+            if codes:
+                self.db.executemany(
+                    "INSERT INTO keys (key, pos, path) VALUES (?, ?, ?)",
+                    [(key, pos, rel) for key, pos in lookup_keys(codes, KEY_FRAMES)],
+                )
+
+    def _forget(self, rels):
+        with self._lock, self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(rel,) for rel in rels])
+            self.db.executemany("DELETE FROM keys WHERE path = ?", [(rel,) for rel in rels])
+
+    def scan(self, workers: int = 4) -> dict:
+        """
+        Syncs the index with the disk.  Only new or changed files (size or
+        mtime) are decoded, `workers` at a time in separate processes.
+        """
+        known = {
+            row["path"]: (row["size"], row["mtime"])
+            for row in self.db.execute("SELECT path, size, mtime FROM files")
+        }
+        seen = {}
+        for rel, size, mtime in self._walk():
+            seen[rel] = (size, mtime)
+        self._forget([rel for rel in known if rel not in seen])
+        changed = [rel for rel, stat in seen.items() if known.get(rel) != stat]
+
+        failed = 0
+        if changed:
+            print(f"🎧 Fingerprinting {len(changed)} new/changed file(s) with {workers} process(es)...")
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                futures = {ex.submit(_fingerprint_job, self.abspath(rel)): rel for rel in changed}
+                for f in as_completed(futures):
+                    rel = futures[f]
+                    size, mtime = seen[rel]
+                    try:
+                        self._store(rel, size, mtime, f.result())
+                    except Exception as e:
+                        failed += 1
+                        print(f"⚠️ Could not fingerprint {rel}: {e}")
+                        self._store(rel, size, mtime, error=str(e)[:500])
+        return {"files": len(seen), "changed": len(changed), "removed": len(set(known) - set(seen)), "failed": failed}
+
+    def add(self, rel: str) -> bool:
+        """Fingerprints one file (e.g. a finished download) into the index."""
+        path = self.abspath(rel)
+        try:
+            st = os.stat(path)
+            self._store(rel, st.st_size, st.st_mtime, fingerprint(path))
+            return True
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Could not fingerprint {rel}: {e}")
+            return False
+
+    # ----- matching -----
+
+    def codes(self, rel: str):
+        with self._lock:
+            row = self.db.execute("SELECT codes FROM files WHERE path = ?", (rel,)).fetchone()
+        return row["codes"] if row else None
+
+    def _key_rows(self, key: int):
+        with self._lock:
+            return self.db.execute("SELECT pos, path FROM keys WHERE key = ?", (key,)).fetchall()
+
+    def match(self, codes: bytes, exclude: str = None, lookup=None):
+        """
+        [(rel path, bit error rate, frames compared, offset)] of indexed
+        files whose audio lines up with `codes` (a whole file or just its
+        start), best first.  `lookup(key)` → [(pos, path)] defaults to the
+        database; duplicate_groups passes an in-memory table.
+        """
+        lookup = lookup or self._key_rows
+        votes = {}
+        for key, j in lookup_keys(codes, 1):
+            for pos, path in lookup(key):
+                if path != exclude:
+                    votes[(path, pos - j)] = votes.get((path, pos - j), 0) + 1
+
+        best_offset = {}
+        for (path, offset), count in votes.items():
+            if count >= MIN_VOTES and count > best_offset.get(path, (0, 0))[1]:
+                best_offset[path] = (offset, count)
+
+        matches = []
+        for path, (offset, _) in best_offset.items():
+            other = self.codes(path)
+            if not other:
+                continue
+            ber, frames = min(
+                (bit_error_rate(codes, other, o) for o in (offset - 1, offset, offset + 1)),
+                key=lambda r: r[0],
+            )
+            if ber <= MATCH_MAX_BER and frames >= 0.9 * min(len(codes), len(other)):
+                matches.append((path, ber, frames, offset))
+        matches.sort(key=lambda m: m[1])
+        return matches
+
+    def match_url(self, url: str, exclude: str = None, expected: float = None):
+        """
+        Fingerprints the first PREFIX_SECONDS of a stream and returns the
+        indexed lecture it duplicates, or None.  A match must also be about
+        as long as the stream (`expected` seconds, when known) still on disk.
+        """
+        codes = fingerprint(url, seconds=PREFIX_SECONDS)
+        for path, ber, frames, offset in self.match(codes, exclude=exclude):
+            if not os.path.exists(self.abspath(path)):
+                continue
+            if expected:
+                length = len(self.codes(path)) * FRAME_SECONDS
+                if min(length, expected) / max(length, expected) < MIN_LENGTH_RATIO:
+                    continue
+            return path
+        return None
+
+    def duplicate_groups(self):
+        """Lists of rel paths holding the same lecture, biggest group first."""
+        table = {}
+        for row in self.db.execute("SELECT key, pos, path FROM keys"):
+            table.setdefault(row["key"], []).append((row["pos"], row["path"]))
+        rows = self.db.execute("SELECT path, codes FROM files WHERE codes IS NOT NULL ORDER BY path").fetchall()
+        # With --no-scan the index may still list files deleted since
+        rows = [row for row in rows if os.path.exists(self.abspath(row["path"]))]
+
+        parent = {row["path"]: row["path"] for row in rows}
+
+        def find(p):
+            while parent[p] != p:
+                parent[p] = parent[parent[p]]
+                p = parent[p]
+            return p
+
+        for row in rows:
+            codes = row["codes"]
+            for path, _, _, _ in self.match(codes, exclude=row["path"], lookup=lambda k: table.get(k, ())):
+                if path not in parent:
+                    continue
+                other = len(self.codes(path))
+                if min(other, len(codes)) / max(other, len(codes)) >= MIN_LENGTH_RATIO:
+                    parent[find(path)] = find(row["path"])
+
+        groups = {}
+        for path in parent:
+            groups.setdefault(find(path), []).append(path)
+        return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+    # ----- hardlinks -----
+
+    def link_group(self, group) -> int:
+        """
+        Replaces the copies in `group` by hardlinks to the biggest copy with
+        the same extension (a .mkv never ends up behind a .mp4 name).
+        Copies on another drive are left alone.  Returns the bytes freed.
+        """
+        stats = {rel: os.stat(self.abspath(rel)) for rel in group}
+        keepers = {}
+        for rel in sorted(group, key=lambda rel: (-stats[rel].st_size, len(rel))):
+            keepers.setdefault(os.path.splitext(rel)[1].lower(), rel)
+
+        freed = 0
+        for rel in group:
+            keeper = keepers[os.path.splitext(rel)[1].lower()]
+            st, keep_st = stats[rel], stats[keeper]
+            if rel == keeper or (st.st_dev, st.st_ino) == (keep_st.st_dev, keep_st.st_ino):
+                continue
+            if st.st_dev != keep_st.st_dev:
+                print(f"   ⏭️  {rel}: on another drive than {keeper}")
+                continue
+            path = self.abspath(rel)
+            tmp_path = path + ".link.tmp"
+            try:
+                os.link(self.abspath(keeper), tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"   ❌ {rel}: {e}")
+                continue
+            freed += st.st_size
+            new_st = os.stat(path)
+            self._store(rel, new_st.st_size, new_st.st_mtime, self.codes(keeper))
+            print(f"   🔗 {rel} → {keeper}")
+        if len(keepers) > 1:
+            print(f"   ⏭️  Kept one copy per container: {', '.join(sorted(keepers.values()))}")
+        return freed
+
+
+# ---------- Report ----------
+
+def _fmt_size(n: float) -> str:
+    return f"{n / 1024 ** 3:.2f} GB" if n >= 1024 ** 3 else f"{n / 1024 ** 2:.1f} MB"
+
+
+def print_groups(index: FingerprintIndex, groups):
+    if not groups:
+        print("✅ No duplicate lectures found.")
+        return
+    wasted = 0
+    print(f"\n👯 {len(groups)} lecture(s) stored more than once:")
+    for group in groups:
+        inodes = {}
+        for rel in group:
+            st = os.stat(index.abspath(rel))
+            inodes.setdefault((st.st_dev, st.st_ino), st.st_size)
+        extra = sum(inodes.values()) - max(inodes.values())
+        wasted += extra
+        linked = "" if len(inodes) > 1 else "  (already hardlinked)"
+        print(f"   • {len(group)} copies, {_fmt_size(extra)} extra{linked}")
+        for rel in group:
+            print(f"       {rel}")
+    print(f"\n💾 Space taken by the extra copies: {_fmt_size(wasted)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find lectures stored more than once by their audio.")
+    parser.add_argument("command", choices=["scan", "report", "link"],
+                        help="scan: update the index; report: scan and list duplicates; link: scan and hardlink them")
+    parser.add_argument("root", nargs="?", default=OUTPUT_ROOT, help="Library root (default: output_videos)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Parallel decodes (default: half the cores)")
+    parser.add_argument("--no-scan", action="store_true", help="report/link: use the index as it is")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"❌ Not a directory: {args.root}")
+        sys.exit(1)
+
+    with FingerprintIndex(args.root) as index:
+        if args.command == "scan" or not args.no_scan:
+            result = index.scan(workers=args.workers)
+            print(f"📇 {result['files']} file(s) indexed: {result['changed']} new/changed, "
+                  f"{result['removed']} removed, {result['failed']} failed")
+        if args.command == "scan":
+            return
+
+        groups = index.duplicate_groups()
+        print_groups(index, groups)
+        if args.command == "link" and groups:
+            print("\n🔗 Linking duplicates to the biggest copy...")
+            freed = sum(index.link_group(group) for group in groups)
+            print(f"\n🎯 Done. Freed {_fmt_size(freed)}.")
+
+
+if __name__ == "__main__":
+    main()
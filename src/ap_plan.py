@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Dry-run capacity planning for download batches.
+
+Only playlists are fetched (concurrently, and cached per URL once a
+playlist has #EXT-X-ENDLIST): total duration and segment counts come from
+the #EXTINF lines, sizes from the master playlist's BANDWIDTH or, for bare
+media playlists, from HEAD requests on a few segments.  The report shows the
+disk needed per output folder and the projected time at the throughput
+measured on earlier runs (downloader.py records it after every batch).
+
+USAGE EXAMPLES:
+---------------
+1. Plan a manifest before downloading it:
+   python downloader.py --file list.txt --folder course --plan
+
+2. Plan a whole run_all folder, with tonight's 6 hour window:
+   python run_all.py --commands-path cmds --plan --window 6
+
+3. No earlier runs on this machine? Give the rate yourself (MB/s):
+   python run_all.py --commands-path cmds --plan --rate 8
+"""
+import os
+import json
+import time
+import shutil
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ap_core import HTTP_HEADERS, http_get, parse_m3u8
+
+PLAN_CACHE = ".plan_cache.json"
+THROUGHPUT_HISTORY = ".throughput.json"
+
+# Segments sampled with HEAD when a playlist carries no BANDWIDTH
+SAMPLE_SEGMENTS = 3
+# Runs kept in the throughput history, and the smallest one worth keeping
+HISTORY_RUNS = 10
+HISTORY_MIN_BYTES = 50 * 1024 * 1024
+
+
+# ---------- Size estimates ----------
+
+def content_length(url: str, timeout: float = 15):
+    """
+    Size of a remote file without downloading it: HEAD, or a one-byte
+    ranged GET for servers that refuse HEAD.  None when neither tells.
+    """
+    import urllib.request
+
+    for method, extra in (("HEAD", {}), ("GET", {"Range": "bytes=0-0"})):
+        req = urllib.request.Request(url, method=method, headers={**HTTP_HEADERS, **extra})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                total = (resp.headers.get("Content-Range") or "").rpartition("/")[2]
+                if total.isdigit():
+                    return int(total)
+                length = resp.headers.get("Content-Length")
+                if length and (method == "HEAD" or resp.status == 200):
+                    return int(length)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def estimate_playlist(url: str, sample: int = SAMPLE_SEGMENTS) -> dict:
+    """
+    {duration, segments, bytes, source, live} for one playlist URL.  A
+    master playlist is followed to its first variant, like the downloader
+    does; BANDWIDTH is a peak rate, so those sizes lean high.
+    """
+    playlist = parse_m3u8(http_get(url).decode("utf-8", "replace"), url)
+    bandwidth = None
+    if playlist.is_master:
+        bandwidth, media_url = playlist.variants[0]
+        playlist = parse_m3u8(http_get(media_url).decode("utf-8", "replace"), media_url)
+
+    entry = {
+        "duration": round(playlist.duration, 3),
+        "segments": len(playlist.segments),
+        "live": not playlist.endlist,
+        "bytes": None,
+        "source": None,
+    }
+    if bandwidth:
+        entry["bytes"] = int(bandwidth / 8 * playlist.duration)
+        entry["source"] = "bandwidth"
+    elif playlist.segments:
+        segments = playlist.segments
+        step = max(1, len(segments) // sample)
+        picked = segments[step // 2::step][:sample]
+        sized = [(content_length(seg["uri"]), seg["duration"]) for seg in picked]
+        sized = [(size, dur) for size, dur in sized if size and dur]
+        if sized:
+            rate = sum(size for size, _ in sized) / sum(dur for _, dur in sized)
+            entry["bytes"] = int(rate * playlist.duration)
+            entry["source"] = f"head x{len(sized)}"
+    return entry
+
+
+class PlanCache:
+    """{url: estimate} of finished (#EXT-X-ENDLIST) playlists; live ones are never cached."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, url: str):
+        with self._lock:
+            return self.entries.get(url)
+
+    def put(self, url: str, entry: dict):
+        if entry.get("live") or entry.get("bytes") is None:
+            return
+        with self._lock:
+            self.entries[url] = dict(entry, fetched=int(time.time()))
+            self.dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+def estimate_all(urls, cache: PlanCache, workers: int = 8) -> dict:
+    """{url: estimate or {"error": ...}} with the uncached playlists fetched in parallel."""
+    results = {}
+    todo = []
+    for url in dict.fromkeys(urls):
+        cached = cache.get(url)
+        if cached:
+            results[url] = dict(cached, cached=True)
+        else:
+            todo.append(url)
+
+    if todo:
+        print(f"🔎 Fetching {len(todo)} playlist(s) ({len(results)} cached)...")
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(estimate_playlist, url): url for url in todo}
+            for f in as_completed(futures):
+                url = futures[f]
+                try:
+                    results[url] = f.result()
+                    cache.put(url, results[url])
+                except Exception as e:
+                    results[url] = {"error": str(e)[:200]}
+    return results
+
+
+# ---------- Throughput history ----------
+
+def record_throughput(root: str, nbytes: int, seconds: float, workers: int):
+    """Appends one finished batch (aggregate bytes over wall time) to the history."""
+    if nbytes < HISTORY_MIN_BYTES or seconds <= 0:
+        return
+    path = os.path.join(root, THROUGHPUT_HISTORY)
+    history = _load_history(path)
+    history.append({"at": int(time.time()), "bytes": nbytes, "seconds": round(seconds, 1), "workers": workers})
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(history[-HISTORY_RUNS:], f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _load_history(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+        return history if isinstance(history, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+def measured_throughput(root: str):
+    """(bytes/s, runs) — the median over the recorded batches — or (None, 0)."""
+    rates = [
+        run["bytes"] / run["seconds"]
+        for run in _load_history(os.path.join(root, THROUGHPUT_HISTORY))
+        if run.get("seconds")
+    ]
+    return (statistics.median(rates), len(rates)) if rates else (None, 0)
+
+
+# ---------- Report ----------
+
+def _fmt_bytes(n: float) -> str:
+    return f"{n / 1024 ** 3:.1f} GB" if n >= 1024 ** 3 else f"{n / 1024 ** 2:.1f} MB"
+
+
+def _fmt_hours(s: float) -> str:
+    if s >= 3600:
+        return f"{s / 3600:.1f}h"
+    return f"{s / 60:.0f}m" if s >= 60 else f"{s:.0f}s"
+
+
+def _free_space(path: str):
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    try:
+        return shutil.disk_usage(path or ".").free
+    except OSError:
+        return None
+
+
+def build_plan(items, estimates: dict) -> dict:
+    """
+    Groups (url, folder, mp4 path) items per folder: {folder: totals}.
+    Files already on disk count as done and need no space.
+    """
+    folders = {}
+    for url, folder, mp4_path in items:
+        f = folders.setdefault(folder, {"files": 0, "done": 0, "duration": 0.0, "segments": 0,
+                                        "bytes": 0, "unknown": 0, "failed": []})
+        f["files"] += 1
+        if os.path.exists(mp4_path):
+            f["done"] += 1
+            continue
+        est = estimates.get(url) or {}
+        if "error" in est:
+            f["failed"].append((url, est["error"]))
+            continue
+        f["duration"] += est.get("duration") or 0.0
+        f["segments"] += est.get("segments") or 0
+        if est.get("bytes") is None:
+            f["unknown"] += 1
+        else:
+            f["bytes"] += est["bytes"]
+    return folders
+
+
+def print_plan(folders: dict, output_root: str, rate: float = None, rate_note: str = "",
+               window_hours: float = None):
+    """Prints the per-folder table, the disk check and the time projection."""
+    if not folders:
+        print("No URLs to plan.")
+        return
+
+    total = {k: sum(f[k] for f in folders.values()) for k in ("files", "done", "duration", "segments", "bytes", "unknown")}
+    print(f"\n📋 Plan: {total['files']} video(s) in {len(folders)} folder(s), {total['done']} already downloaded")
+    print(f"   {'Folder':<40} {'To get':>7} {'Segments':>9} {'Duration':>9} {'Est. size':>10}")
+    for name, f in sorted(folders.items()):
+        unknown = f"  ({f['unknown']} unsized)" if f["unknown"] else ""
+        print(f"   {name[:40]:<40} {f['files'] - f['done']:>3}/{f['files']:<3} {f['segments']:>9} "
+              f"{_fmt_hours(f['duration']):>9} {_fmt_bytes(f['bytes']):>10}{unknown}")
+    print(f"   {'Total':<40} {total['files'] - total['done']:>3}/{total['files']:<3} {total['segments']:>9} "
+          f"{_fmt_hours(total['duration']):>9} {_fmt_bytes(total['bytes']):>10}")
+
+    failed = [item for f in folders.values() for item in f["failed"]]
+    if failed:
+        print(f"\n⚠️ {len(failed)} playlist(s) could not be read (not counted):")
+        for url, error in failed[:10]:
+            print(f"   {url}: {error}")
+    if total["unknown"]:
+        print(f"⚠️ {total['unknown']} video(s) have no size estimate (no BANDWIDTH, HEAD refused); sizes are a lower bound.")
+
+    needed = total["bytes"]
+    free = _free_space(os.path.abspath(output_root))
+    if free is None:
+        print(f"\n💾 Needed: {_fmt_bytes(needed)}")
+    else:
+        verdict = "✅ fits" if needed <= free else f"❌ short by {_fmt_bytes(needed - free)}"
+        print(f"\n💾 Needed: {_fmt_bytes(needed)}; free under {output_root}: {_fmt_bytes(free)} {verdict}")
+
+    if not rate:
+        print("⏱️ No measured throughput yet (finish one download batch, or pass --rate MB/s).")
+        return
+    seconds = total["bytes"] / rate
+    print(f"⏱️ At {rate / 1024 ** 2:.1f} MB/s{rate_note}: about {_fmt_hours(seconds)}")
+    if window_hours:
+        window = window_hours * 3600
+        if seconds <= window:
+            print(f"   ✅ Fits the {window_hours:g}h window")
+        else:
+            print(f"   ❌ Needs {_fmt_hours(seconds - window)} more than the {window_hours:g}h window "
+                  f"(~{_fmt_bytes(rate * window)} fits)")
+
+
+def plan(items, output_root: str, rate_mbps: float = None, window_hours: float = None,
+         workers: int = 8) -> dict:
+    """
+    Full dry run over (url, folder, mp4 path) items: estimates (cached
+    under `output_root`), report, and the per-folder totals it printed.
+    """
+    # Several commands may name the same file; it is downloaded once
+    items = list({mp4_path: (url, folder, mp4_path) for url, folder, mp4_path in items}.values())
+    cache = PlanCache(os.path.join(output_root, PLAN_CACHE))
+    pending = [url for url, _, mp4_path in items if not os.path.exists(mp4_path)]
+    try:
+        estimates = estimate_all(pending, cache, workers=workers)
+    finally:
+        cache.save()
+
+    folders = build_plan(items, estimates)
+    if rate_mbps:
+        rate, note = rate_mbps * 1024 ** 2, " (given)"
+    else:
+        rate, runs = measured_throughput(output_root)
+        note = f" (median of the last {runs} run(s))" if rate else ""
+
+    live = sum(1 for url in pending if (estimates.get(url) or {}).get("live"))
+    if live:
+        print(f"⚠️ {live} playlist(s) are still live; their size is only the current window.")
+    print_plan(folders, output_root, rate, note, window_hours)
+    return folders
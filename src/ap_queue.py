@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Download queue shared by several machines: a coordinator serving tasks over
+HTTP, and downloader.py workers that lease them.
+
+The coordinator keeps the queue in SQLite (deduplicated by URL, survives a
+restart).  A worker leases a task (URL, folder, name), keeps the lease alive
+while it downloads, and reports the result.  A lease that is not renewed
+(worker crashed, machine off) expires and the task goes back to the queue;
+after --max-attempts failures it is parked as failed.  Each worker writes to
+its own output_videos.
+
+Meant for a trusted LAN: nothing is encrypted, and --token only keeps out
+requests that don't carry the shared secret.
+
+USAGE EXAMPLES:
+---------------
+1. Start a coordinator with a list (the same 'URL|name' / JSONL files as downloader.py):
+   python ap_queue.py serve --file list.txt --folder course --host 0.0.0.0
+
+2. Point workers at it, on as many machines as you like:
+   python downloader.py --coordinator http://192.168.1.10:8765 --workers 4
+
+3. Add more tasks, look at progress:
+   python ap_queue.py add --file more.txt --coordinator http://192.168.1.10:8765
+   python ap_queue.py status --coordinator http://192.168.1.10:8765
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import platform
+import threading
+
+DEFAULT_PORT = 8765
+DB_FILENAME = ".queue.sqlite"
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+# Longest an idle worker waits before asking again while other leases run;
+# one of them may fail and come back, and the last ones should exit soon
+IDLE_POLL_SECONDS = 5.0
+TOKEN_HEADER = "X-AP-Token"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id          TEXT PRIMARY KEY,   -- digest of the URL: the queue is deduplicated by URL
+    seq         INTEGER,            -- insertion order: tasks are leased in the order they were added
+    url         TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    folder      TEXT NOT NULL,
+    mirrors     TEXT,               -- JSON list
+    state       TEXT NOT NULL,      -- pending | leased | done | failed
+    lease       TEXT,
+    worker      TEXT,
+    expires     REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    bytes       INTEGER,
+    added_at    REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_queue ON tasks(state, seq);
+"""
+
+
+def task_id(url: str) -> str:
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# ---------- Coordinator ----------
+
+class Coordinator:
+    """The queue itself.  All methods are safe to call from the HTTP handler threads."""
+
+    def __init__(self, db_path: str, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def enqueue(self, tasks) -> dict:
+        """Adds {url, name, folder, mirrors} dicts; URLs already queued are skipped."""
+        now = time.time()
+        added = 0
+        with self._lock, self.db:
+            seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM tasks").fetchone()[0]
+            for t in tasks:
+                cur = self.db.execute(
+                    "INSERT OR IGNORE INTO tasks (id, seq, url, name, folder, mirrors, state, added_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?)",
+                    (task_id(t["url"]), seq + 1, t["url"], t["name"], t["folder"],
+                     json.dumps(t.get("mirrors")) if t.get("mirrors") else None, now, now),
+                )
+                seq += cur.rowcount
+                added += cur.rowcount
+        return {"added": added, "duplicates": len(tasks) - added}
+
+    def _expire(self, now: float):
+        """Leases past their expiry go back to the queue (or fail for good)."""
+        for row in self.db.execute("SELECT id, worker, attempts FROM tasks WHERE state = 'leased' AND expires < ?", (now,)).fetchall():
+            attempts = row["attempts"] + 1
+            state = "failed" if attempts >= self.max_attempts else "pending"
+            self.db.execute(
+                "UPDATE tasks SET state = ?, lease = NULL, attempts = ?, error = ?, updated_at = ? WHERE id = ?",
+                (state, attempts, f"lease expired on {row['worker']}", now, row["id"]),
+            )
+            print(f"⌛ Lease expired on {row['worker']}: {row['id']} → {state}")
+
+    def lease(self, worker: str, count: int = 1) -> dict:
+        now = time.time()
+        with self._lock, self.db:
+            self._expire(now)
+            rows = self.db.execute(
+                "SELECT * FROM tasks WHERE state = 'pending' ORDER BY seq LIMIT ?", (count,)
+            ).fetchall()
+            leased = []
+            for row in rows:
+                lease = uuid.uuid4().hex
+                expires = now + self.lease_seconds
+                self.db.execute(
+                    "UPDATE tasks SET state = 'leased', lease = ?, worker = ?, expires = ?, updated_at = ? WHERE id = ?",
+                    (lease, worker, expires, now, row["id"]),
+                )
+                leased.append({
+                    "lease": lease, "url": row["url"], "name": row["name"], "folder": row["folder"],
+                    "mirrors": json.loads(row["mirrors"]) if row["mirrors"] else None,
+                    "expires_in": self.lease_seconds,
+                })
+
+            if leased:
+                return {"tasks": leased}
+            # Nothing to hand out: either all finished, or wait for running leases
+            nxt = self.db.execute("SELECT MIN(expires) FROM tasks WHERE state = 'leased'").fetchone()[0]
+            return {"tasks": [], "drained": nxt is None,
+                    "retry_after": min(IDLE_POLL_SECONDS, max(1.0, nxt - now)) if nxt else None}
+
+    def renew(self, leases) -> dict:
+        """Extends live leases; returns the ones that are no longer held (expired, reassigned)."""
+        now = time.time()
+        lost = []
+        with self._lock, self.db:
+            for lease in leases:
+                cur = self.db.execute(
+                    "UPDATE tasks SET expires = ?, updated_at = ? WHERE lease = ? AND state = 'leased'",
+                    (now + self.lease_seconds, now, lease),
+                )
+                if not cur.rowcount:
+                    lost.append(lease)
+        return {"lost": lost}
+
+    def complete(self, lease: str, ok: bool, nbytes: int = None, error: str = None) -> dict:
+        now = time.time()
+        with self._lock, self.db:
+            row = self.db.execute("SELECT id, attempts FROM tasks WHERE lease = ? AND state = 'leased'", (lease,)).fetchone()
+            if row is None:
+                # Expired and handed to someone else meanwhile: theirs is the one that counts
+                return {"accepted": False}
+            if ok:
+                state, attempts = "done", row["attempts"]
+            else:
+                attempts = row["attempts"] + 1
+                state = "failed" if attempts >= self.max_attempts else "pending"
+            self.db.execute(
+                "UPDATE tasks SET state = ?, lease = NULL, expires = NULL, attempts = ?, error = ?, bytes = ?, "
+                "updated_at = ? WHERE id = ?",
+                (state, attempts, None if ok else (error or "download failed"), nbytes, now, row["id"]),
+            )
+        return {"accepted": True, "state": state}
+
+    def status(self) -> dict:
+        with self._lock, self.db:
+            self._expire(time.time())
+            counts = {r["state"]: r["n"] for r in self.db.execute("SELECT state, COUNT(*) AS n FROM tasks GROUP BY state")}
+            workers = {
+                r["worker"]: {"done": r["done"], "bytes": r["bytes"] or 0, "leased": r["leased"]}
+                for r in self.db.execute(
+                    "SELECT worker, SUM(state = 'done') AS done, SUM(CASE WHEN state = 'done' THEN bytes END) AS bytes, "
+                    "SUM(state = 'leased') AS leased FROM tasks WHERE worker IS NOT NULL GROUP BY worker"
+                )
+            }
+            failed = [dict(r) for r in self.db.execute("SELECT url, folder, name, error FROM tasks WHERE state = 'failed'")]
+        return {"counts": counts, "workers": workers, "failed": failed}
+
+
+def make_handler(coordinator: Coordinator, token: str = None):
+    from http.server import BaseHTTPRequestHandler
+
+    routes = {
+        "/enqueue": lambda body: coordinator.enqueue(body.get("tasks") or []),
+        "/lease": lambda body: coordinator.lease(body.get("worker") or "?", int(body.get("count") or 1)),
+        "/renew": lambda body: coordinator.renew(body.get("leases") or []),
+        "/complete": lambda body: coordinator.complete(body["lease"], bool(body.get("ok")),
+                                                       body.get("bytes"), body.get("error")),
+        "/status": lambda body: coordinator.status(),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, body: dict):
+            if token and self.headers.get(TOKEN_HEADER) != token:
+                return self._reply(403, {"error": "bad token"})
+            route = routes.get(self.path)
+            if route is None:
+                return self._reply(404, {"error": f"no such endpoint: {self.path}"})
+            try:
+                self._reply(200, route(body))
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def do_GET(self):
+            self._handle({})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": "body is not JSON"})
+            self._handle(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(coordinator: Coordinator, host: str, port: int, token: str = None, exit_when_done: bool = False):
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), make_handler(coordinator, token))
+    server.daemon_threads = True
+    print(f"📡 Coordinator on http://{host}:{server.server_address[1]}  (lease {coordinator.lease_seconds:g}s)")
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    last = None
+    # Idle workers poll again within IDLE_POLL_SECONDS; stay up that long once
+    # the queue is finished so they hear 'drained' instead of a dead socket
+    grace = min(IDLE_POLL_SECONDS, coordinator.lease_seconds) + 2
+    finished_at = None
+    try:
+        while True:
+            time.sleep(1)
+            counts = coordinator.status()["counts"]
+            line = "  ".join(f"{k}: {counts.get(k, 0)}" for k in ("pending", "leased", "done", "failed"))
+            if line != last:
+                print(f"   {line}")
+                last = line
+            if exit_when_done and counts and not counts.get("pending") and not counts.get("leased"):
+                finished_at = finished_at or time.time()
+                if time.time() - finished_at >= grace:
+                    break
+            else:
+                finished_at = None
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+# ---------- Worker side ----------
+
+class QueueClient:
+    """
+    Talks to a coordinator.  Leases handed out are renewed in the background
+    (every third of the lease time) until complete() is called for them.
+    """
+
+    def __init__(self, base_url: str, worker: str = None, token: str = None, timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.worker = worker or f"{platform.node()}-{os.getpid()}"
+        self.token = token
+        self.timeout = timeout
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _call(self, path: str, payload: dict = None) -> dict:
+        import urllib.request
+
+        data = json.dumps(payload or {}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read() or b"{}")
+
+    def enqueue(self, tasks) -> dict:
+        return self._call("/enqueue", {"tasks": list(tasks)})
+
+    def status(self) -> dict:
+        return self._call("/status")
+
+    def lease(self, count: int = 1) -> dict:
+        reply = self._call("/lease", {"worker": self.worker, "count": count})
+        leases = [t["lease"] for t in reply.get("tasks", [])]
+        if leases:
+            with self._lock:
+                self._active.update(leases)
+            self._start_heartbeat(reply["tasks"][0].get("expires_in") or LEASE_SECONDS)
+        return reply
+
+    def complete(self, lease: str, ok: bool, nbytes: int = None, error: str = None) -> dict:
+        with self._lock:
+            self._active.discard(lease)
+        return self._call("/complete", {"lease": lease, "ok": ok, "bytes": nbytes, "error": error})
+
+    def _start_heartbeat(self, lease_seconds: float):
+        if self._heartbeat is not None:
+            return
+        self._heartbeat = threading.Thread(target=self._renew_loop, args=(lease_seconds / 3,), daemon=True)
+        self._heartbeat.start()
+
+    def _renew_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            with self._lock:
+                leases = list(self._active)
+            if not leases:
+                continue
+            try:
+                lost = self._call("/renew", {"leases": leases}).get("lost") or []
+            except OSError as e:
+                print(f"⚠️ Could not renew leases: {e}")
+                continue
+            # No point renewing them again; complete() is answered 'not accepted'
+            with self._lock:
+                self._active.difference_update(lost)
+            for lease in lost:
+                print(f"⚠️ Lease {lease[:8]} was lost; the task may be downloaded elsewhere too")
+
+    def close(self):
+        self._stop.set()
+
+
+# ---------- CLI ----------
+
+def load_tasks(args):
+    """{url, name, folder, mirrors} dicts from --url/--file, named the way downloader.py names them."""
+    from downloader import iter_tasks, unique_tasks, task_paths
+
+    tasks = []
+    for task in unique_tasks(iter_tasks(args.url, args.file)):
+        folder, name, _ = task_paths(task, args.folder)
+        tasks.append({"url": task[0], "name": name, "folder": folder, "mirrors": task[3]})
+    return tasks
+
+
+def print_status(status: dict):
+    counts = status["counts"]
+    print("📊 " + "  ".join(f"{k}: {counts.get(k, 0)}" for k in ("pending", "leased", "done", "failed")))
+    for worker, w in sorted(status["workers"].items()):
+        print(f"   {worker:<32} {w['done']:>5} done  {(w['bytes'] or 0) / (1024 * 1024):9.1f} MB  {w['leased']} leased")
+    for f in status["failed"]:
+        print(f"   ❌ {f['folder']}/{f['name']}: {f['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download queue shared by several downloader.py workers")
+    parser.add_argument("command", choices=["serve", "add", "status"])
+    parser.add_argument("--url", action="append", help="Format: 'URL' or 'URL|filename'")
+    parser.add_argument("--file", help="'URL|filename' lines or a JSONL manifest")
+    parser.add_argument("--folder", help="Target subfolder name")
+    parser.add_argument("--coordinator", default=f"http://127.0.0.1:{DEFAULT_PORT}", help="add/status: coordinator URL")
+    parser.add_argument("--host", default="127.0.0.1", help="serve: address to listen on (0.0.0.0 for the LAN)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"serve: port (default: {DEFAULT_PORT})")
+    parser.add_argument("--db", default=DB_FILENAME, help=f"serve: queue database (default: {DB_FILENAME})")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help=f"serve: seconds a lease lives without a heartbeat (default: {LEASE_SECONDS})")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                        help=f"serve: failures or expired leases before a task is parked (default: {MAX_ATTEMPTS})")
+    parser.add_argument("--exit-when-done", action="store_true", help="serve: stop once nothing is pending or leased")
+    parser.add_argument("--token", default=os.environ.get("AP_QUEUE_TOKEN"),
+                        help="Shared secret workers must send (default: $AP_QUEUE_TOKEN)")
+    args = parser.parse_args()
+
+    if args.file and not os.path.exists(args.file):
+        print(f"❌ File not found: {args.file}")
+        sys.exit(1)
+    tasks = load_tasks(args) if (args.url or args.file) else []
+
+    if args.command == "serve":
+        coordinator = Coordinator(args.db, lease_seconds=args.lease, max_attempts=args.max_attempts)
+        try:
+            if tasks:
+                result = coordinator.enqueue(tasks)
+                print(f"📥 {result['added']} task(s) queued, {result['duplicates']} already known")
+            serve(coordinator, args.host, args.port, args.token, args.exit_when_done)
+            print_status(coordinator.status())
+        finally:
+            coordinator.close()
+        return
+
+    client = QueueClient(args.coordinator, token=args.token)
+    try:
+        if args.command == "add":
+            if not tasks:
+                print("No URLs provided.")
+                return
+            result = client.enqueue(tasks)
+            print(f"📥 {result['added']} task(s) queued, {result['duplicates']} already known")
+        else:
+            print_status(client.status())
+    except OSError as e:
+        print(f"❌ Coordinator unreachable at {args.coordinator}: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
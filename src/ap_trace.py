@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Per-job tracing for the pipeline tools, and a report over the traces.
+
+Each tool writes one JSON line per span (playlist fetch, time to first
+byte, download, mux, encode, verify, ...) with its timing, bytes and
+status.  Tracing is off unless a trace file is given with --trace or the
+AP_TRACE environment variable; run_all.py passes it on to the commands it
+runs, so a whole batch lands in one file.
+
+USAGE EXAMPLES:
+---------------
+1. Trace a batch:
+   python run_all.py --commands-path cmds --trace batch.jsonl
+
+2. Trace a single tool:
+   AP_TRACE=dl.jsonl python downloader.py --file list.txt
+
+3. Where did the time go?
+   python ap_trace.py report batch.jsonl
+   python ap_trace.py report batch.jsonl --top 20 --width 100
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+ENV_FILE = "AP_TRACE"
+ENV_RUN = "AP_TRACE_RUN"
+ENV_PARENT = "AP_TRACE_PARENT"
+
+JOB_PHASES = ("job", "command")
+
+_lock = threading.Lock()
+_local = threading.local()
+_state = {"path": None, "tool": None, "run": None}
+
+
+# ---------- Writing ----------
+
+def configure(tool: str, path: str = None):
+    """
+    Turns tracing on for this process when `path` (or $AP_TRACE) is set.
+    Child processes started afterwards inherit the file and run id.
+    """
+    path = path or os.environ.get(ENV_FILE)
+    if not path:
+        return
+    _state["path"] = os.path.abspath(path)
+    _state["tool"] = tool
+    _state["run"] = os.environ.get(ENV_RUN) or uuid.uuid4().hex[:12]
+    os.environ[ENV_FILE] = _state["path"]
+    os.environ[ENV_RUN] = _state["run"]
+
+
+def enabled() -> bool:
+    return _state["path"] is not None
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+def _write(record: dict):
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    # One write() per line on an O_APPEND file keeps lines from threads and
+    # child processes intact
+    with _lock:
+        fd = os.open(_state["path"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def record(phase: str, start: float, end: float, **attrs):
+    """Writes a finished span (wall-clock start/end) for the current job."""
+    if not enabled():
+        return
+    rec = {
+        "run": _state["run"],
+        "tool": _state["tool"],
+        "job": current_job(),
+        "parent": os.environ.get(ENV_PARENT),
+        "phase": phase,
+        "start": round(start, 4),
+        "end": round(end, 4),
+        "duration": round(end - start, 4),
+        "pid": os.getpid(),
+        "worker": threading.current_thread().name,
+        "status": "ok",
+    }
+    rec.update({k: v for k, v in attrs.items() if v is not None})
+    _write(rec)
+
+
+@contextmanager
+def span(phase: str, **attrs):
+    """
+    Times the block as one span.  The yielded dict can be filled in
+    (bytes, status, ...); an exception marks the span 'error'.
+    """
+    data = dict(attrs)
+    if not enabled():
+        yield data
+        return
+    start = time.time()
+    try:
+        yield data
+    except BaseException as e:
+        data.setdefault("status", "error")
+        data.setdefault("error", str(e)[:300])
+        raise
+    finally:
+        record(phase, start, time.time(), **data)
+
+
+@contextmanager
+def job(name: str, phase: str = "job", **attrs):
+    """Top-level span of one unit of work; spans inside it carry its id."""
+    previous = current_job()
+    _local.job = f"{os.getpid()}-{uuid.uuid4().hex[:8]}" if enabled() else None
+    try:
+        with span(phase, name=name, **attrs) as data:
+            yield data
+    finally:
+        _local.job = previous
+
+
+def child_env() -> dict:
+    """Environment for a subprocess whose spans belong to the current job."""
+    env = dict(os.environ)
+    if enabled() and current_job():
+        env[ENV_PARENT] = current_job()
+    return env
+
+
+# ---------- Report ----------
+
+def load(path: str):
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    return spans
+
+
+def _fmt_seconds(s: float) -> str:
+    if s >= 3600:
+        return f"{s / 3600:.1f}h"
+    if s >= 60:
+        return f"{s / 60:.1f}m"
+    return f"{s:.1f}s"
+
+
+def _fmt_bytes(n: float) -> str:
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+
+def slowest_jobs(spans, top: int):
+    jobs = [s for s in spans if s["phase"] in JOB_PHASES]
+    return sorted(jobs, key=lambda s: s["duration"], reverse=True)[:top]
+
+
+def phase_totals(spans):
+    """{phase: [durations]} for every span below the job level."""
+    phases = defaultdict(list)
+    for s in spans:
+        if s["phase"] not in JOB_PHASES:
+            phases[s["phase"]].append(s["duration"])
+    return phases
+
+
+def host_throughput(spans):
+    """{host: (transfers, bytes, seconds)} over the download spans."""
+    hosts = defaultdict(lambda: [0, 0, 0.0])
+    for s in spans:
+        if s["phase"] == "download" and s.get("host") and s.get("bytes"):
+            h = hosts[s["host"]]
+            h[0] += 1
+            h[1] += s["bytes"]
+            h[2] += s["duration"]
+    return hosts
+
+
+PHASE_MARKS = {
+    "playlist": "p", "ttfb": "t", "download": "D", "mux": "M",
+    "encode": "E", "verify": "V", "command": "C", "job": ".",
+}
+
+
+def timeline(spans, width: int):
+    """
+    One row per worker (process/thread): for each column, the mark of the
+    innermost span running at that moment.  Returns (rows, start, end).
+    """
+    start = min(s["start"] for s in spans)
+    end = max(s["end"] for s in spans)
+    step = (end - start) / width or 1.0
+
+    lanes = defaultdict(list)
+    for s in spans:
+        lanes[(s.get("tool") or "", s["pid"], s["worker"])].append(s)
+
+    rows = []
+    for lane, lane_spans in sorted(lanes.items(), key=lambda kv: min(s["start"] for s in kv[1])):
+        # Shorter spans are nested inside longer ones: draw long first
+        lane_spans.sort(key=lambda s: s["duration"], reverse=True)
+        cells = [" "] * width
+        for s in lane_spans:
+            mark = PHASE_MARKS.get(s["phase"], s["phase"][:1].lower())
+            if s.get("status") not in (None, "ok", "skipped") and s["phase"] not in JOB_PHASES:
+                mark = "x"
+            first = int((s["start"] - start) / step)
+            last = max(first, int((s["end"] - start) / step) - 1)
+            for i in range(first, min(last, width - 1) + 1):
+                cells[i] = mark
+        busy = sum(1 for c in cells if c != " ")
+        rows.append((lane, "".join(cells), busy / width))
+    return rows, start, end
+
+
+def report(path: str, top: int = 10, width: int = 80):
+    spans = load(path)
+    if not spans:
+        print(f"No spans in {path}")
+        return
+
+    start = min(s["start"] for s in spans)
+    end = max(s["end"] for s in spans)
+    wall = end - start
+    print(f"📈 {len(spans)} span(s) from {len({s.get('run') for s in spans})} run(s), wall clock {_fmt_seconds(wall)}")
+
+    print(f"\n🐢 Slowest jobs (top {top})")
+    for s in slowest_jobs(spans, top):
+        size = f"  {_fmt_bytes(s['bytes'])}" if s.get("bytes") else ""
+        print(f"   {_fmt_seconds(s['duration']):>7}  [{s.get('tool')}] {s.get('name')}  {s.get('status')}{size}")
+
+    print("\n⏱️ Time per phase")
+    phases = phase_totals(spans)
+    grand = sum(sum(v) for v in phases.values()) or 1.0
+    for phase, durations in sorted(phases.items(), key=lambda kv: sum(kv[1]), reverse=True):
+        total = sum(durations)
+        print(
+            f"   {phase:<9} {_fmt_seconds(total):>7} ({100 * total / grand:4.1f}%)  "
+            f"n={len(durations)}  mean {_fmt_seconds(total / len(durations))}  "
+            f"p95 {_fmt_seconds(_percentile(durations, 0.95))}"
+        )
+
+    hosts = host_throughput(spans)
+    if hosts:
+        print("\n🌐 Throughput per host")
+        for host, (count, nbytes, seconds) in sorted(hosts.items(), key=lambda kv: kv[1][1], reverse=True):
+            rate = nbytes / seconds / (1024 * 1024) if seconds else 0.0
+            print(f"   {host:<40} {count:>5} transfer(s)  {_fmt_bytes(nbytes):>10}  {rate:6.2f} MB/s per transfer")
+
+    rows, _, _ = timeline(spans, width)
+    print(f"\n🗓️ Timeline ({_fmt_seconds(wall)} across {width} columns)")
+    print("   " + "  ".join(f"{mark}={phase}" for phase, mark in PHASE_MARKS.items()) + "  x=failed")
+    for (tool, pid, worker), cells, used in rows:
+        label = f"{tool}:{pid}:{worker.replace('ThreadPoolExecutor-', 'pool')}"[:32]
+        print(f"   {label:<32} |{cells}| {100 * used:3.0f}%")
+    if rows:
+        print(f"   Average worker utilization: {100 * sum(r[2] for r in rows) / len(rows):.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize JSONL traces written by the pipeline tools")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("trace", nargs="?", default=os.environ.get(ENV_FILE), help="Trace file (default: $AP_TRACE)")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest jobs to list (default: 10)")
+    parser.add_argument("--width", type=int, default=80, help="Timeline width in columns (default: 80)")
+    args = parser.parse_args()
+
+    if not args.trace or not os.path.exists(args.trace):
+        print(f"❌ Trace file not found: {args.trace}")
+        sys.exit(1)
+
+    report(args.trace, top=args.top, width=args.width)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+One entry point for every tool in src/:
+
+    python -m aptools <command> [options]
+
+The tools stay separate scripts.  Only the chosen script is loaded, so
+heavy dependencies (yt_dlp, python-docx, lxml, ...) are imported by the
+commands that need them and never for the others or for --help.
+
+USAGE EXAMPLES:
+---------------
+1. List the commands:
+   python -m aptools
+
+2. Same options as the scripts themselves:
+   python -m aptools download --file links.txt --workers 6
+   python -m aptools black output_videos --recursive
+   python -m aptools merge "D:/Transcripts/Course"
+
+3. Check cold-start time of every command against a target:
+   python -m aptools bench-startup --target-ms 150
+
+4. Benchmark the black-screen pipeline (see aptools/bench_pipeline.py):
+   python -m aptools bench-pipeline --durations 60,300
+
+Run from the src/ folder (or put it on PYTHONPATH).
+"""
+import os
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command -> (script relative to src/, entry function or None to run it as __main__, help)
+COMMANDS = {
+    "download":      ("downloader.py", "main", "Download HLS playlists to mp4 (downloader.py)"),
+    "black":         ("black_videos_cli.py", "main", "Black-screen videos from video/audio files"),
+    "audio":         ("audio_cli.py", "main", "Extract audio tracks from videos"),
+    "transcript":    ("youtube_transcript_download/index.py", None, "Download a YouTube transcript"),
+    "recompress":    ("recompress_cli.py", "main", "Re-encode finished lectures to save space"),
+    "dupes":         ("ap_fingerprint.py", "main", "Find duplicate lectures by audio fingerprint"),
+    "merge":         ("merge_docs/merge_docs.py", "main", "Merge a folder of .docx files into one"),
+    "shrink":        ("shrink book/shrink.py", "main", "Strip page breaks/spacing from .docx files"),
+    "sync":          ("check_copy_status.py", "main", "Verify or copy a library to another drive"),
+    "inventory":     ("inventory.py", "main", "SQLite catalog of output_videos"),
+    "queue":         ("ap_queue.py", "main", "Download queue shared by several machines"),
+    "trace":         ("ap_trace.py", "main", "Report on JSONL traces"),
+    "run":           ("run_all.py", "main", "Run a folder of command files in order"),
+    "youtube-audio": ("youtube_audio_downloader/yt_audio_downloader.py", None, "YouTube → mp3 in batches"),
+    "transcribe":    ("youtube_audio_downloader/transcribe.py", "main", "Offline speech-to-text for downloaded audio"),
+    "course":        ("Course_Downloader/auto_downloader.py", "process_queue", "Download queued courses with yt-dlp"),
+}
+
+# Scripts without an argument parser: `--help` would just run them (and
+# `course --help` would start downloading), so the dispatcher answers it
+NO_OPTIONS = {"youtube-audio", "course"}
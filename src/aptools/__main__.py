@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Dispatcher for `python -m aptools <command>`; see aptools/__init__.py."""
+import os
+import sys
+
+from aptools import COMMANDS, NO_OPTIONS, SRC_DIR
+
+
+def print_commands():
+    print("usage: python -m aptools <command> [options]\n")
+    print("commands:")
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, _, help_text) in COMMANDS.items():
+        print(f"  {name:<{width}}  {help_text}")
+    print(f"  {'bench-startup':<{width}}  Time cold start of each command")
+    print(f"  {'bench-pipeline':<{width}}  Benchmark the black-screen pipeline")
+    print("\nRun 'python -m aptools <command> --help' for the command's options.")
+
+
+def load_script(path: str):
+    """
+    Imports a script under its file name (e.g. 'audio_cli'), so functions it
+    hands to process pools pickle by that name and spawned workers can
+    import them again.
+    """
+    import importlib.util
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def print_command_help(name: str):
+    script, _, help_text = COMMANDS[name]
+    print(f"usage: python -m aptools {name}\n")
+    print(f"{help_text} ({script}).")
+    print("It takes no options: run it without arguments.")
+
+
+def run_command(name: str, argv):
+    script, entry, _ = COMMANDS[name]
+    path = os.path.join(SRC_DIR, script)
+
+    if name in NO_OPTIONS and ("-h" in argv or "--help" in argv):
+        print_command_help(name)
+        return
+
+    # The scripts import their neighbours (ap_core, inventory, ...) by name
+    for folder in (SRC_DIR, os.path.dirname(path)):
+        if folder not in sys.path:
+            sys.path.insert(0, folder)
+    sys.argv = [path] + list(argv)
+
+    if entry is None:
+        import runpy
+        runpy.run_path(path, run_name="__main__")
+    else:
+        getattr(load_script(path), entry)()
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ("-h", "--help"):
+        print_commands()
+        return
+
+    name, rest = args[0], args[1:]
+    if name == "bench-startup":
+        from aptools.bench import main as bench_main
+        sys.exit(bench_main(rest))
+    if name == "bench-pipeline":
+        from aptools.bench_pipeline import main as bench_pipeline_main
+        sys.exit(bench_pipeline_main(rest))
+    if name not in COMMANDS:
+        print(f"❌ Unknown command: {name}\n")
+        print_commands()
+        sys.exit(2)
+
+    run_command(name, rest)
+
+
+if __name__ == "__main__":
+    main()
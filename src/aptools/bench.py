@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start benchmark for `python -m aptools`.
+
+Each command is started as a fresh interpreter with --help (so it loads
+everything it needs to parse its options, then exits) several times, and
+the median wall time is compared with the target.  Exit status 1 when a
+command is over it, so it can guard a batch or a pre-commit hook.
+"""
+import sys
+import time
+import argparse
+import subprocess
+from statistics import median
+
+from aptools import COMMANDS, SRC_DIR
+
+# The tools run_all.py shells out to, plus the doc tools
+DEFAULT_COMMANDS = ["download", "black", "audio", "transcript", "merge", "shrink", "sync"]
+
+
+def time_command(argv, runs: int) -> float:
+    """Median wall time in ms of `python <argv>` started from src/."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + argv,
+            cwd=SRC_DIR,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        samples.append((time.perf_counter() - started) * 1000)
+    return median(samples)
+
+
+def slowest_imports(argv, top: int):
+    """[(cumulative ms, module)] from -X importtime, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv,
+        cwd=SRC_DIR,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        imports.append((int(parts[1]) / 1000, parts[2].strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aptools bench-startup", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("commands", nargs="*", help=f"Commands to time (default: {' '.join(DEFAULT_COMMANDS)})")
+    parser.add_argument("--runs", type=int, default=5, help="Starts per command; the median is reported (default: 5)")
+    parser.add_argument("--target-ms", type=float, default=150, help="Allowed cold start in ms (default: 150)")
+    parser.add_argument("--imports", type=int, default=0, metavar="N", help="Also list the N slowest imports per command")
+    args = parser.parse_args(argv)
+
+    commands = args.commands or DEFAULT_COMMANDS
+    unknown = [c for c in commands if c not in COMMANDS]
+    if unknown:
+        print(f"❌ Unknown command(s): {', '.join(unknown)}")
+        return 2
+
+    baseline = time_command(["-c", "pass"], args.runs)
+    print(f"⏱️ Bare interpreter: {baseline:.0f} ms (median of {args.runs})")
+    print(f"   Target: {args.target_ms:.0f} ms per command\n")
+
+    over = []
+    for name in commands:
+        argv = ["-m", "aptools", name, "--help"]
+        ms = time_command(argv, args.runs)
+        mark = "✅" if ms <= args.target_ms else "❌"
+        print(f"{mark} {name:<14} {ms:6.0f} ms  (+{ms - baseline:.0f} ms over bare)")
+        if ms > args.target_ms:
+            over.append(name)
+        for cumulative, module in slowest_imports(argv, args.imports) if args.imports else []:
+            print(f"      {cumulative:7.1f} ms  {module}")
+
+    if over:
+        print(f"\n❗ Over target: {', '.join(over)}")
+        return 1
+    print("\n🎯 Every command starts within the target.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the black-screen pipeline (create_black_video and
+create_black_video_from_audio).
+
+Synthetic inputs are generated once with ffmpeg lavfi (sine and pink-noise
+audio as opus/m4a/mp3, plus a small mp4, at several durations).  Every
+combination of encoder setting and worker count then runs in a fresh
+process, and its wall time, CPU seconds (ffmpeg children included),
+realtime factor, output size and the peak memory of the largest single
+ffmpeg process (not the sum across parallel workers) are written to a JSON
+file.
+Compared against an earlier results file with --baseline, a slowdown or a
+size growth beyond the thresholds exits with status 1.
+
+USAGE EXAMPLES:
+---------------
+1. Default run (tuned setting, 1 and all cores), results to bench_black.json:
+   python -m aptools bench-pipeline
+
+2. Compare every CPU candidate at 1, 2 and 4 workers on longer inputs:
+   python -m aptools bench-pipeline --settings all --workers 1,2,4 --durations 300,1800
+
+3. Guard a change against the last run:
+   python -m aptools bench-pipeline --output new.json --baseline bench_black.json --max-slowdown 10
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+from aptools import SRC_DIR
+
+DEFAULT_DURATIONS = [60, 300]
+DEFAULT_OUTPUT = "bench_black.json"
+
+# (extension, ffmpeg audio args) of the synthetic audio inputs
+AUDIO_FORMATS = {
+    "opus": ["-c:a", "libopus", "-b:a", "32k"],
+    "m4a": ["-c:a", "aac", "-b:a", "64k"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "64k"],
+}
+AUDIO_SOURCES = {
+    "sine": "sine=frequency=440:sample_rate=48000:duration={d}",
+    "noise": "anoisesrc=color=pink:amplitude=0.2:sample_rate=48000:duration={d}",
+}
+
+
+# ---------- Inputs ----------
+
+def input_specs(durations, formats, with_video: bool):
+    """[(file name, duration, ffmpeg input+codec args)] of the synthetic inputs."""
+    specs = []
+    for d in durations:
+        for source, expr in AUDIO_SOURCES.items():
+            for ext in formats:
+                args = ["-f", "lavfi", "-i", expr.format(d=d), *AUDIO_FORMATS[ext]]
+                # The format in the stem too: outputs are named after the stem
+                specs.append((f"{source}_{d}s_{ext}.{ext}", d, args))
+        if with_video:
+            args = [
+                "-f", "lavfi", "-i", f"testsrc=size=426x240:rate=25:duration={d}",
+                "-f", "lavfi", "-i", AUDIO_SOURCES["sine"].format(d=d),
+                "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-b:a", "64k",
+            ]
+            specs.append((f"lecture_{d}s.mp4", d, args))
+    return specs
+
+
+def make_inputs(workdir: str, specs):
+    """Generates missing inputs; returns [(path, duration)]."""
+    os.makedirs(workdir, exist_ok=True)
+    inputs = []
+    for name, duration, args in specs:
+        path = os.path.join(workdir, name)
+        if not os.path.exists(path):
+            print(f"🎛️ Generating {name}...")
+            tmp = os.path.join(workdir, "tmp_" + name)
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", *args, tmp], check=True)
+            os.replace(tmp, path)
+        inputs.append((path, duration))
+    return inputs
+
+
+# ---------- One case (runs in its own process) ----------
+
+def output_path_for(path: str) -> str:
+    from ap_core import get_black_output_path
+
+    if path.lower().endswith(".mp4"):
+        return get_black_output_path(path)
+    return os.path.splitext(path)[0] + "_black.mp4"
+
+
+def run_case(case: dict) -> dict:
+    """
+    Converts every input with `case['workers']` threads and one pinned
+    encoder setting.  Wall time is measured here; CPU time and the largest
+    child's peak RSS come from getrusage over the ffmpeg children (not on
+    Windows).  RUSAGE_CHILDREN's ru_maxrss is the maximum over the
+    children, so it is not the combined footprint of parallel workers.
+    """
+    import contextlib
+    from concurrent.futures import ThreadPoolExecutor
+    from ap_core import create_black_video, create_black_video_from_audio
+
+    encoder = case["encoder"]
+
+    def convert(path):
+        convert_fn = create_black_video if path.lower().endswith(".mp4") else create_black_video_from_audio
+        convert_fn(path, overwrite=True, encoder=encoder)
+        out = output_path_for(path)
+        return os.path.getsize(out) if os.path.exists(out) else None
+
+    started = time.perf_counter()
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        with ThreadPoolExecutor(max_workers=case["workers"]) as ex:
+            sizes = list(ex.map(convert, case["inputs"]))
+    wall = time.perf_counter() - started
+
+    result = {"wall_seconds": round(wall, 3), "output_bytes": sum(s or 0 for s in sizes),
+              "failed": sum(1 for s in sizes if s is None), "cpu_seconds": None, "max_child_rss_mb": None}
+    try:
+        import resource
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        result["cpu_seconds"] = round(children.ru_utime + children.ru_stime, 3)
+        result["max_child_rss_mb"] = round(children.ru_maxrss / scale, 1)
+    except ImportError:
+        pass
+
+    for path in case["inputs"]:
+        out = output_path_for(path)
+        if os.path.exists(out):
+            os.remove(out)
+    return result
+
+
+def spawn_case(case: dict) -> dict:
+    """run_case in a fresh interpreter, so its rusage covers this case only."""
+    proc = subprocess.run(
+        [sys.executable, "-m", "aptools.bench_pipeline", "--run-case", json.dumps(case)],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(proc.stderr.strip()[-500:] or f"exit code {proc.returncode}")
+    return json.loads(lines[-1])
+
+
+# ---------- Settings ----------
+
+def encoder_settings(names, use_gpu: bool):
+    """Settings dicts to benchmark: 'tuned' (the cached choice), 'all', or candidate names."""
+    from ap_core import BLACK_CPU_CANDIDATES, BLACK_GPU_CANDIDATES, black_encoder_settings
+
+    candidates = {
+        name: {"name": name, "size": size, "rate": rate, "args": args}
+        for name, size, rate, args in (BLACK_GPU_CANDIDATES if use_gpu else []) + BLACK_CPU_CANDIDATES
+    }
+    chosen = []
+    for name in names:
+        if name == "tuned":
+            tuned = black_encoder_settings(use_gpu)
+            chosen.append(dict(tuned, name=f"tuned: {tuned['name']}"))
+        elif name == "all":
+            chosen.extend(candidates.values())
+        elif name in candidates:
+            chosen.append(candidates[name])
+        else:
+            raise SystemExit(f"❌ Unknown setting '{name}'. Known: tuned, all, " + ", ".join(candidates))
+    return [{k: s[k] for k in ("name", "size", "rate", "args")} for s in chosen]
+
+
+# ---------- Regression check ----------
+
+def compare(results, baseline, max_slowdown: float, max_growth: float):
+    """Lines describing each regression against the baseline (matched by setting + workers)."""
+    old = {(r["setting"], r["workers"]): r for r in baseline.get("results", [])}
+    problems = []
+    for r in results:
+        b = old.get((r["setting"], r["workers"]))
+        if not b:
+            continue
+        slowdown = 100 * (r["wall_seconds"] / b["wall_seconds"] - 1) if b["wall_seconds"] else 0
+        growth = 100 * (r["output_bytes"] / b["output_bytes"] - 1) if b["output_bytes"] else 0
+        label = f"{r['setting']} × {r['workers']} worker(s)"
+        if slowdown > max_slowdown:
+            problems.append(f"{label}: {slowdown:+.0f}% wall time ({b['wall_seconds']:.1f}s → {r['wall_seconds']:.1f}s)")
+        if growth > max_growth:
+            problems.append(f"{label}: {growth:+.0f}% output size")
+    return problems
+
+
+def ffmpeg_version() -> str:
+    from ap_core import ffmpeg_version as version
+    return version()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aptools bench-pipeline", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--durations", default=",".join(map(str, DEFAULT_DURATIONS)),
+                        help="Input lengths in seconds, comma separated (default: 60,300)")
+    parser.add_argument("--formats", default=",".join(AUDIO_FORMATS), help="Audio input formats (default: opus,m4a,mp3)")
+    parser.add_argument("--no-video", action="store_true", help="Skip the mp4 input (create_black_video)")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Worker counts to try (default: 1,<cores>)")
+    parser.add_argument("--settings", default="tuned",
+                        help="Comma separated: tuned, all, or candidate names from ap_core (default: tuned)")
+    parser.add_argument("--use-gpu", action="store_true", help="Include the GPU candidates")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest counts (default: 1)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "ap_bench_inputs"),
+                        help="Where the synthetic inputs are kept between runs")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", help="Earlier results file to compare with")
+    parser.add_argument("--max-slowdown", type=float, default=10, help="Allowed wall time increase in %% (default: 10)")
+    parser.add_argument("--max-size-growth", type=float, default=5, help="Allowed output size increase in %% (default: 5)")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+
+    if shutil.which("ffmpeg") is None:
+        print("❌ Error: 'ffmpeg' is not recognized. Install FFmpeg and add it to your PATH.")
+        return 2
+
+    # ap_core lives next to the scripts
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+
+    durations = [int(d) for d in args.durations.split(",") if d]
+    formats = [f for f in args.formats.split(",") if f]
+    worker_counts = [int(w) for w in args.workers.split(",") if w]
+    settings = encoder_settings([s.strip() for s in args.settings.split(",") if s.strip()], args.use_gpu)
+
+    inputs = make_inputs(args.workdir, input_specs(durations, formats, not args.no_video))
+    media_seconds = sum(d for _, d in inputs)
+    print(f"📦 {len(inputs)} input(s), {media_seconds / 60:.1f} min of media; "
+          f"{len(settings)} setting(s) × {len(worker_counts)} worker count(s)\n")
+
+    results = []
+    print(f"   {'Setting':<36} {'Workers':>7} {'Wall':>8} {'CPU':>8} {'RTF':>7} {'Size':>9} {'Max RSS':>8}")
+    for setting in settings:
+        for workers in worker_counts:
+            case = {"encoder": setting, "workers": workers, "inputs": [p for p, _ in inputs]}
+            try:
+                runs = [spawn_case(case) for _ in range(max(1, args.repeat))]
+            except RuntimeError as e:
+                print(f"   ❌ {setting['name']} × {workers}: {e}")
+                continue
+            best = min(runs, key=lambda r: r["wall_seconds"])
+            r = dict(best, setting=setting["name"], workers=workers, media_seconds=media_seconds,
+                     realtime_factor=round(media_seconds / best["wall_seconds"], 1) if best["wall_seconds"] else None)
+            results.append(r)
+            cpu = f"{r['cpu_seconds']:.1f}s" if r["cpu_seconds"] is not None else "?"
+            peak = f"{r['max_child_rss_mb']:.0f} MB" if r["max_child_rss_mb"] is not None else "?"
+            print(f"   {setting['name'][:36]:<36} {workers:>7} {r['wall_seconds']:>7.1f}s {cpu:>8} "
+                  f"{r['realtime_factor']:>6}x {r['output_bytes'] / (1024 * 1024):>6.1f} MB {peak:>8}"
+                  + (f"  ({r['failed']} failed)" if r["failed"] else ""))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "ffmpeg": ffmpeg_version(),
+        "inputs": [{"file": os.path.basename(p), "seconds": d} for p, d in inputs],
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read baseline {args.baseline}: {e}")
+            return 2
+        if baseline.get("host") != report["host"] or baseline.get("ffmpeg") != report["ffmpeg"]:
+            print("⚠️ Baseline comes from another host or ffmpeg build; differences may not be regressions.")
+        if baseline.get("inputs") != report["inputs"]:
+            print("❌ Baseline was run on other inputs (--durations/--formats/--no-video); nothing to compare.")
+            return 2
+        problems = compare(results, baseline, args.max_slowdown, args.max_size_growth)
+        if problems:
+            print("❗ Regressions against the baseline:")
+            for line in problems:
+                print(f"   {line}")
+            return 1
+        print("✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
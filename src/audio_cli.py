@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+USAGE EXAMPLES:
+---------------
+1. Extract audio from every video in the current directory:
+   python audio_cli.py
+
+2. A whole tree, all cores:
+   python audio_cli.py "D:/Path/To/Media" --recursive
+
+3. Small mono Opus files for lectures:
+   python audio_cli.py --recursive --profile speech
+
+4. Always re-encode to mp3 (the old extract_audio.ps1 behaviour):
+   python audio_cli.py --profile mp3
+
+5. Redo outputs even when they are up to date:
+   python audio_cli.py --overwrite
+
+Note: Requires 'ap_core' module and 'ffmpeg'/'ffprobe' installed in system PATH.
+"""
+import os
+import sys
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Attempt to import ap_core; handle error if missing
+try:
+    from ap_core import extract_audio, AUDIO_ENCODE_PROFILES
+except ImportError:
+    print("❌ Error: 'ap_core' module not found.")
+    print("   Make sure ap_core.py is in the same folder as this script.")
+    sys.exit(1)
+
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".mkv")
+
+
+def check_dependencies():
+    """Checks if ffmpeg and ffprobe are available in the system PATH."""
+    for tool in ("ffmpeg", "ffprobe"):
+        if shutil.which(tool) is None:
+            print(f"❌ Error: '{tool}' is not recognized.")
+            print("   Please install FFmpeg and add it to your PATH environment variable.")
+            sys.exit(1)
+
+
+def is_video_file(name: str) -> bool:
+    return name.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def collect_files(directory: str, recursive: bool):
+    tasks = []
+
+    if recursive:
+        for root, _, files in os.walk(directory):
+            for f in files:
+                if is_video_file(f) and "_black" not in f:
+                    tasks.append(os.path.normpath(os.path.abspath(os.path.join(root, f))))
+    else:
+        for f in os.listdir(directory):
+            full = os.path.join(directory, f)
+            if os.path.isfile(full) and is_video_file(f) and "_black" not in f:
+                tasks.append(os.path.normpath(os.path.abspath(full)))
+
+    return tasks
+
+
+def worker(path: str, profile: str, overwrite: bool):
+    # Runs in a child process; ffmpeg does the heavy lifting there
+    return extract_audio(path, profile=profile, overwrite=overwrite)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extract audio tracks from video files (stream copy when possible)."
+    )
+
+    parser.add_argument(
+        "directory",
+        nargs='?',
+        default='.',
+        help="The directory to process (defaults to current directory if not specified)"
+    )
+    parser.add_argument("--recursive", action="store_true", help="Search subdirectories recursively")
+    parser.add_argument("--overwrite", action="store_true", help="Re-extract even if the output is up to date")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of parallel processes (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["auto"] + sorted(AUDIO_ENCODE_PROFILES),
+        default="auto",
+        help="auto = copy aac/opus/mp3 as-is, else mp3; speech = mono 24k Opus; mp3 = always re-encode",
+    )
+
+    args = parser.parse_args()
+
+    check_dependencies()
+
+    target_dir = os.path.abspath(args.directory)
+    if not os.path.isdir(target_dir):
+        print(f"❌ Not a directory: {target_dir}")
+        return
+
+    print(f"📂 Processing directory: {target_dir}")
+    files = collect_files(target_dir, args.recursive)
+    print(f"🔍 Found {len(files)} video file(s). Using {args.workers} worker(s), profile '{args.profile}'.")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(worker, p, args.profile, args.overwrite): p for p in files}
+        for f in as_completed(futures):
+            try:
+                if f.result() is None:
+                    failed += 1
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ Error processing file:\n   Path: {futures[f]}\n   Error: {e}")
+
+    print(f"\n🎯 Done extracting audio. {len(files) - failed}/{len(files)} succeeded.")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,15 @@ USAGE EXAMPLES:
 5. Overwrite existing black videos:
    python black_videos_cli.py --overwrite
 
+6. Take the file list from the inventory catalog instead of walking the disk:
+   python black_videos_cli.py output_videos --recursive --inventory
+
+7. Record a per-file trace (summarize with: python ap_trace.py report black.jsonl):
+   python black_videos_cli.py --recursive --trace black.jsonl
+
+8. Re-run the one-time encoder benchmark (after an ffmpeg or GPU driver change):
+   python black_videos_cli.py --retune
+
 Note: Requires 'ap_core' module and 'ffmpeg' installed in system PATH.
 """
 import os
@@ -28,9 +37,12 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Attempt to import ap_core; handle error if missing
 try:
+    import ap_trace as trace
     from ap_core import (
         create_black_video,
         create_black_video_from_audio,
+        black_encoder_settings,
+        configure_ffmpeg,
     )
 except ImportError:
     print("❌ Error: 'ap_core' module not found.")
@@ -85,6 +97,27 @@ def collect_files(directory: str, recursive: bool):
     return tasks
 
 
+def collect_files_from_inventory(directory: str, recursive: bool, overwrite: bool):
+    """
+    Same selection as collect_files, answered by the inventory catalog
+    (see inventory.py).  Files that already have a black version are left
+    out unless overwriting.
+    """
+    from inventory import Inventory
+
+    with Inventory(directory) as inv:
+        rows = inv.files(
+            extensions=list(VIDEO_EXTENSIONS + AUDIO_AS_VIDEO_EXTENSIONS),
+            include_black=False,
+        )
+        return [
+            os.path.normpath(inv.abspath(row["path"]))
+            for row in rows
+            if (recursive or "/" not in row["path"])
+            and (overwrite or not row["has_black"])
+        ]
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Create black-screen videos from video files and audio files."
@@ -100,8 +133,16 @@ def main():
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing _black files")
     parser.add_argument("--workers", type=int, default=4, help="Number of concurrent threads (default: 4)")
     parser.add_argument("--use-gpu", action="store_true", help="Enable GPU acceleration if supported")
+    parser.add_argument("--inventory", action="store_true", help="List files from the inventory catalog (inventory.py scan)")
+    parser.add_argument("--trace", help="Append a JSONL trace of every file to this file (or set AP_TRACE)")
+    parser.add_argument("--stall-timeout", type=float,
+                        help="Restart an ffmpeg run whose output stops advancing for N seconds "
+                             "(default: 120 or $AP_FFMPEG_STALL; 0 disables)")
+    parser.add_argument("--retune", action="store_true", help="Benchmark the encoder settings again instead of using the cached choice")
 
     args = parser.parse_args()
+    trace.configure("black", args.trace)
+    configure_ffmpeg(stall_seconds=args.stall_timeout)
     
     # 1. Check for FFmpeg first to avoid WinError 2
     check_dependencies()
@@ -114,9 +155,21 @@ def main():
         return
 
     print(f"📂 Processing directory: {target_dir}")
-    files = collect_files(target_dir, args.recursive)
+    if args.inventory:
+        from inventory import Inventory
+        if not Inventory.exists_for(target_dir):
+            print(f"❌ No inventory in {target_dir}. Run: python inventory.py scan \"{target_dir}\"")
+            return
+        files = collect_files_from_inventory(target_dir, args.recursive, args.overwrite)
+    else:
+        files = collect_files(target_dir, args.recursive)
     print(f"🔍 Found {len(files)} media file(s).")
 
+    # Pick (or load) the encoder settings once, before the workers start
+    if files or args.retune:
+        encoder = black_encoder_settings(args.use_gpu, retune=args.retune)
+        print(f"🎛️ Encoder: {encoder['name']}")
+
     def worker(path: str):
         try:
             # Double check file existence before processing
@@ -124,18 +177,19 @@ def main():
                 print(f"⚠️ Skipped (Not Found): {path}")
                 return
 
-            if is_video_file(path):
-                create_black_video(
-                    path,
-                    overwrite=args.overwrite,
-                    use_gpu=args.use_gpu,
-                )
-            elif is_audio_as_video(path):
-                create_black_video_from_audio(
-                    path,
-                    overwrite=args.overwrite,
-                    use_gpu=args.use_gpu,
-                )
+            with trace.job(os.path.basename(path), bytes=os.path.getsize(path)):
+                if is_video_file(path):
+                    create_black_video(
+                        path,
+                        overwrite=args.overwrite,
+                        use_gpu=args.use_gpu,
+                    )
+                elif is_audio_as_video(path):
+                    create_black_video_from_audio(
+                        path,
+                        overwrite=args.overwrite,
+                        use_gpu=args.use_gpu,
+                    )
         except Exception as e:
             # Print the full path to debug specific file issues
             print(f"⚠️ Error processing file:\n   Path: {path}\n   Error: {e}")
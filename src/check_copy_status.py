@@ -1,61 +1,450 @@
+"""
+USAGE EXAMPLES:
+---------------
+1. Verify the pendrive against output_videos (size, then hash):
+   python check_copy_status.py
+
+2. Only compare sizes (no hashing):
+   python check_copy_status.py --quick
+
+3. Any two folders, saving the diff:
+   python check_copy_status.py --source ./output_videos --dest /Volumes/USB/AP --report diff.txt
+
+4. Copy whatever is missing or different (resumes half-copied files):
+   python check_copy_status.py copy
+"""
 import os
-import platform
+import sys
+import json
+import time
+import errno
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 SOURCE_PATH = '/Users/aakashjadhav/Documents/GitHub/m3u8DownloaderScript/src/output_videos'
 DEST_PATH = '/Volumes/500GB - PENDRIVE/AP'
 
+# Source hashes survive between runs here (inside SOURCE_PATH)
+CACHE_FILENAME = '.copy_status_cache.json'
+
+# Large sequential reads are what USB sticks and spinning disks like best
+READ_SIZE = 8 * 1024 * 1024
+
+# Copy tuning: big aligned buffers, flush to the device every FSYNC_EVERY bytes
+COPY_BUFFER = 16 * 1024 * 1024
+FSYNC_EVERY = 256 * 1024 * 1024
+RESUME_PROBE = 1024 * 1024
+PART_SUFFIX = '.part'
+
+MISSING = "MISSING"
+SIZE_MISMATCH = "SIZE-MISMATCH"
+HASH_MISMATCH = "HASH-MISMATCH"
+UNREADABLE = "UNREADABLE"
+
+
 def normalize(name):
     """Handles minor naming differences (strips extra spaces)."""
     return name.strip()
 
-print("--- Checking for Missing Folders ---\n")
-
-# 1. Check if paths exist
-if not os.path.exists(SOURCE_PATH):
-    print(f"❌ Error: Source path not found: {SOURCE_PATH}")
-    exit()
-if not os.path.exists(DEST_PATH):
-    print(f"❌ Error: Pendrive path not found: {DEST_PATH}")
-    exit()
-
-# 2. Get the list of folders currently on the Pendrive
-# We use a 'set' for fast checking
-dest_folders = set(normalize(f) for f in os.listdir(DEST_PATH) if not f.startswith('.'))
-
-# 3. Find what is missing
-missing_folders = []
-
-# Scan source folders
-for item in os.listdir(SOURCE_PATH):
-    if item.startswith('.'): continue # Skip hidden files
-    
-    full_path = os.path.join(SOURCE_PATH, item)
-    
-    if os.path.isdir(full_path):
-        normalized_name = normalize(item)
-        
-        # If the name is NOT in the destination list, it's missing
-        if normalized_name not in dest_folders:
-            missing_folders.append(item)
-
-# 4. Sort the missing list Alphabetically (A-Z)
-missing_folders.sort()
-
-# --- Output Results ---
-if not missing_folders:
-    print("🎉 Good news: No folders are missing. Your Pendrive is up to date.")
-else:
-    print(f"⚠️ Found {len(missing_folders)} missing folders.")
-    print("Here they are (sorted alphabetically):\n")
-    
-    for name in missing_folders:
-        print(f"[MISSING] {name}")
-
-    # Save to a file on Desktop
-    output_file = os.path.join(os.path.expanduser('~'), 'Desktop', 'missing_folders.txt')
-    with open(output_file, 'w') as f:
-        for name in missing_folders:
-            f.write(f"{name}\n")
-    
-    print(f"\n📄 I have also saved this list to: {output_file}")
\ No newline at end of file
+
+def list_files(root):
+    """
+    Returns {normalized relative path: absolute path} for every non-hidden file
+    under root.  Folder names are normalized so ' Course ' matches 'Course'.
+    """
+    found = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        rel_dir = os.path.relpath(dirpath, root)
+        parts = [] if rel_dir == '.' else [normalize(p) for p in rel_dir.split(os.sep)]
+        for f in files:
+            if f.startswith('.'):
+                continue
+            found["/".join(parts + [normalize(f)])] = os.path.join(dirpath, f)
+    return found
+
+
+def list_files_from_inventory(root):
+    """list_files() answered by the inventory catalog (media files only)."""
+    from inventory import Inventory
+
+    with Inventory(root) as inv:
+        return {
+            "/".join(normalize(p) for p in row["path"].split("/")): inv.abspath(row["path"])
+            for row in inv.files()
+        }
+
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(READ_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+class HashCache:
+    """
+    Persistent {path: {size, mtime, hash}} store.  An entry is only trusted
+    while the file's size and mtime are unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, path, st):
+        entry = self.entries.get(path)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+            return entry['hash']
+        return None
+
+    def put(self, path, st, digest):
+        self.entries[path] = {'size': st.st_size, 'mtime': st.st_mtime, 'hash': digest}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def cached_hash(cache, path):
+    st = os.stat(path)
+    digest = cache.get(path, st)
+    if digest is None:
+        digest = hash_file(path)
+        cache.put(path, st, digest)
+    return digest
+
+
+def verify(source, dest, workers=4, quick=False, use_inventory=False):
+    """
+    Compares every file under source with its counterpart under dest.
+    Returns a sorted list of (status, relative path, detail).
+    """
+    src_files = list_files_from_inventory(source) if use_inventory else list_files(source)
+    dst_files = list_files(dest)
+    print(f"📂 Source: {len(src_files)} file(s) | Destination: {len(dst_files)} file(s)")
+
+    diff = []
+    same_size = []
+
+    # 1. Existence and size (cheap, metadata only)
+    for rel, src_path in src_files.items():
+        dst_path = dst_files.get(rel)
+        if dst_path is None:
+            diff.append((MISSING, rel, ""))
+            continue
+        src_size = os.path.getsize(src_path)
+        dst_size = os.path.getsize(dst_path)
+        if src_size != dst_size:
+            diff.append((SIZE_MISMATCH, rel, f"source {src_size} B, destination {dst_size} B"))
+        else:
+            same_size.append((rel, src_path, dst_path))
+
+    # 2. Content, only for files whose sizes already agree
+    if same_size and not quick:
+        cache = HashCache(os.path.join(source, CACHE_FILENAME))
+        print(f"🔐 Hashing {len(same_size)} file pair(s) with {workers} worker(s)...")
+
+        def compare(item):
+            rel, src_path, dst_path = item
+            # One bad sector must not abort the check of every other file
+            try:
+                src_digest = cached_hash(cache, src_path)
+            except OSError as e:
+                return rel, None, None, f"source: {e}"
+            try:
+                return rel, src_digest, hash_file(dst_path), None
+            except OSError as e:
+                return rel, None, None, f"destination: {e}"
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                for rel, src_digest, dst_digest, error in ex.map(compare, same_size):
+                    if error:
+                        diff.append((UNREADABLE, rel, error))
+                    elif src_digest != dst_digest:
+                        diff.append((HASH_MISMATCH, rel, f"{src_digest[:12]} != {dst_digest[:12]}"))
+        finally:
+            cache.save()
+
+    diff.sort(key=lambda d: d[1])
+    return diff
+
+
+def print_diff(diff):
+    if not diff:
+        print("🎉 Good news: Every file matches. Your Pendrive is up to date.")
+        return
+
+    counts = {}
+    for status, rel, detail in diff:
+        counts[status] = counts.get(status, 0) + 1
+        print(f"[{status}] {rel}" + (f"  ({detail})" if detail else ""))
+
+    summary = ", ".join(f"{n} {status.lower()}" for status, n in sorted(counts.items()))
+    print(f"\n⚠️ Found {len(diff)} difference(s): {summary}")
+
+
+def write_report(diff, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for status, rel, detail in diff:
+            f.write(f"{status}\t{rel}\t{detail}\n")
+    print(f"📄 Diff saved to: {path}")
+
+
+# ---------- Copy ----------
+
+# errno values meaning "this fast path is not available here, fall back"
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK, errno.EBADF}
+
+
+def _copy_chunk(src_fd, dst_fd, length, mode):
+    """
+    Copies up to `length` bytes from the current position of src_fd to dst_fd.
+    Returns (bytes copied, mode that worked).  Modes degrade
+    copy_file_range -> sendfile -> read/write.
+    """
+    if mode == "copy_file_range":
+        try:
+            return os.copy_file_range(src_fd, dst_fd, length), mode
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            mode = "sendfile"
+
+    if mode == "sendfile":
+        try:
+            offset = os.lseek(src_fd, 0, os.SEEK_CUR)
+            n = os.sendfile(dst_fd, src_fd, offset, length)
+            os.lseek(src_fd, offset + n, os.SEEK_SET)
+            return n, mode
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            mode = "buffered"
+
+    data = os.read(src_fd, length)
+    view = memoryview(data)
+    while view:
+        written = os.write(dst_fd, view)
+        view = view[written:]
+    return len(data), mode
+
+
+def _initial_mode():
+    if hasattr(os, "copy_file_range"):
+        return "copy_file_range"
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        return "sendfile"
+    return "buffered"
+
+
+def resume_offset(src_path, part_path):
+    """
+    How many bytes of part_path can be kept.  The last RESUME_PROBE bytes are
+    compared with the source so a garbage tail (USB yanked mid-write) forces
+    a restart instead of being kept.
+    """
+    if not os.path.exists(part_path):
+        return 0
+
+    size = os.path.getsize(part_path)
+    if size > os.path.getsize(src_path):
+        return 0
+
+    start = max(0, size - RESUME_PROBE)
+    with open(src_path, 'rb') as a, open(part_path, 'rb') as b:
+        a.seek(start)
+        b.seek(start)
+        if a.read(size - start) != b.read(size - start):
+            return 0
+    return size
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # directories can't be fsynced on every platform
+    finally:
+        os.close(fd)
+
+
+class FsyncBatcher:
+    """
+    Finished .part files are flushed and renamed in batches: one fsync round
+    per FSYNC_EVERY bytes instead of one per file, while a crash still never
+    leaves a final-named file with unflushed data.
+    """
+
+    def __init__(self, threshold=FSYNC_EVERY):
+        self.threshold = threshold
+        self.pending = []
+        self.pending_bytes = 0
+
+    def add(self, part_path, final_path, mtime, nbytes):
+        self.pending.append((part_path, final_path, mtime))
+        self.pending_bytes += nbytes
+        if self.pending_bytes >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        for part_path, _, _ in self.pending:
+            _fsync_path(part_path)
+
+        folders = set()
+        for part_path, final_path, mtime in self.pending:
+            os.replace(part_path, final_path)
+            os.utime(final_path, (mtime, mtime))
+            folders.add(os.path.dirname(final_path))
+
+        if os.name == "posix":
+            for folder in folders:
+                _fsync_path(folder)
+
+        self.pending = []
+        self.pending_bytes = 0
+
+
+def copy_file(src_path, dst_path, batcher, mode):
+    """
+    Streams one file into dst_path + '.part', resuming from whatever is
+    already there, and hands it to the batcher.  Returns (bytes written, mode).
+    """
+    part_path = dst_path + PART_SUFFIX
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+
+    offset = resume_offset(src_path, part_path)
+    src_size = os.path.getsize(src_path)
+    if offset:
+        print(f"    ↪ Resuming at {offset / (1024 * 1024):.1f} MB")
+
+    src_fd = os.open(src_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    dst_fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+    written = 0
+    try:
+        os.ftruncate(dst_fd, offset)
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        remaining = src_size - offset
+        while remaining:
+            n, mode = _copy_chunk(src_fd, dst_fd, min(remaining, COPY_BUFFER), mode)
+            if n == 0:
+                raise IOError(f"Source shrank while copying: {src_path}")
+            remaining -= n
+            written += n
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+
+    batcher.add(part_path, dst_path, os.path.getmtime(src_path), written)
+    return written, mode
+
+
+def copy_missing(source, dest, diff, use_inventory=False):
+    """Copies every file listed in diff from source to dest, one file at a time."""
+    src_files = list_files_from_inventory(source) if use_inventory else list_files(source)
+    dst_files = list_files(dest)
+    batcher = FsyncBatcher()
+    mode = _initial_mode()
+
+    todo = [(status, rel) for status, rel, _ in diff]
+    total = 0
+    failed = 0
+    started = time.perf_counter()
+
+    for i, (status, rel) in enumerate(todo, start=1):
+        src_path = src_files[rel]
+        dst_path = dst_files.get(rel) or os.path.join(dest, *rel.split("/"))
+        part_path = dst_path + PART_SUFFIX
+
+        # A short destination file is just an unfinished copy; keep its bytes.
+        if status == SIZE_MISMATCH and not os.path.exists(part_path) \
+                and os.path.getsize(dst_path) < os.path.getsize(src_path):
+            os.replace(dst_path, part_path)
+        elif status in (HASH_MISMATCH, UNREADABLE) and os.path.exists(part_path):
+            os.remove(part_path)
+
+        print(f"📥 ({i}/{len(todo)}) {rel}")
+        file_started = time.perf_counter()
+        try:
+            written, mode = copy_file(src_path, dst_path, batcher, mode)
+        except OSError as e:
+            failed += 1
+            print(f"    ❌ Copy failed: {e}")
+            continue
+
+        total += written
+        seconds = time.perf_counter() - file_started
+        print(f"    ✔ {written / (1024 * 1024):.1f} MB in {seconds:.1f}s ({_rate(written, seconds)})")
+
+    batcher.flush()
+    elapsed = time.perf_counter() - started
+    print(f"\n🎯 Copied {len(todo) - failed}/{len(todo)} file(s): "
+          f"{total / (1024 * 1024):.1f} MB in {elapsed:.1f}s, sustained {_rate(total, elapsed)} [{mode}]")
+    return failed
+
+
+def _rate(nbytes, seconds):
+    return f"{nbytes / (1024 * 1024) / seconds:.1f} MB/s" if seconds else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify (and copy) output_videos to the pendrive, file by file.")
+    parser.add_argument("command", nargs="?", default="verify", choices=["verify", "copy"], help="What to do (default: verify)")
+    parser.add_argument("--source", default=SOURCE_PATH, help="Folder that was copied (default: output_videos)")
+    parser.add_argument("--dest", default=DEST_PATH, help="Copy to check (default: the pendrive)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel hashing threads (default: 4)")
+    parser.add_argument("--quick", action="store_true", help="Compare sizes only, skip hashing")
+    parser.add_argument("--report", help="Also write the diff to this file")
+    parser.add_argument("--inventory", action="store_true", help="List source media files from the inventory catalog")
+    args = parser.parse_args()
+
+    # 1. Check if paths exist
+    if not os.path.exists(args.source):
+        print(f"❌ Error: Source path not found: {args.source}")
+        sys.exit(2)
+    if not os.path.exists(args.dest):
+        print(f"❌ Error: Pendrive path not found: {args.dest}")
+        sys.exit(2)
+
+    print("--- Checking Copy Status ---\n")
+    diff = verify(args.source, args.dest, workers=args.workers, quick=args.quick, use_inventory=args.inventory)
+    print_diff(diff)
+
+    if args.report:
+        write_report(diff, args.report)
+
+    if args.command == "copy" and diff:
+        print("\n--- Copying ---\n")
+        sys.exit(1 if copy_missing(args.source, args.dest, diff, use_inventory=args.inventory) else 0)
+
+    sys.exit(1 if diff else 0)
+
+
+if __name__ == "__main__":
+    main()
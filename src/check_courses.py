@@ -14,34 +14,64 @@ CONFIG = {
     # We define this carefully. Note the double backslash \\ inside the string for the literal backslash.
     # Python Raw String: r"[!@#$%^&()[\]{};',.`~+=|/\\*?<>:\"]"
     "PATTERN_SYMBOLS": r"[!@#$%^&()[\]{};',.`~+=|/\\*?<>:\"]",
+
+    # 3. Near-match settings for renamed / truncated titles
+    "NGRAM_SIZE": 3,
+    "FUZZY_THRESHOLD": 0.8,
+    # n-grams shared by more folders than this (or 5% of them) are not indexed
+    "MAX_POSTING": 50,
 }
 
 class Sanitizer:
-    @staticmethod
-    def clean(text):
+    """
+    Normalization pipeline, compiled once.  The browser side runs the same
+    three steps with the same patterns (see generate_js_snippet).
+    """
+    PREFIX = re.compile(CONFIG["PATTERN_PREFIX"], re.IGNORECASE)
+    SYMBOLS = re.compile(CONFIG["PATTERN_SYMBOLS"])
+    SPACES = re.compile(r'\s+')
+
+    @classmethod
+    def clean(cls, text):
         """
         Applies cleaning logic in Python.
         """
         if not text: return ""
         
         # 1. Remove Prefixes
-        text = re.sub(CONFIG["PATTERN_PREFIX"], "", text, flags=re.IGNORECASE)
+        text = cls.PREFIX.sub("", text)
         
         # 2. Remove Symbols
-        text = re.sub(CONFIG["PATTERN_SYMBOLS"], "", text)
+        text = cls.SYMBOLS.sub("", text)
         
         # 3. Collapse Spaces
-        text = re.sub(r'\s+', ' ', text)
+        text = cls.SPACES.sub(' ', text)
         
         return text.strip()
 
-def get_local_folders(path):
+def get_local_folders(path, use_inventory=False):
+    """
+    Sanitized names of the course folders under path.  With use_inventory,
+    read from the inventory catalog (inventory.py scan) instead of listing
+    the disk; courses added since the last scan are then missing.
+    """
     if not os.path.exists(path):
         print(f"❌ [ERROR] Path not found: {path}")
         return []
 
     clean_names = []
-    raw_folders = [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
+
+    raw_folders = None
+    if use_inventory:
+        from inventory import Inventory
+        if Inventory.exists_for(path):
+            with Inventory(path) as inv:
+                raw_folders = inv.courses()
+            print("📚 Using inventory catalog.")
+        else:
+            print("⚠️ No inventory found (run: python inventory.py scan). Listing the disk instead.")
+    if raw_folders is None:
+        raw_folders = [f for f in os.listdir(path) if os.path.isdir(os.path.join(path, f))]
 
     print(f"📂 Found {len(raw_folders)} local folders. Sanitizing...")
 
@@ -52,8 +82,37 @@ def get_local_folders(path):
             
     return clean_names
 
+def ngrams(text, n=None):
+    """Character n-grams of the lowercased, space-padded text (must match the JS `grams`)."""
+    n = n or CONFIG["NGRAM_SIZE"]
+    padded = f" {text.lower()} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def build_catalog(folder_list):
+    """
+    Builds the lookup data embedded in the snippet:
+      names - unique sanitized names (the browser turns them into a Set)
+      sizes - n-gram count per name
+      grams - n-gram -> indexes into names, skipping grams so common that
+              they would make every lookup scan most of the catalog
+    """
+    names = sorted(set(folder_list))
+    sizes = []
+    postings = {}
+
+    for index, name in enumerate(names):
+        grams = ngrams(name)
+        sizes.append(len(grams))
+        for gram in grams:
+            postings.setdefault(gram, []).append(index)
+
+    limit = max(CONFIG["MAX_POSTING"], int(len(names) * 0.05))
+    grams = {gram: ids for gram, ids in postings.items() if len(ids) <= limit}
+
+    return {"names": names, "sizes": sizes, "grams": grams}
+
 def generate_js_snippet(folder_list):
-    names_json = json.dumps(folder_list, ensure_ascii=False)
+    catalog_json = json.dumps(build_catalog(folder_list), ensure_ascii=False, separators=(",", ":"))
     
     # --- KEY FIX ---
     # We need to construct the JS RegExp object safely.
@@ -71,7 +130,10 @@ def generate_js_snippet(folder_list):
 
     return f"""
 (function() {{
-    const localFolders = {names_json};
+    const catalog = {catalog_json};
+    const localFolders = new Set(catalog.names);
+    const N = {CONFIG["NGRAM_SIZE"]};
+    const FUZZY = {CONFIG["FUZZY_THRESHOLD"]};
     
     // Define Regex using the RegExp constructor to avoid slash escaping hell
     const prefixRegex = new RegExp("{js_prefix_pattern}", "gi");
@@ -85,13 +147,40 @@ def generate_js_snippet(folder_list):
             .trim();
     }};
 
+    // Same n-grams as Python's ngrams(): code points, lowercased, space padded
+    const grams = (text) => {{
+        const chars = Array.from(" " + text.toLowerCase() + " ");
+        const out = new Set();
+        for (let i = 0; i + N <= chars.length; i++) out.add(chars.slice(i, i + N).join(""));
+        return out;
+    }};
+
+    // Best near-match via the n-gram index: Dice similarity, or overlap for
+    // long titles that were truncated on one side.
+    const nearMatch = (cleanTitle) => {{
+        const titleGrams = grams(cleanTitle);
+        const hits = new Map();
+        titleGrams.forEach(g => (catalog.grams[g] || []).forEach(id => hits.set(id, (hits.get(id) || 0) + 1)));
+
+        let best = null, bestScore = 0;
+        hits.forEach((common, id) => {{
+            const size = catalog.sizes[id];
+            const dice = 2 * common / (titleGrams.size + size);
+            const smaller = Math.min(titleGrams.size, size);
+            const overlap = smaller >= 10 ? common / smaller : 0;
+            const score = Math.max(dice, overlap - 0.1);
+            if (score > bestScore) {{ bestScore = score; best = id; }}
+        }});
+        return bestScore >= FUZZY ? catalog.names[best] : null;
+    }};
+
     const selectors = ['span.font-hi', '.line-clamp-1.leading-normal', 'div.flex-col > span'];
     let elements = [];
     
     selectors.forEach(s => elements = [...elements, ...Array.from(document.querySelectorAll(s))]);
     const uniqueSpans = [...new Set(elements)];
 
-    console.log(`Processing ${{uniqueSpans.length}} elements against ${{localFolders.length}} local folders...`);
+    console.log(`Processing ${{uniqueSpans.length}} elements against ${{localFolders.size}} local folders...`);
 
     uniqueSpans.forEach(span => {{
         const title = span.innerText.trim();
@@ -100,10 +189,18 @@ def generate_js_snippet(folder_list):
         const cleanTitle = clean(title);
         const card = span.closest('a') || span.parentElement;
 
-        if (localFolders.includes(cleanTitle)) {{
+        if (localFolders.has(cleanTitle)) {{
             card.style.opacity = "0.2";
             card.style.filter = "grayscale(100%)";
             card.style.pointerEvents = "none"; 
+            return;
+        }}
+
+        const near = nearMatch(cleanTitle);
+        if (near) {{
+            card.style.opacity = "0.5";
+            card.style.border = "4px dashed #F59E0B";
+            card.title = `Probably downloaded as: ${{near}}`;
         }} else {{
             card.style.border = "4px solid #E11D48"; 
             card.style.boxShadow = "0 0 10px rgba(225, 29, 72, 0.5)";
@@ -115,7 +212,14 @@ def generate_js_snippet(folder_list):
 """
 
 if __name__ == "__main__":
-    folders = get_local_folders(CONFIG["LOCAL_DIRECTORY"])
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Copy a browser snippet that marks courses already downloaded")
+    parser.add_argument("directory", nargs="?", default=CONFIG["LOCAL_DIRECTORY"], help="Folder holding the course folders")
+    parser.add_argument("--inventory", action="store_true", help="List courses from the inventory catalog (inventory.py scan)")
+    args = parser.parse_args()
+
+    folders = get_local_folders(args.directory, use_inventory=args.inventory)
     
     if folders:
         js_code = generate_js_snippet(folders)
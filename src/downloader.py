@@ -1,86 +1,581 @@
 import os
 import sys
+import json
+import time
+import hashlib
 import argparse
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import ap_plan
+import ap_trace as trace
 from ap_core import (
     parse_url_parts,
     ensure_dir,
     download_with_ffmpeg,
-    run_in_parallel,
+    configure_ffmpeg,
+    download_hls,
+    partial_path_for,
+    rest_path_for,
+    probe_duration,
+    playlist_duration,
+    check_duration,
+    run_streaming,
+    ResizableLimiter,
+    ThroughputMonitor,
+    AutoScaler,
 )
 
 OUTPUT_ROOT = "output_videos"
+VERIFY_CACHE = ".verify_cache.json"
 
-def download_item(item_data, folder_override=None):
+# In-progress files of --fragmented downloads
+PARTIAL_SUFFIXES = (".part.mp4", ".rest.mp4", ".join.mp4")
+
+# Bytes downloaded by this run, for the throughput history --plan projects with
+_session = {"bytes": 0}
+_session_lock = threading.Lock()
+
+# Set from the main thread on Ctrl+C; --live captures run in pool threads and
+# never see the KeyboardInterrupt themselves
+_live_stop = threading.Event()
+
+
+# ---------- Task input ----------
+
+def parse_entry(entry):
+    """'URL' or 'URL|filename' -> (url, name, folder, mirrors)."""
+    url, name = entry.split("|", 1) if "|" in entry else (entry, None)
+    return url, name, None, None
+
+
+def iter_manifest(path):
     """
-    Handles the direct download of a single video item.
+    Yields (url, name, folder, mirrors) one line at a time from a text file
+    of 'URL|filename' lines or a JSONL manifest ({"url": ..., "name": ...,
+    "folder": ..., "mirrors": [...]} per line).  Both may be mixed; '-'
+    reads stdin and lines starting with '#' are comments.
+    """
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if not line.startswith("{"):
+                yield parse_entry(line)
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                print(f"⚠️ Skipping line {lineno}: invalid JSON ({e})")
+                continue
+            if entry.get("url"):
+                yield entry["url"], entry.get("name"), entry.get("folder"), entry.get("mirrors")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def iter_tasks(urls, manifest):
+    for entry in urls or []:
+        yield parse_entry(entry)
+    if manifest:
+        yield from iter_manifest(manifest)
+
+
+def unique_tasks(tasks):
+    """
+    Streaming de-duplication by URL.  Only an 8-byte digest per URL is kept,
+    so even million-line manifests stay small in memory.
+    """
+    seen = set()
+    for task in tasks:
+        key = hashlib.blake2b(task[0].encode("utf-8"), digest_size=8).digest()
+        if key not in seen:
+            seen.add(key)
+            yield task
+
+
+# ---------- Verification ----------
+
+class VerifyCache:
+    """
+    Persistent {relative path: {size, mtime, url, expected, duration, ok}}
+    store in OUTPUT_ROOT.  A verdict is only trusted while the file's size
+    and mtime are unchanged; the playlist duration is kept per URL.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, rel):
+        with self._lock:
+            return self.entries.get(rel)
+
+    def put(self, rel, **entry):
+        with self._lock:
+            self.entries[rel] = entry
+            self.dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+def verify_file(mp4_path, url, cache):
     """
-    url, custom_name = item_data
+    Compares the file's ffprobe duration with the playlist's #EXTINF total.
+    Returns (ok, detail); unchanged files reuse the cached verdict.
+    """
+    with trace.span("verify") as span:
+        ok, detail = _verify_file(mp4_path, url, cache)
+        span["status"] = "ok" if ok else "failed"
+        span["detail"] = detail
+    return ok, detail
+
+
+def _verify_file(mp4_path, url, cache):
+    rel = os.path.relpath(mp4_path, OUTPUT_ROOT).replace(os.sep, "/")
+    st = os.stat(mp4_path)
+    entry = cache.get(rel) or {}
+    url = url or entry.get("url")
+
+    if entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime and entry.get("url") == url:
+        return entry["ok"], entry["detail"] + " (cached)"
+
+    expected = entry.get("expected") if url and entry.get("url") == url else None
+    if url and expected is None:
+        expected = playlist_duration(url)
+
+    ok, detail = check_duration(probe_duration(mp4_path), expected)
+    cache.put(rel, size=st.st_size, mtime=st.st_mtime, url=url,
+              expected=expected, ok=ok, detail=detail)
+    return ok, detail
+
+
+# ---------- Download ----------
+
+def task_paths(item_data, folder_override=None):
+    """(folder name, video name, mp4 path) a task downloads to."""
+    url, custom_name, task_folder = item_data[:3]
     parsed_folder, parsed_name = parse_url_parts(url)
-    
-    folder_name = folder_override if folder_override else parsed_folder
+    folder_name = folder_override or task_folder or parsed_folder
     video_name = custom_name if custom_name else parsed_name
+    return folder_name, video_name, os.path.join(OUTPUT_ROOT, folder_name, f"{video_name}.mp4")
 
-    final_folder = os.path.join(OUTPUT_ROOT, folder_name)
-    ensure_dir(final_folder)
 
-    mp4_path = os.path.join(final_folder, f"{video_name}.mp4")
-    
-    print(f"--- Downloading: {video_name} ---")
-    if os.path.exists(mp4_path):
-        print(f"    [Skip] Already exists: {mp4_path}")
-    else:
-        # Direct download via ffmpeg
-        if not download_with_ffmpeg(url, mp4_path):
+def fetch_video(url, mp4_path, engine="ffmpeg", mirrors=None, fragmented=False, live=False):
+    # fetch_verified retries failed downloads itself; ffmpeg only retries stalls
+    if engine == "python":
+        return download_hls(url, mp4_path, mirrors=mirrors, fragmented=fragmented, live=live,
+                            stop=_live_stop, retry_errors=False)
+    return download_with_ffmpeg(url, mp4_path, fragmented=fragmented, retry_errors=False)
+
+
+def fetch_verified(url, mp4_path, engine, mirrors, verifier, retries, fragmented=False, live=False):
+    """
+    Downloads, verifies and, when the download fails or the result is
+    truncated, deletes it and downloads again (up to `retries` more times).
+    This is the only retry of failed downloads; ffmpeg's watchdog only
+    restarts stalled ones.
+    """
+    for attempt in range(retries + 1):
+        if attempt:
+            print(f"    [Retry {attempt}/{retries}] {os.path.basename(mp4_path)}")
+        if not fetch_video(url, mp4_path, engine, mirrors, fragmented, live):
+            continue
+        if verifier is None:
+            return True
+        ok, detail = verifier(mp4_path, url)
+        if ok:
+            print(f"    ✔ Verified: {os.path.basename(mp4_path)} ({detail})")
+            return True
+        print(f"    ✖ Verification failed: {os.path.basename(mp4_path)} ({detail})")
+        try:
+            os.remove(mp4_path)
+        except OSError:
+            pass
+    return False
+
+
+def find_duplicate(index, url, rel):
+    """
+    --skip-duplicates: the library file whose audio matches the first
+    minutes of the stream, or None.  Any error just means "download it".
+    """
+    with trace.span("dedupe") as span:
+        try:
+            match = index.match_url(url, exclude=rel, expected=playlist_duration(url))
+        except (OSError, RuntimeError) as e:
+            span["status"] = "failed"
+            print(f"    [Dedupe] Could not fingerprint the stream start: {e}")
+            return None
+        span["status"] = "duplicate" if match else "unique"
+    return match
+
+
+def download_item(item_data, folder_override=None, catalog=None, monitor=None,
+                  engine="ffmpeg", mirrors=None, verifier=None, retries=0, fragmented=False,
+                  live=False, duplicates=None):
+    """
+    Handles the direct download of a single video item.
+    `catalog` is an optional Inventory.snapshot() consulted for the exists
+    check: incomplete files in it get downloaded again, complete ones are
+    skipped only if they are still on disk (deleted since the scan = redo).
+    `monitor` is the autoscaler's ThroughputMonitor, if autoscaling.
+    `mirrors` (--mirror) are added to the task's own manifest mirrors.
+    `verifier(mp4_path, url)` checks each finished file; failures are retried.
+    `fragmented` writes a playable, resumable .part.mp4 while downloading.
+    `live` captures a still-growing playlist until it ends (python engine).
+    `duplicates` is an ap_fingerprint.FingerprintIndex: streams whose start
+    matches a lecture already in the library are skipped, finished
+    downloads are added to it.
+    """
+    url, task_mirrors = item_data[0], item_data[3]
+    mirrors = list(task_mirrors or []) + list(mirrors or [])
+    if mirrors or live:
+        engine = "python"
+
+    folder_name, video_name, mp4_path = task_paths(item_data, folder_override)
+    ensure_dir(os.path.dirname(mp4_path))
+
+    with trace.job(f"{folder_name}/{video_name}", host=urlparse(url).netloc, engine=engine) as span:
+        print(f"--- Downloading: {video_name} ---")
+        complete = catalog.get(f"{folder_name}/{video_name}.mp4") if catalog is not None else None
+        if complete is False:
+            print(f"    [Redo] Inventory marks it incomplete: {mp4_path}")
+        elif complete and not os.path.exists(mp4_path):
+            print(f"    [Redo] In the inventory but no longer on disk: {mp4_path}")
+            complete = False
+        if complete or (complete is None and os.path.exists(mp4_path)):
+            print(f"    [Skip] Already exists: {mp4_path}")
+            span["status"] = "skipped"
+            return True
+
+        rel = f"{folder_name}/{video_name}.mp4"
+        if duplicates is not None and not live:
+            match = find_duplicate(duplicates, url, rel)
+            if match:
+                print(f"    [Skip] Same lecture as {match}")
+                span["status"] = "duplicate"
+                return True
+
+        if monitor is not None:
+            # The python engine and --fragmented write a .part.mp4 (and
+            # .rest.mp4 on resume) and only rename it at the end
+            with monitor.track(mp4_path, partial_path_for(mp4_path), rest_path_for(mp4_path)) as job:
+                job["ok"] = fetch_verified(url, mp4_path, engine, mirrors, verifier, retries, fragmented, live)
+            ok = job["ok"]
+        else:
+            # Direct download via ffmpeg
+            ok = fetch_verified(url, mp4_path, engine, mirrors, verifier, retries, fragmented, live)
+        if not ok:
             print(f"    [Error] Failed to download: {url}")
+            span["status"] = "failed"
+        else:
+            span["bytes"] = os.path.getsize(mp4_path)
+            with _session_lock:
+                _session["bytes"] += span["bytes"]
+            if duplicates is not None:
+                duplicates.add(rel)
+        return ok
 
-def main():
+
+def sweep_folder(folder, tasks, cache, workers, folder_override=None):
+    """
+    --verify-only: checks every downloaded mp4 under `folder` in parallel.
+    URLs come from the cache or, for files it has never seen, from the
+    given tasks.  Returns [(mp4 path, url or None, detail)] of failures.
+    """
+    urls = {}
+    for task in tasks:
+        urls[os.path.normpath(task_paths(task, folder_override)[2])] = task
+
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if d != "black" and not d.startswith(".")]
+        paths.extend(
+            os.path.normpath(os.path.join(root, f)) for f in files
+            if f.lower().endswith(".mp4") and "_black" not in f
+            and not f.lower().endswith(PARTIAL_SUFFIXES)
+        )
+    print(f"🔍 Verifying {len(paths)} file(s) with {workers} worker(s)...")
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {
+            ex.submit(verify_file, path, urls[path][0] if path in urls else None, cache): path
+            for path in sorted(paths)
+        }
+        for f in as_completed(futures):
+            path = futures[f]
+            ok, detail = f.result()
+            if not ok:
+                print(f"    ✖ {path}: {detail}")
+                failures.append((path, urls.get(path), detail))
+    return failures
+
+
+def verify_only(args, cache, verifier):
+    folder = os.path.join(OUTPUT_ROOT, args.folder) if args.folder else OUTPUT_ROOT
+    tasks = list(unique_tasks(iter_tasks(args.url, args.file)))
+    failures = sweep_folder(folder, tasks, cache, args.workers, folder_override=args.folder)
+
+    if not failures:
+        print("✅ Every file matches its playlist duration.")
+        return
+
+    # Requeue the failures whose source URL is known
+    requeue = []
+    for path, task, _ in failures:
+        url = task[0] if task else (cache.get(os.path.relpath(path, OUTPUT_ROOT).replace(os.sep, "/")) or {}).get("url")
+        if not url:
+            print(f"    ⚠️ No URL known for {path}; pass it with --url/--file to re-download.")
+            continue
+        os.remove(path)
+        requeue.append(task or (url, os.path.splitext(os.path.basename(path))[0],
+                                os.path.relpath(os.path.dirname(path), OUTPUT_ROOT), None))
+
+    print(f"❗ {len(failures)} file(s) failed verification, {len(requeue)} requeued.")
+    run_streaming(
+        lambda t: download_item(t, folder_override=args.folder, engine=args.engine,
+                                mirrors=args.mirror, verifier=verifier, retries=args.retries,
+                                fragmented=args.fragmented),
+        requeue,
+        max_workers=args.workers,
+    )
+
+
+# ---------- Worker mode (ap_queue coordinator) ----------
+
+# Give up when the coordinator stays unreachable this many polls in a row
+COORDINATOR_RETRIES = 6
+
+
+def work_for_coordinator(args, verifier, duplicates=None):
+    """
+    --coordinator: each of --workers threads leases a task, downloads it
+    like any other and reports the result, until the queue is drained.
+    Returns the number of tasks this machine finished.
+    """
+    from ap_queue import QueueClient
+
+    client = QueueClient(args.coordinator, token=args.queue_token)
+    print(f"🛰️ Worker {client.worker} taking tasks from {args.coordinator} with {args.workers} thread(s)")
+
+    def worker_loop():
+        finished = 0
+        failures = 0
+        while True:
+            try:
+                reply = client.lease()
+                failures = 0
+            except OSError as e:
+                failures += 1
+                if failures >= COORDINATOR_RETRIES:
+                    print(f"❌ Coordinator unreachable ({e}); stopping this worker thread")
+                    return finished
+                time.sleep(10)
+                continue
+
+            if not reply.get("tasks"):
+                if reply.get("drained"):
+                    return finished
+                time.sleep(reply.get("retry_after") or 5)
+                continue
+
+            t = reply["tasks"][0]
+            task = (t["url"], t["name"], t["folder"], t["mirrors"])
+            try:
+                ok = download_item(task, engine=args.engine, mirrors=args.mirror, verifier=verifier,
+                                   retries=args.retries, fragmented=args.fragmented, live=args.live,
+                                   duplicates=duplicates)
+            except Exception as e:
+                print(f"    [Error] {t['name']}: {e}")
+                ok = False
+            mp4_path = task_paths(task)[2]
+            nbytes = os.path.getsize(mp4_path) if ok and os.path.exists(mp4_path) else None
+            try:
+                client.complete(t["lease"], ok, nbytes, None if ok else "download failed")
+            except OSError as e:
+                print(f"⚠️ Could not report {t['name']} (its lease will expire): {e}")
+            finished += ok
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as ex:
+            return sum(f.result() for f in [ex.submit(worker_loop) for _ in range(args.workers)])
+    finally:
+        client.close()
+
+
+def plan_items(tasks, folder_override=None):
+    """(url, folder, mp4 path) per task, as ap_plan expects them."""
+    for task in tasks:
+        folder_name, _, mp4_path = task_paths(task, folder_override)
+        yield task[0], folder_name, mp4_path
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="High-Speed AP Video Downloader")
     
     parser.add_argument("--url", action="append", help="Format: 'URL' or 'URL|filename'")
-    parser.add_argument("--file", help="Text file with one 'URL|filename' per line")
+    parser.add_argument("--file", help="'URL|filename' lines or a JSONL manifest; '-' reads stdin")
     parser.add_argument("--folder", help="Target subfolder name")
-    parser.add_argument("--workers", type=int, default=4, help="Number of parallel downloads (default: 4)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of parallel downloads (default: 4; starting point with --autoscale)")
+    parser.add_argument("--autoscale", action="store_true", help="Adjust parallel downloads at runtime to maximize throughput")
+    parser.add_argument("--min-workers", type=int, default=1, help="Autoscale lower bound (default: 1)")
+    parser.add_argument("--max-workers", type=int, default=16, help="Autoscale upper bound (default: 16)")
+    parser.add_argument("--scale-interval", type=float, default=20, help="Seconds between autoscale decisions (default: 20)")
+    parser.add_argument("--inventory", action="store_true", help="Use the output_videos inventory catalog for exists checks")
+    parser.add_argument("--engine", choices=["ffmpeg", "python"], default="ffmpeg",
+                        help="python = fetch segments here with hedged requests and mirror failover, then remux")
+    parser.add_argument("--mirror", action="append", help="Mirror base URL for segments (repeatable; implies --engine python)")
+    parser.add_argument("--fragmented", action="store_true",
+                        help="Write fragmented MP4: playable while downloading, resumes after a crash")
+    parser.add_argument("--live", action="store_true",
+                        help="Capture live/event playlists as they grow, until #EXT-X-ENDLIST (implies --engine python)")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="Fingerprint the first minutes of each stream and skip lectures already in output_videos "
+                             "(index: python ap_fingerprint.py scan)")
+    parser.add_argument("--stall-timeout", type=float,
+                        help="Restart an ffmpeg download whose output stops advancing for N seconds "
+                             "(default: 120 or $AP_FFMPEG_STALL; 0 disables)")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the duration check after each download")
+    parser.add_argument("--retries", type=int, default=2, help="Re-downloads of a file that fails to download or verify (default: 2)")
+    parser.add_argument("--trace", help="Append a JSONL trace of every job to this file (or set AP_TRACE)")
+    parser.add_argument("--verify-only", action="store_true",
+                        help="Check existing files under output_videos (or --folder) and re-download failures")
+    parser.add_argument("--coordinator", help="Worker mode: lease tasks from an ap_queue.py coordinator at this URL")
+    parser.add_argument("--queue-token", default=os.environ.get("AP_QUEUE_TOKEN"),
+                        help="Shared secret of the coordinator (default: $AP_QUEUE_TOKEN)")
+    parser.add_argument("--plan", action="store_true",
+                        help="Dry run: fetch only the playlists and report size, disk per folder and projected time")
+    parser.add_argument("--rate", type=float, help="--plan: throughput in MB/s (default: measured on earlier runs)")
+    parser.add_argument("--window", type=float, help="--plan: hours available; reports whether the batch fits")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    trace.configure("downloader", args.trace)
+    configure_ffmpeg(stall_seconds=args.stall_timeout)
+    if args.mirror or args.live:
+        args.engine = "python"
+
+    catalog = None
+    course_exists = lambda name: os.path.exists(os.path.join(OUTPUT_ROOT, name))
+    if args.inventory:
+        from inventory import Inventory
+        if Inventory.exists_for(OUTPUT_ROOT):
+            with Inventory(OUTPUT_ROOT) as inv:
+                catalog = inv.snapshot()
+                courses = set(inv.courses())
+            course_exists = lambda name: name in courses
+        else:
+            print("⚠️ No inventory found (run: python inventory.py scan). Checking the disk instead.")
+
+    cache = VerifyCache(os.path.join(OUTPUT_ROOT, VERIFY_CACHE))
+    # A live window's #EXTINF total says nothing about how long the capture ran
+    verifier = None if args.no_verify or args.live else (lambda path, url: verify_file(path, url, cache))
+
+    duplicates = None
+    if args.skip_duplicates and not (args.verify_only or args.plan):
+        from ap_fingerprint import FingerprintIndex
+        ensure_dir(OUTPUT_ROOT)
+        duplicates = FingerprintIndex(OUTPUT_ROOT)
+        if not len(duplicates):
+            print("⚠️ Fingerprint index is empty (run: python ap_fingerprint.py scan); "
+                  "only this run's downloads will be compared.")
+
+    if args.verify_only:
+        ensure_dir(OUTPUT_ROOT)
+        try:
+            verify_only(args, cache, verifier)
+        finally:
+            cache.save()
+        return
 
-    args = parser.parse_args()
+    if args.coordinator:
+        started = time.time()
+        try:
+            count = work_for_coordinator(args, verifier, duplicates)
+        finally:
+            cache.save()
+            if duplicates is not None:
+                duplicates.close()
+            ap_plan.record_throughput(OUTPUT_ROOT, _session["bytes"], time.time() - started, args.workers)
+        print(f"\n🎯 Queue drained; {count} task(s) finished here. Location: {OUTPUT_ROOT}")
+        return
 
     # Pre-check for folder existence to avoid redundant work
-    if args.folder:
-        target_path = os.path.join(OUTPUT_ROOT, args.folder)
-        if os.path.exists(target_path):
+    if args.folder and not args.plan:
+        if course_exists(args.folder):
             print(f"Aborting: Folder '{args.folder}' already exists.")
             sys.exit(0) 
 
-    # Collect tasks
-    raw_inputs = []
-    if args.url:
-        raw_inputs.extend(args.url)
-    if args.file:
-        try:
-            with open(args.file, "r", encoding="utf-8") as f:
-                raw_inputs.extend([line.strip() for line in f if line.strip()])
-        except FileNotFoundError:
-            print(f"Error: File '{args.file}' not found.")
-            return
+    # Tasks are parsed lazily and fed to the workers through a bounded queue
+    if args.file and args.file != "-" and not os.path.exists(args.file):
+        print(f"Error: File '{args.file}' not found.")
+        return
 
-    if not raw_inputs:
-        print("No URLs provided.")
+    tasks = unique_tasks(iter_tasks(args.url, args.file))
+
+    if args.plan:
+        ap_plan.plan(plan_items(tasks, args.folder), OUTPUT_ROOT, rate_mbps=args.rate,
+                     window_hours=args.window)
         return
 
-    # De-duplicate URLs
-    tasks = []
-    seen_urls = set()
-    for entry in raw_inputs:
-        url, name = entry.split("|", 1) if "|" in entry else (entry, None)
-        if url not in seen_urls:
-            tasks.append((url, name))
-            seen_urls.add(url)
+    monitor = limiter = scaler = None
+    max_workers = args.workers
+    if args.autoscale:
+        max_workers = max(args.max_workers, args.min_workers)
+        start = max(args.min_workers, min(args.workers, max_workers))
+        limiter = ResizableLimiter(start)
+        monitor = ThroughputMonitor()
+        scaler = AutoScaler(limiter, monitor, args.min_workers, max_workers, interval=args.scale_interval)
+        scaler.start()
+        print(f"⚖️ Autoscaling between {args.min_workers} and {max_workers} workers, starting at {start}.")
 
     # Execute parallel downloads
-    run_in_parallel(
-        lambda t: download_item(t, folder_override=args.folder),
-        tasks,
-        max_workers=args.workers,
-    )
+    started = time.time()
+    try:
+        count = run_streaming(
+            lambda t: download_item(t, folder_override=args.folder, catalog=catalog, monitor=monitor,
+                                    engine=args.engine, mirrors=args.mirror,
+                                    verifier=verifier, retries=args.retries, fragmented=args.fragmented,
+                                    live=args.live, duplicates=duplicates),
+            tasks,
+            max_workers=max_workers,
+            limiter=limiter,
+            stop=_live_stop if args.live else None,
+        )
+    finally:
+        if scaler:
+            scaler.stop()
+        cache.save()
+        if duplicates is not None:
+            duplicates.close()
+        if not args.live:
+            ap_plan.record_throughput(OUTPUT_ROOT, _session["bytes"], time.time() - started, max_workers)
+
+    if not count:
+        print("No URLs provided.")
+        return
 
     print(f"\n🎯 Downloads Complete! Location: {OUTPUT_ROOT}")
 
@@ -87,11 +87,11 @@ const BrowserUtils = {
     const rawTitle = document.querySelector(CONFIG.SELECTOR_TITLE)?.innerText;
     const courseTitle = TextUtils.clean(rawTitle);
 
-    // 2. Initialize Command List
-    const commandLines = [
-        `python downloader.py \\`,
-        `  --folder "${courseTitle}"\\`
-    ];
+    // 2. Initialize the manifest (JSONL, one video per line, read by downloader.py --file).
+    // run_all.py runs .jsonl manifests in its commands folder the same way.
+    const manifestName = `${TextUtils.toSnakeCase(courseTitle)}_manifest.jsonl`;
+    const command = `python downloader.py --folder "${courseTitle}" --file "${manifestName}"`;
+    const manifestLines = [`# ${command}`];
 
     // 3. Identify Video Elements
     // The UI duplicates elements, so we only process the first half
@@ -118,10 +118,10 @@ const BrowserUtils = {
         const url = await BrowserUtils.waitForNetworkResource(CONFIG.RESOURCE_PATTERN, CONFIG.TIMEOUT_RESOURCE);
 
         if (url) {
-            commandLines.push(`  --url "${url}|${index}.${videoTitle}" \\`);
+            manifestLines.push(JSON.stringify({ url, name: `${index}.${videoTitle}`, folder: courseTitle }));
         } else {
             console.warn(`⚠️ Failed to capture URL for: ${videoTitle}`);
-            commandLines.push(`  # MISSING URL FOR: ${index}.${videoTitle} \\`);
+            manifestLines.push(`# MISSING URL FOR: ${index}.${videoTitle}`);
         }
 
         // Reset for next video
@@ -129,14 +129,7 @@ const BrowserUtils = {
         performance.clearResourceTimings();
     }
 
-    // 5. Finalize and Download
-    // Remove trailing backslash from the last item for valid syntax
-    const lastLineIndex = commandLines.length - 1;
-    commandLines[lastLineIndex] = commandLines[lastLineIndex].replace(' \\', '');
-
-    const finalCommand = commandLines.join('\n');
-    const filename = `${TextUtils.toSnakeCase(courseTitle)}_command.txt`;
-
-    BrowserUtils.saveFile(finalCommand, filename);
-    console.log("✅ Extraction Complete! File downloaded.");
+    // 5. Download the manifest; the command stays short however long the course is
+    BrowserUtils.saveFile(manifestLines.join('\n') + '\n', manifestName);
+    console.log(`✅ Extraction Complete! Manifest downloaded. Run:\n${command}`);
 })();
\ No newline at end of file
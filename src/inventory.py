@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Media library inventory: a SQLite catalog of the courses and files under
+output_videos, with cached ffprobe metadata and derivative status.
+
+USAGE EXAMPLES:
+---------------
+1. Refresh the catalog (only new/changed files are probed):
+   python inventory.py scan output_videos
+
+2. List courses / files / totals:
+   python inventory.py courses
+   python inventory.py files --course 2022-01-28
+   python inventory.py stats
+
+Other tools open the same catalog with Inventory(root) instead of walking
+and probing the disk themselves.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+OUTPUT_ROOT = "output_videos"
+DB_FILENAME = ".inventory.sqlite"
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".m4v", ".webm", ".ts")
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus", ".wav")
+MEDIA_EXTENSIONS = VIDEO_EXTENSIONS + AUDIO_EXTENSIONS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,   -- relative to the library root, '/' separated
+    course      TEXT NOT NULL,      -- first path component ('' for loose files)
+    name        TEXT NOT NULL,
+    ext         TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    duration    REAL,               -- seconds, from ffprobe
+    streams     TEXT,               -- JSON list of {type, codec}
+    probe_error TEXT,
+    complete    INTEGER,            -- NULL until probed
+    is_black    INTEGER NOT NULL DEFAULT 0,
+    has_black   INTEGER NOT NULL DEFAULT 0,
+    has_mp3     INTEGER NOT NULL DEFAULT 0,
+    scanned_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_course ON files(course);
+
+CREATE TABLE IF NOT EXISTS courses (
+    name        TEXT PRIMARY KEY,
+    file_count  INTEGER NOT NULL,
+    total_size  INTEGER NOT NULL,
+    duration    REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+
+# ---------- ffprobe ----------
+
+def probe_media(path: str):
+    """
+    Returns (duration_seconds, streams) for one file, or raises on failure.
+    Reads container headers only, no decode.
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration:stream=codec_type,codec_name",
+        "-of", "json",
+        path,
+    ]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    info = json.loads(out or "{}")
+
+    duration = info.get("format", {}).get("duration")
+    streams = [
+        {"type": s.get("codec_type"), "codec": s.get("codec_name")}
+        for s in info.get("streams", [])
+    ]
+    return (float(duration) if duration not in (None, "N/A") else None), streams
+
+
+# ---------- Derivatives ----------
+
+def black_path_for(rel: str) -> str:
+    """Where create_black_video / create_black_video_from_audio put the black version of rel."""
+    folder, filename = rel.rsplit("/", 1) if "/" in rel else ("", rel)
+    name, ext = os.path.splitext(filename)
+    if ext.lower() in AUDIO_EXTENSIONS:
+        black = f"{name}_black.mp4"
+        return f"{folder}/{black}" if folder else black
+    black = f"black/{name}_black{ext}"
+    return f"{folder}/{black}" if folder else black
+
+
+def mp3_path_for(rel: str) -> str:
+    return os.path.splitext(rel)[0] + ".mp3"
+
+
+# ---------- Catalog ----------
+
+class Inventory:
+    def __init__(self, root: str = OUTPUT_ROOT, db_path: str = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or os.path.join(self.root, DB_FILENAME)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    @staticmethod
+    def exists_for(root: str = OUTPUT_ROOT) -> bool:
+        return os.path.exists(os.path.join(root, DB_FILENAME))
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- scanning -----
+
+    def _walk(self):
+        """Yields (rel path, size, mtime) for every media file under root."""
+        for dirpath, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            rel_dir = os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+            for f in files:
+                if f.startswith(".") or not f.lower().endswith(MEDIA_EXTENSIONS):
+                    continue
+                st = os.stat(os.path.join(dirpath, f))
+                rel = f if rel_dir == "." else f"{rel_dir}/{f}"
+                yield rel, st.st_size, st.st_mtime
+
+    def scan(self, workers: int = 4, probe: bool = True) -> dict:
+        """
+        Syncs the catalog with the disk.  Files whose size and mtime are
+        unchanged keep their cached probe results; only new or changed files
+        go through ffprobe (in parallel).
+        """
+        now = time.time()
+        known = {
+            row["path"]: (row["size"], row["mtime"])
+            for row in self.db.execute("SELECT path, size, mtime FROM files")
+        }
+
+        seen = set()
+        changed = []
+        for rel, size, mtime in self._walk():
+            seen.add(rel)
+            if known.get(rel) == (size, mtime):
+                continue
+            course = rel.split("/", 1)[0] if "/" in rel else ""
+            name, ext = os.path.splitext(rel.rsplit("/", 1)[-1])
+            self.db.execute(
+                """INSERT OR REPLACE INTO files
+                   (path, course, name, ext, size, mtime, scanned_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (rel, course, name, ext.lower(), size, mtime, now),
+            )
+            changed.append(rel)
+
+        removed = [rel for rel in known if rel not in seen]
+        self.db.executemany("DELETE FROM files WHERE path = ?", [(rel,) for rel in removed])
+
+        if probe and changed and shutil.which("ffprobe") is None:
+            print("⚠️ ffprobe not found in PATH; durations/streams left unknown.")
+        elif probe and changed:
+            print(f"🔍 Probing {len(changed)} new/changed file(s) with {workers} worker(s)...")
+            self._probe(changed, workers)
+
+        self._update_derivatives(seen)
+        self._update_courses(now)
+        self.db.commit()
+
+        return {"files": len(seen), "changed": len(changed), "removed": len(removed)}
+
+    def _probe(self, rels, workers):
+        def job(rel):
+            return rel, probe_media(os.path.join(self.root, *rel.split("/")))
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(job, rel): rel for rel in rels}
+            for f in as_completed(futures):
+                rel = futures[f]
+                try:
+                    _, (duration, streams) = f.result()
+                except Exception as e:
+                    self.db.execute(
+                        "UPDATE files SET duration = NULL, streams = NULL, probe_error = ?, complete = 0 WHERE path = ?",
+                        (str(e)[:500], rel),
+                    )
+                    continue
+                self.db.execute(
+                    "UPDATE files SET duration = ?, streams = ?, probe_error = NULL, complete = ? WHERE path = ?",
+                    (duration, json.dumps(streams), int(bool(duration)), rel),
+                )
+
+    def _update_derivatives(self, paths):
+        flags = []
+        for rel in paths:
+            filename = rel.rsplit("/", 1)[-1]
+            is_black = "_black" in filename
+            flags.append((
+                int(is_black),
+                int(not is_black and black_path_for(rel) in paths),
+                int(not rel.lower().endswith(".mp3") and mp3_path_for(rel) in paths),
+                rel,
+            ))
+        self.db.executemany(
+            "UPDATE files SET is_black = ?, has_black = ?, has_mp3 = ? WHERE path = ?", flags
+        )
+
+    def _update_courses(self, now):
+        self.db.execute("DELETE FROM courses")
+        self.db.execute(
+            """INSERT INTO courses (name, file_count, total_size, duration, updated_at)
+               SELECT course, COUNT(*), SUM(size), COALESCE(SUM(duration), 0), ?
+               FROM files WHERE course != '' GROUP BY course""",
+            (now,),
+        )
+
+    # ----- queries -----
+
+    def courses(self):
+        return [row["name"] for row in self.db.execute("SELECT name FROM courses ORDER BY name")]
+
+    def course_exists(self, name: str) -> bool:
+        return self.db.execute("SELECT 1 FROM courses WHERE name = ?", (name,)).fetchone() is not None
+
+    def files(self, course: str = None, extensions=None, include_black: bool = True):
+        """Rows (sqlite3.Row) for the matching files, ordered by path."""
+        sql = "SELECT * FROM files WHERE 1 = 1"
+        params = []
+        if course is not None:
+            sql += " AND course = ?"
+            params.append(course)
+        if extensions:
+            sql += f" AND ext IN ({', '.join('?' * len(extensions))})"
+            params.extend(e.lower() for e in extensions)
+        if not include_black:
+            sql += " AND is_black = 0"
+        return self.db.execute(sql + " ORDER BY path", params).fetchall()
+
+    def get(self, rel: str):
+        return self.db.execute("SELECT * FROM files WHERE path = ?", (rel,)).fetchone()
+
+    def is_complete(self, rel: str):
+        """True/False from the catalog, or None when the file is not catalogued or probed."""
+        row = self.get(rel)
+        return None if row is None or row["complete"] is None else bool(row["complete"])
+
+    def snapshot(self) -> dict:
+        """
+        {rel path: True/False/None (not probed)} for every catalogued file,
+        safe to hand to worker threads.
+        """
+        return {
+            row["path"]: None if row["complete"] is None else bool(row["complete"])
+            for row in self.db.execute("SELECT path, complete FROM files")
+        }
+
+    def abspath(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split("/"))
+
+    def stats(self) -> dict:
+        row = self.db.execute(
+            """SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS size,
+                      COALESCE(SUM(duration), 0) AS duration,
+                      SUM(complete = 0) AS incomplete,
+                      SUM(is_black) AS black, SUM(has_mp3) AS with_mp3
+               FROM files"""
+        ).fetchone()
+        stats = dict(row)
+        stats["courses"] = self.db.execute("SELECT COUNT(*) FROM courses").fetchone()[0]
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Media library inventory (SQLite catalog of output_videos)")
+    parser.add_argument("command", choices=["scan", "courses", "files", "stats"])
+    parser.add_argument("root", nargs="?", default=OUTPUT_ROOT, help="Library root (default: output_videos)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parallel ffprobe runs")
+    parser.add_argument("--no-probe", action="store_true", help="Only record size/mtime, skip ffprobe")
+    parser.add_argument("--course", help="Limit 'files' to one course")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"❌ Not a directory: {args.root}")
+        sys.exit(1)
+
+    with Inventory(args.root) as inv:
+        if args.command == "scan":
+            started = time.perf_counter()
+            result = inv.scan(workers=args.workers, probe=not args.no_probe)
+            print(
+                f"✅ {result['files']} file(s) catalogued, {result['changed']} new/changed, "
+                f"{result['removed']} removed in {time.perf_counter() - started:.1f}s"
+            )
+        elif args.command == "courses":
+            for name in inv.courses():
+                print(name)
+        elif args.command == "files":
+            for row in inv.files(course=args.course):
+                duration = f"{row['duration']:.0f}s" if row["duration"] else "?"
+                flags = "".join([
+                    " [INCOMPLETE]" if row["complete"] == 0 else "",
+                    " [black]" if row["has_black"] else "",
+                    " [mp3]" if row["has_mp3"] else "",
+                ])
+                print(f"{row['path']}  {row['size'] / (1024 * 1024):.1f} MB  {duration}{flags}")
+        else:
+            s = inv.stats()
+            print(f"📚 Courses   : {s['courses']}")
+            print(f"🎞️ Files     : {s['files']} ({(s['incomplete'] or 0)} incomplete)")
+            print(f"💾 Size      : {s['size'] / (1024 ** 3):.2f} GB")
+            print(f"⏱️ Duration  : {s['duration'] / 3600:.1f} h")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
+import hashlib
+import io
+import json
 import os
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
+import zipfile
+from collections import deque
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
+# python-docx and lxml are imported inside the functions that use them, so
+# the script starts (and answers --help) without loading them
 # =========================================================
 # --- FORMATTING HELPER FUNCTIONS ---
 # =========================================================
 def add_page_number(run):
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
     fldChar1 = OxmlElement('w:fldChar')
     fldChar1.set(qn('w:fldCharType'), 'begin')
     instrText = OxmlElement('w:instrText')
@@ -22,6 +30,9 @@ def add_page_number(run):
 
 def apply_custom_formatting(doc):
     """Applies your custom margins, fonts, and strictly disables page breaks."""
+    from docx.shared import Inches, Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
     for section in doc.sections:
         section.top_margin = Inches(0.0)
         section.bottom_margin = Inches(0.0)
@@ -45,22 +56,431 @@ def apply_custom_formatting(doc):
         except KeyError:
             pass
 
-def copy_doc_content(source_path, target_doc):
-    """Copies all paragraphs and formatting from an individual doc into the master doc."""
-    source_doc = Document(source_path)
-    for para in source_doc.paragraphs:
-        new_para = target_doc.add_paragraph(style=para.style.name)
-        new_para.alignment = para.alignment
-        for run in para.runs:
-            new_run = new_para.add_run(run.text)
-            new_run.bold = run.bold
-            new_run.italic = run.italic
-            new_run.underline = run.underline
+# =========================================================
+# --- LOW-LEVEL XML MERGE ENGINE ---
+# =========================================================
+# Sources are parsed in worker processes straight from their zip parts with
+# lxml; only the serialized <w:body> children travel back to the parent, which
+# streams them into the master's word/document.xml.  Nothing bigger than one
+# source document (times the in-flight window) is ever held in memory.
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+DOCUMENT_PART = "word/document.xml"
+STYLES_PART = "word/styles.xml"
+
+# Paragraph inserted between two merged documents (the "single blank line").
+SEPARATOR = b"<w:p/>"
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+def _strip_unportable(body):
+    """
+    Removes markup that points into parts of the source package (images,
+    comments, footnotes, numbering, section breaks) which the master does not
+    have.  Text, runs and their formatting are left untouched.
+    """
+    for link in body.iter(_w("hyperlink")):
+        if link.get(f"{{{R_NS}}}id") is None:
+            continue
+        parent = link.getparent()
+        index = parent.index(link)
+        for child in reversed(list(link)):
+            parent.insert(index, child)
+        parent.remove(link)
+
+    doomed = [
+        "drawing", "pict", "object", "altChunk", "numPr", "sectPr",
+        "footnoteReference", "endnoteReference", "commentReference",
+    ]
+    for tag in doomed:
+        for el in list(body.iter(_w(tag))):
+            el.getparent().remove(el)
+
+    # Anything else still holding a relationship id would dangle in the master.
+    for el in list(body.iter()):
+        if el.getparent() is None:
+            continue
+        if any(attr.startswith(f"{{{R_NS}}}") for attr in el.attrib):
+            el.getparent().remove(el)
+
+
+def _used_style_ids(body):
+    ids = set()
+    for tag in ("pStyle", "rStyle", "tblStyle"):
+        for el in body.iter(_w(tag)):
+            val = el.get(_w("val"))
+            if val:
+                ids.add(val)
+    return ids
+
+
+def _collect_styles(styles_xml, used_ids):
+    """Returns {styleId: serialized <w:style>} for used_ids and everything they inherit from."""
+    from lxml import etree
+
+    if not styles_xml or not used_ids:
+        return {}
+
+    root = etree.fromstring(styles_xml)
+    by_id = {el.get(_w("styleId")): el for el in root.iter(_w("style"))}
+
+    wanted = {}
+    pending = list(used_ids)
+    while pending:
+        style_id = pending.pop()
+        el = by_id.get(style_id)
+        if el is None or style_id in wanted:
+            continue
+        for num_pr in list(el.iter(_w("numPr"))):
+            num_pr.getparent().remove(num_pr)
+        wanted[style_id] = etree.tostring(el)
+        for ref in ("basedOn", "link", "next"):
+            ref_el = el.find(_w(ref))
+            if ref_el is not None:
+                pending.append(ref_el.get(_w("val")))
+    return wanted
+
+
+def extract_body(source_path, master_nsmap):
+    """
+    Process-pool worker.  Reads one .docx and returns
+    (body_xml_bytes, {styleId: style_xml_bytes}) ready to be spliced into the
+    master document.
+    """
+    from lxml import etree
+
+    with zipfile.ZipFile(source_path) as zf:
+        root = etree.fromstring(zf.read(DOCUMENT_PART))
+        names = set(zf.namelist())
+        styles_xml = zf.read(STYLES_PART) if STYLES_PART in names else None
+
+    body = root.find(_w("body"))
+    if body is None:
+        return b"", {}
+
+    _strip_unportable(body)
+    styles = _collect_styles(styles_xml, _used_style_ids(body))
+
+    if len(body) == 0:
+        return b"", styles
+
+    # Fast path: when every prefix means the same thing in the master, the
+    # body's inner markup can be copied verbatim (declarations live on the
+    # master root).  Otherwise each element carries its own declarations.
+    compatible = all(
+        master_nsmap.get(prefix) == uri
+        for prefix, uri in body.nsmap.items()
+    )
+    if compatible:
+        body.attrib.clear()
+        xml = etree.tostring(body)
+        return xml[xml.index(b">") + 1: xml.rindex(b"</")], styles
+
+    chunks = []
+    for child in body:
+        child = deepcopy(child)
+        etree.cleanup_namespaces(child)
+        chunks.append(etree.tostring(child))
+    return b"".join(chunks), styles
+
+
+def _bounded_map(func, items, workers, window):
+    """
+    Like executor.map, but keeps at most `window` results in flight so memory
+    stays flat no matter how many items there are.
+    Yields (item, result, error) in input order.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        items = iter(items)
+
+        for item in items:
+            pending.append((item, ex.submit(func, item)))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            item, future = pending.popleft()
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+
+            nxt = next(items, None)
+            if nxt is not None:
+                pending.append((nxt, ex.submit(func, nxt)))
+
+
+def build_template():
+    """
+    Builds the empty master (custom layout, footer page numbers) with
+    python-docx and returns (parts, head, tail, nsmap): every zip part except
+    document.xml, plus the document.xml bytes before and after the body content.
+    """
+    from docx import Document
+    from lxml import etree
+
+    master_doc = Document()
+    apply_custom_formatting(master_doc)
+
+    buffer = io.BytesIO()
+    master_doc.save(buffer)
+
+    parts = {}
+    with zipfile.ZipFile(buffer) as zf:
+        for name in zf.namelist():
+            parts[name] = zf.read(name)
+
+    root = etree.fromstring(parts.pop(DOCUMENT_PART))
+    body = root.find(_w("body"))
+    for child in list(body):
+        if child.tag != _w("sectPr"):
+            body.remove(child)
+
+    xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+    marker = b"<w:body>"
+    split_at = xml.index(marker) + len(marker)
+    return parts, xml[:split_at], xml[split_at:], dict(root.nsmap)
+
+
+def merge_styles(styles_xml, extra_styles):
+    """Appends style definitions the master does not have yet."""
+    if not extra_styles:
+        return styles_xml
+
+    from lxml import etree
+
+    root = etree.fromstring(styles_xml)
+    existing = {el.get(_w("styleId")) for el in root.iter(_w("style"))}
+    for style_id, style_xml in extra_styles.items():
+        if style_id not in existing:
+            root.append(etree.fromstring(style_xml))
+            existing.add(style_id)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def write_master(output_path, parts, head, fragments, tail):
+    """
+    Writes the package to output_path.  `fragments` is an iterable of body
+    byte strings that is consumed lazily while document.xml is being
+    compressed; `parts` is read afterwards, so callers may still add to
+    parts[STYLES_PART] from inside the fragments generator.
+    """
+    tmp_path = output_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+        zout.writestr("[Content_Types].xml", parts["[Content_Types].xml"])
+
+        with zout.open(DOCUMENT_PART, "w", force_zip64=True) as doc_xml:
+            doc_xml.write(head)
+            for fragment in fragments:
+                doc_xml.write(fragment)
+            doc_xml.write(tail)
+
+        for name, data in parts.items():
+            if name != "[Content_Types].xml":
+                zout.writestr(name, data)
+
+    os.replace(tmp_path, output_path)
+
+
+# =========================================================
+# --- INCREMENTAL MANIFEST ---
+# =========================================================
+# Stored next to the master as "<master>.manifest.json".  It records every
+# merged source (size, mtime, sha1) and the byte range its body occupies
+# inside the master's word/document.xml, so a later run can copy existing
+# content straight across and only parse the files that are new.  The
+# master's own size, mtime and sha1 are kept too: once the master has been
+# saved from Word those byte ranges mean nothing, and it is rebuilt.
+#
+# Parsing is what gets skipped; document.xml is still inflated and
+# deflated again in full on every update (a deflate stream cannot be
+# appended to in place), which is linear in the master's size but far
+# cheaper than re-reading every source.
+
+MANIFEST_VERSION = 2
+
+
+def manifest_path_for(output_path):
+    return output_path + ".manifest.json"
+
+
+def file_sha1(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def master_signature(output_path):
+    st = os.stat(output_path)
+    return {"size": st.st_size, "mtime": st.st_mtime, "sha1": file_sha1(output_path)}
+
+
+def master_unchanged(output_path, manifest):
+    """True while the master is still the file this tool last wrote."""
+    recorded = manifest.get("master") or {}
+    st = os.stat(output_path)
+    if st.st_size == recorded.get("size") and st.st_mtime == recorded.get("mtime"):
+        return True
+    return st.st_size == recorded.get("size") and file_sha1(output_path) == recorded.get("sha1")
+
+
+def load_manifest(output_path):
+    path = manifest_path_for(output_path)
+    if not os.path.exists(output_path) or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    if not master_unchanged(output_path, manifest):
+        print("  ♻️ Master was modified outside this tool (e.g. saved from Word); rebuilding it.")
+        return None
+    return manifest
+
+
+def save_manifest(output_path, manifest):
+    """Writes the manifest, stamped with the master as it is now on disk."""
+    manifest = dict(manifest, master=master_signature(output_path))
+    path = manifest_path_for(output_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _merge_worker(source_path, master_nsmap):
+    """Process-pool worker: parsed body plus the source's fingerprint."""
+    st = os.stat(source_path)
+    body_xml, styles = extract_body(source_path, master_nsmap)
+    return body_xml, styles, {
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "sha1": file_sha1(source_path),
+    }
+
+
+def plan_update(folder_path, docx_files, manifest):
+    """
+    Compares the folder against the manifest.
+    Returns {name: entry} of merged sources that can be reused as-is, or None
+    when an already-merged source changed or disappeared (full rebuild needed).
+    """
+    current = set(docx_files)
+    reusable = {}
+
+    for entry in manifest["entries"]:
+        name = entry["name"]
+        if name not in current:
+            print(f"  ♻️ Source removed since last merge: {name}")
+            return None
+
+        st = os.stat(os.path.join(folder_path, name))
+        if st.st_size != entry["size"] or st.st_mtime != entry["mtime"]:
+            if file_sha1(os.path.join(folder_path, name)) != entry["sha1"]:
+                print(f"  ♻️ Source changed since last merge: {name}")
+                return None
+            entry = dict(entry, size=st.st_size, mtime=st.st_mtime)
+
+        reusable[name] = entry
+
+    return reusable
+
+
+def read_master_parts(output_path):
+    parts = {}
+    with zipfile.ZipFile(output_path) as zf:
+        for name in zf.namelist():
+            if name != DOCUMENT_PART:
+                parts[name] = zf.read(name)
+    return parts
+
 
 # =========================================================
 # --- CORE MERGE LOGIC ---
 # =========================================================
-def merge_docs_in_folder(folder_path, output_filename="Master_Compiled_Docs.docx"):
+def compile_master(folder_path, output_path, docx_files, parts, head, tail, nsmap, reusable, workers):
+    """
+    Writes the master with docx_files in order.  Names found in `reusable`
+    are copied byte-for-byte out of the existing master's document.xml;
+    everything else is parsed in the process pool.  Returns the new manifest.
+    """
+    to_parse = [os.path.join(folder_path, f) for f in docx_files if f not in reusable]
+    extra_styles = {}
+    entries = []
+
+    old_zip = zipfile.ZipFile(output_path) if reusable else None
+
+    def fragments():
+        results = _bounded_map(partial(_merge_worker, master_nsmap=nsmap), to_parse, workers, workers * 2)
+        old_doc = old_zip.open(DOCUMENT_PART) if old_zip else None
+        old_pos = 0
+        offset = len(head)
+        done = 0
+
+        for filename in docx_files:
+            if filename in reusable:
+                entry = dict(reusable[filename])
+                old_doc.read(entry["offset"] - old_pos)
+                body_xml = old_doc.read(entry["length"])
+                old_pos = entry["offset"] + entry["length"]
+            else:
+                file_path, result, error = next(results)
+                done += 1
+                print(f"  [{done}/{len(to_parse)}] Appending: {filename}...")
+
+                if error is not None:
+                    print(f"  ❌ Error reading {filename}: {error}")
+                    continue
+
+                body_xml, styles, signature = result
+                for style_id, style_xml in styles.items():
+                    extra_styles.setdefault(style_id, style_xml)
+                entry = dict(signature, name=filename)
+
+            # Add a single blank line between different documents
+            if entries:
+                yield SEPARATOR
+                offset += len(SEPARATOR)
+
+            entry.update(offset=offset, length=len(body_xml))
+            entries.append(entry)
+            yield body_xml
+            offset += len(body_xml)
+
+        results.close()
+        if old_zip:
+            # Release the old master before write_master replaces it.
+            old_doc.close()
+            old_zip.close()
+        parts[STYLES_PART] = merge_styles(parts[STYLES_PART], extra_styles)
+
+    try:
+        write_master(output_path, parts, head, fragments(), tail)
+    finally:
+        if old_zip:
+            old_zip.close()
+
+    return {
+        "version": MANIFEST_VERSION,
+        "head": head.decode("utf-8"),
+        "tail": tail.decode("utf-8"),
+        "nsmap": {prefix: uri for prefix, uri in nsmap.items() if prefix},
+        "entries": entries,
+    }
+
+
+def merge_docs_in_folder(folder_path, output_filename="Master_Compiled_Docs.docx", workers=None, rebuild=False):
     folder_path = os.path.abspath(folder_path)
 
     if not os.path.isdir(folder_path):
@@ -83,43 +503,63 @@ def merge_docs_in_folder(folder_path, output_filename="Master_Compiled_Docs.docx
     docx_files.sort()
     print(f"📄 Found {len(docx_files)} files to merge.")
 
-    # Initialize the master document with your custom layout
-    master_doc = Document()
-    apply_custom_formatting(master_doc)
+    output_path = os.path.join(folder_path, output_filename)
+    workers = workers or os.cpu_count() or 1
 
-    # Loop through and append each file
-    for i, filename in enumerate(docx_files):
-        file_path = os.path.join(folder_path, filename)
-        print(f"  [{i+1}/{len(docx_files)}] Appending: {filename}...")
-        
-        try:
-            copy_doc_content(file_path, master_doc)
-        except Exception as e:
-            print(f"  ❌ Error reading {filename}: {e}")
-            continue
+    manifest = None if rebuild else load_manifest(output_path)
+    reusable = plan_update(folder_path, docx_files, manifest) if manifest else None
 
-        # Add a single blank line between different documents
-        if i < len(docx_files) - 1:
-            master_doc.add_paragraph()
+    if reusable is not None:
+        new_count = len(docx_files) - len(reusable)
+        if new_count == 0:
+            save_manifest(output_path, dict(manifest, entries=[reusable[f] for f in docx_files]))
+            print("✅ Master document is already up to date.")
+            return
+        print(f"♻️ Reusing {len(reusable)} merged document(s), adding {new_count} new.")
+        parts = read_master_parts(output_path)
+        head = manifest["head"].encode("utf-8")
+        tail = manifest["tail"].encode("utf-8")
+        nsmap = manifest["nsmap"]
+    else:
+        # Initialize the master document with your custom layout
+        parts, head, tail, nsmap = build_template()
+        reusable = {}
 
-    output_path = os.path.join(folder_path, output_filename)
-    
     try:
-        master_doc.save(output_path)
+        manifest = compile_master(
+            folder_path, output_path, docx_files, parts, head, tail, nsmap, reusable, workers
+        )
+        save_manifest(output_path, manifest)
         print(f"\n✅ Success! Saved master document to:\n📁 {output_path}")
     except PermissionError:
         print(f"\n❌ Permission Error: Could not save to {output_path}.")
         print("Is the 'Master_Compiled_Docs.docx' file currently open in Microsoft Word? If so, close it and run this again.")
 
-if __name__ == "__main__":
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge every .docx in a folder into one master document")
+    parser.add_argument("folder", nargs="?", help="Folder with the .docx files (asked for when omitted)")
+    parser.add_argument("--output", default="Master_Compiled_Docs.docx", help="Master file name (default: Master_Compiled_Docs.docx)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel processes (default: CPU count)")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the manifest and rebuild the master from scratch")
+    args = parser.parse_args()
+
     print("\n" + "=" * 50)
     print("📑 Word Document Auto-Merger 📑")
     print("=" * 50)
-    
-    folder_input = input("Enter the path to the folder containing your .docx files\n(or just press Enter to scan the current folder): ").strip()
-    folder_path = folder_input if folder_input else "."
-    
+
+    interactive = args.folder is None
+    if interactive:
+        folder_input = input("Enter the path to the folder containing your .docx files\n(or just press Enter to scan the current folder): ").strip()
+        args.folder = folder_input if folder_input else "."
+
     print("\nStarting process...\n")
-    merge_docs_in_folder(folder_path)
-    
-    input("\nAll tasks finished. Press Enter to exit...")
\ No newline at end of file
+    merge_docs_in_folder(args.folder, output_filename=args.output, workers=args.workers, rebuild=args.rebuild)
+
+    if interactive:
+        input("\nAll tasks finished. Press Enter to exit...")
+
+
+if __name__ == "__main__":
+    main()
@@ -164,19 +164,17 @@ const Exporter = {
             return;
         }
 
-        let content = `python downloader.py \\\n  --folder "${State.courseTitle}"`;
+        // JSONL manifest for downloader.py --file (or run_all.py): no argv limit however many videos
+        const filename = `${TextUtils.toSnakeCase(State.courseTitle)}_manual_manifest.jsonl`;
+        const command = `python downloader.py --folder "${State.courseTitle}" --file "${filename}"`;
+        let content = `# ${command}\n`;
 
         State.capturedVideos.forEach(v => {
             // Note: Since we are in manual mode, we might not have perfect titles.
             // We append the index to ensure uniqueness.
-            content += ` \\\n  --url "${v.url}|${v.index}.${v.title}"`;
+            content += JSON.stringify({ url: v.url, name: `${v.index}.${v.title}`, folder: State.courseTitle }) + "\n";
         });
 
-        // Remove trailing backslash from last line
-        // (Not strictly necessary if logic handles it, but good practice)
-
-        const filename = `${TextUtils.toSnakeCase(State.courseTitle)}_manual_command.txt`;
-
         const blob = new Blob([content], { type: 'text/plain' });
         const url = URL.createObjectURL(blob);
         const a = document.createElement('a');
@@ -186,7 +184,7 @@ const Exporter = {
         a.click();
         document.body.removeChild(a);
 
-        console.log("✅ Command file downloaded.");
+        console.log(`✅ Manifest downloaded. Run:\n${command}`);
     }
 };
 
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Shrinks finished downloads for storage: re-encodes lectures to a
+low-bitrate video profile (HEVC by default, or AV1) with a mono Opus speech
+track, in place.  The original is replaced only after the new file passes
+an ffprobe duration check; a ledger in the library root remembers what was
+done and how much space each course saved.
+
+Runs at low priority within a CPU budget, and with --idle only starts a
+file while the machine is otherwise quiet.
+
+USAGE EXAMPLES:
+---------------
+1. Everything under output_videos, HEVC, half the cores:
+   python recompress_cli.py
+
+2. AV1 on at most 2 cores, only while the machine is idle:
+   python recompress_cli.py --profile av1 --cpu-budget 2 --idle
+
+3. One course, the 10 biggest files:
+   python recompress_cli.py output_videos/2022-01-28 --limit 10
+
+4. Space saved so far, per course:
+   python recompress_cli.py --report
+
+Note: Requires 'ap_core' module and 'ffmpeg'/'ffprobe' installed in system PATH.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import ap_trace as trace
+    from ap_core import RECOMPRESS_PROFILES, recompress_encoder, recompress_video
+except ImportError:
+    print("❌ Error: 'ap_core' module not found.")
+    print("   Make sure ap_core.py is in the same folder as this script.")
+    sys.exit(1)
+
+OUTPUT_ROOT = "output_videos"
+LEDGER_FILENAME = ".recompress_ledger.json"
+
+# Downloads in progress, and our own temporary output
+SKIP_SUFFIXES = (".part.mp4", ".rest.mp4", ".join.mp4", ".recompress.mp4")
+# Already in a storage codec: nothing to gain
+TARGET_CODECS = {"hevc", "av1"}
+
+IDLE_POLL_SECONDS = 30
+
+
+class Ledger:
+    """
+    {relative path: {course, status, profile, before, after, size, mtime,
+    at, detail}} in the library root.  An entry counts only while the file's
+    size and mtime are what they were when it was recorded.
+    """
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, LEDGER_FILENAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def is_current(self, rel: str, st) -> bool:
+        entry = self.entries.get(rel)
+        return bool(entry) and entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime
+
+    def record(self, rel: str, full_path: str, profile: str, result: dict):
+        st = os.stat(full_path)
+        with self._lock:
+            self.entries[rel] = {
+                "course": rel.split("/", 1)[0] if "/" in rel else "",
+                "status": result["status"],
+                "profile": profile,
+                "before": result["before"],
+                "after": result["after"],
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "at": int(time.time()),
+                "detail": result["detail"],
+            }
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def per_course(self) -> dict:
+        """{course: [files replaced, bytes before, bytes after]}."""
+        courses = {}
+        for entry in self.entries.values():
+            if entry["status"] != "replaced":
+                continue
+            c = courses.setdefault(entry["course"], [0, 0, 0])
+            c[0] += 1
+            c[1] += entry["before"]
+            c[2] += entry["after"]
+        return courses
+
+
+def _fmt_size(n: float) -> str:
+    return f"{n / 1024 ** 3:.2f} GB" if n >= 1024 ** 3 else f"{n / 1024 ** 2:.1f} MB"
+
+
+def print_report(ledger: Ledger):
+    courses = ledger.per_course()
+    if not courses:
+        print("Nothing recompressed yet.")
+        return
+    print("\n💾 Space saved per course")
+    rows = sorted(courses.items(), key=lambda kv: kv[1][2] - kv[1][1])
+    rows.append(("Total", [sum(c[i] for c in courses.values()) for i in range(3)]))
+    for name, (files, before, after) in rows:
+        print(f"   {name[:40]:<40} {files:>5} file(s)  {_fmt_size(before):>9} → {_fmt_size(after):>9}  "
+              f"saved {_fmt_size(before - after):>9} ({100 * (before - after) / (before or 1):.0f}%)")
+
+
+# ---------- Candidates ----------
+
+def probe_video_codec(path: str):
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name",
+        "-of", "csv=p=0",
+        path,
+    ]
+    try:
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    return out.splitlines()[0] if out else None
+
+
+def collect_candidates(target: str, root: str, ledger: Ledger, min_age_minutes: float):
+    """(rel path under root, full path) of finished videos not handled yet, biggest first."""
+    cutoff = time.time() - min_age_minutes * 60
+    found = []
+    for dirpath, dirs, files in os.walk(target):
+        dirs[:] = [d for d in dirs if d != "black" and not d.startswith(".")]
+        for f in files:
+            low = f.lower()
+            if not low.endswith(".mp4") or "_black" in f or low.endswith(SKIP_SUFFIXES):
+                continue
+            full = os.path.join(dirpath, f)
+            st = os.stat(full)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            if st.st_mtime > cutoff or ledger.is_current(rel, st):
+                continue
+            found.append((st.st_size, rel, full))
+    found.sort(reverse=True)
+    return [(rel, full) for _, rel, full in found]
+
+
+# ---------- CPU budget ----------
+
+def lower_priority():
+    """Lets everything else on the machine go first; ffmpeg children inherit it."""
+    if os.name == "nt":
+        import ctypes
+        BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    else:
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+
+class IdleGate:
+    """
+    --idle: a job starts only while the 1-minute load average, minus the
+    threads our own encodes are using, is below `max_load`.
+    """
+
+    def __init__(self, max_load: float):
+        self.max_load = max_load
+        self.busy_threads = 0
+        self._lock = threading.Lock()
+        self.supported = hasattr(os, "getloadavg")
+        if not self.supported:
+            print("⚠️ No load average on this OS; --idle is ignored.")
+
+    def wait(self, threads: int):
+        announced = False
+        while self.supported:
+            with self._lock:
+                load = os.getloadavg()[0] - self.busy_threads
+                if load < self.max_load:
+                    self.busy_threads += threads
+                    return
+            if not announced:
+                print(f"💤 Machine busy (load {load:.1f} ≥ {self.max_load:g}); waiting for idle time...")
+                announced = True
+            time.sleep(IDLE_POLL_SECONDS)
+        with self._lock:
+            self.busy_threads += threads
+
+    def release(self, threads: int):
+        with self._lock:
+            self.busy_threads -= threads
+
+
+def main():
+    cores = os.cpu_count() or 2
+    parser = argparse.ArgumentParser(description="Recompress finished lecture videos to save space.")
+    parser.add_argument("target", nargs="?", default=OUTPUT_ROOT, help="Library or course folder (default: output_videos)")
+    parser.add_argument("--root", default=OUTPUT_ROOT, help="Library root holding the ledger (default: output_videos)")
+    parser.add_argument("--profile", choices=sorted(RECOMPRESS_PROFILES), default="hevc",
+                        help="Video codec profile (default: hevc); audio is always mono speech Opus")
+    parser.add_argument("--cpu-budget", type=int, default=max(1, cores // 2),
+                        help="Cores the encodes may use in total (default: half of them)")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per encode (default: 4, capped by the budget)")
+    parser.add_argument("--idle", action="store_true", help="Only start a file while the machine is otherwise idle")
+    parser.add_argument("--max-load", type=float, default=max(0.5, cores * 0.25),
+                        help="--idle: load average below which the machine counts as idle (default: a quarter of the cores)")
+    parser.add_argument("--min-age", type=float, default=60,
+                        help="Skip files modified in the last N minutes, e.g. still downloading (default: 60)")
+    parser.add_argument("--limit", type=int, help="At most this many files this run (biggest first)")
+    parser.add_argument("--report", action="store_true", help="Only print the space saved per course")
+    parser.add_argument("--trace", help="Append a JSONL trace of every file to this file (or set AP_TRACE)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"❌ Not a directory: {args.root}")
+        return
+    ledger = Ledger(args.root)
+    if args.report:
+        print_report(ledger)
+        return
+
+    for tool in ("ffmpeg", "ffprobe"):
+        if shutil.which(tool) is None:
+            print(f"❌ Error: '{tool}' is not recognized. Install FFmpeg and add it to your PATH.")
+            sys.exit(1)
+    chosen = recompress_encoder(args.profile)
+    if chosen is None:
+        print(f"❌ This ffmpeg has none of: {', '.join(enc for enc, _ in RECOMPRESS_PROFILES[args.profile])}")
+        sys.exit(1)
+
+    trace.configure("recompress", args.trace)
+    lower_priority()
+
+    threads = max(1, min(args.threads, args.cpu_budget))
+    workers = max(1, args.cpu_budget // threads)
+    gate = IdleGate(args.max_load) if args.idle else None
+
+    files = collect_candidates(args.target, args.root, ledger, args.min_age)
+    files = files[:args.limit] if args.limit else files
+    print(f"🔍 {len(files)} file(s) to recompress with {chosen[0]}: "
+          f"{workers} at a time × {threads} thread(s) (budget {args.cpu_budget} core(s))")
+
+    def job(rel, full):
+        codec = probe_video_codec(full)
+        if codec in TARGET_CODECS:
+            size = os.path.getsize(full)
+            result = {"status": "kept", "before": size, "after": size, "detail": f"already {codec}"}
+            ledger.record(rel, full, args.profile, result)
+            print(f"⏭️  {rel}: {result['detail']}")
+            return result
+
+        if gate:
+            gate.wait(threads)
+        try:
+            with trace.job(rel) as span:
+                result = recompress_video(full, args.profile, threads=threads)
+                span["status"] = result["status"]
+                span["bytes"] = result["after"]
+        finally:
+            if gate:
+                gate.release(threads)
+        ledger.record(rel, full, args.profile, result)
+        icon = {"replaced": "✅", "kept": "⏭️ "}.get(result["status"], "❌")
+        print(f"{icon} {rel}: {result['detail']}")
+        return result
+
+    saved = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(job, rel, full): rel for rel, full in files}
+        for f in as_completed(futures):
+            try:
+                result = f.result()
+                saved += result["before"] - result["after"]
+            except Exception as e:
+                print(f"⚠️ Error processing file:\n   Path: {futures[f]}\n   Error: {e}")
+
+    print(f"\n🎯 Done. Saved {saved / (1024 ** 2):.1f} MB this run.")
+    print_report(ledger)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import os
+import sys
+import shlex
 import subprocess
 import argparse
 from datetime import datetime
 
+import ap_trace as trace
+
 
 def log(message):
     """
@@ -12,10 +16,38 @@ def log(message):
     print(f"[{time}] {message}")
 
 
+DOWNLOADER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloader.py")
+
+
+def command_files(commands_dir):
+    """.txt command files and .jsonl manifests (from gen-240p-cmd.js), sorted."""
+    return sorted(f for f in os.listdir(commands_dir) if f.endswith((".txt", ".jsonl")))
+
+
+def manifest_folder(path):
+    """The course folder a .jsonl manifest downloads to (its first entry's)."""
+    from downloader import iter_manifest
+
+    for _, _, folder, _ in iter_manifest(path):
+        if folder:
+            return folder
+    return None
+
+
+def manifest_command(path):
+    """downloader.py run for a manifest, with --folder so finished courses are skipped."""
+    command = [sys.executable, DOWNLOADER, "--file", path]
+    folder = manifest_folder(path)
+    if folder:
+        command[2:2] = ["--folder", folder]
+    return command
+
+
 def run_all_commands(commands_dir):
     """
     Reads every .txt file from the given folder
     and runs the command inside each file ONE BY ONE.
+    A .jsonl manifest is run as 'downloader.py --folder <course> --file <manifest>'.
     """
 
     # --- Validate folder ---
@@ -23,14 +55,11 @@ def run_all_commands(commands_dir):
         log(f"❌ Folder not found: {commands_dir}")
         return
 
-    # --- Collect all .txt files ---
-    files = sorted(
-        f for f in os.listdir(commands_dir)
-        if f.endswith(".txt")
-    )
+    # --- Collect all command files and manifests ---
+    files = command_files(commands_dir)
 
     if not files:
-        log("⚠️ No .txt command files found.")
+        log("⚠️ No .txt command files or .jsonl manifests found.")
         return
 
     log(f"📂 Commands folder: {commands_dir}")
@@ -47,29 +76,36 @@ def run_all_commands(commands_dir):
         log(f"▶️ ({index}/{len(files)}) Running file: {file}")
 
         # --- Read command from file ---
-        with open(path, "r", encoding="utf-8") as f:
-            command = f.read().strip()
+        if file.endswith(".jsonl"):
+            command = manifest_command(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                command = f.read().strip()
 
         if not command:
             log("⚠️ Skipping: file is empty")
             continue
 
         log("📌 Command:")
-        log(command.replace("\n", " "))
-
-        try:
-            # IMPORTANT:
-            # subprocess.run is BLOCKING
-            # → Next command will start only after this finishes
-            subprocess.run(command, shell=True, check=True)
-
-            log("✅ Completed successfully")
-            success_count += 1
-
-        except subprocess.CalledProcessError as e:
-            log("❌ Command failed")
-            log(f"Error: {e}")
-            fail_count += 1
+        log(shlex.join(command) if isinstance(command, list) else command.replace("\n", " "))
+
+        with trace.job(file, phase="command") as span:
+            try:
+                # IMPORTANT:
+                # subprocess.run is BLOCKING
+                # → Next command will start only after this finishes
+                # Child tools inherit the trace file and tag spans with this job
+                subprocess.run(command, shell=isinstance(command, str), check=True, env=trace.child_env())
+
+                log("✅ Completed successfully")
+                success_count += 1
+
+            except subprocess.CalledProcessError as e:
+                log("❌ Command failed")
+                log(f"Error: {e}")
+                span["status"] = "failed"
+                span["exit_code"] = e.returncode
+                fail_count += 1
 
     # --- Final summary ---
     log("=" * 60)
@@ -79,6 +115,75 @@ def run_all_commands(commands_dir):
     log("=" * 60)
 
 
+# ---------- Dry-run planning ----------
+
+def downloader_runs(command):
+    """
+    Parsed arguments of every downloader invocation in a command file
+    ('python downloader.py ...' or 'python -m aptools download ...').
+    """
+    from downloader import build_parser
+
+    parser = build_parser()
+    runs = []
+    for line in command.replace("&&", "\n").splitlines():
+        try:
+            tokens = shlex.split(line, posix=os.name != "nt")
+        except ValueError:
+            continue
+        tokens = [t[1:-1] if len(t) > 1 and t[0] == t[-1] == '"' else t for t in tokens]
+        for i, token in enumerate(tokens):
+            if os.path.basename(token) == "downloader.py":
+                rest = tokens[i + 1:]
+            elif token == "aptools" and tokens[i + 1:i + 2] == ["download"]:
+                rest = tokens[i + 2:]
+            else:
+                continue
+            try:
+                runs.append(parser.parse_known_args(rest)[0])
+            except SystemExit:
+                log(f"⚠️ Could not parse: {line.strip()}")
+            break
+    return runs
+
+
+def plan_commands(commands_dir, rate=None, window=None):
+    """
+    --plan: what every command file would download, without running any
+    of them.  Only playlists are fetched (see ap_plan).
+    """
+    import ap_plan
+    from downloader import OUTPUT_ROOT, build_parser, iter_tasks, unique_tasks, plan_items
+
+    if not os.path.isdir(commands_dir):
+        log(f"❌ Folder not found: {commands_dir}")
+        return
+
+    items = []
+    for file in command_files(commands_dir):
+        path = os.path.join(commands_dir, file)
+        if file.endswith(".jsonl"):
+            runs = [build_parser().parse_args(manifest_command(path)[2:])]
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                runs = downloader_runs(f.read())
+        if not runs:
+            log(f"⏭️ {file}: no downloader command, not planned")
+            continue
+
+        count = 0
+        for args in runs:
+            if args.file and args.file != "-" and not os.path.exists(args.file):
+                log(f"⚠️ {file}: list file not found: {args.file}")
+                continue
+            found = list(plan_items(unique_tasks(iter_tasks(args.url, args.file)), args.folder))
+            items += found
+            count += len(found)
+        log(f"📝 {file}: {count} video(s)")
+
+    ap_plan.plan(items, OUTPUT_ROOT, rate_mbps=rate, window_hours=window)
+
+
 def main():
     """
     Entry point.
@@ -92,12 +197,32 @@ def main():
     parser.add_argument(
         "--commands-path",
         required=True,
-        help="Path to folder containing command .txt files",
+        help="Path to folder containing command .txt files and/or .jsonl manifests",
+    )
+
+    parser.add_argument(
+        "--trace",
+        help="Append a JSONL trace of every command (and the jobs inside it) to this file",
     )
 
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: report size, disk per folder and projected time of the downloads, run nothing",
+    )
+    parser.add_argument("--rate", type=float, help="--plan: throughput in MB/s (default: measured on earlier runs)")
+    parser.add_argument("--window", type=float, help="--plan: hours available; reports whether everything fits")
+
     args = parser.parse_args()
 
+    if args.plan:
+        plan_commands(args.commands_path, rate=args.rate, window=args.window)
+        return
+
+    trace.configure("run_all", args.trace)
     run_all_commands(args.commands_path)
+    if trace.enabled():
+        log(f"📈 Trace written. Summarize with: python ap_trace.py report \"{os.environ[trace.ENV_FILE]}\"")
 
 
 if __name__ == "__main__":
@@ -1,85 +1,313 @@
 import os
-import glob
-import docx
-from docx.shared import Pt
+import sys
+import time
+import shutil
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# lxml is imported where the XML is parsed, so --help works without it
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+DOCUMENT_PART = "word/document.xml"
+
+# 6 pt expressed in twentieths of a point, as Word stores it
+SPACE_AFTER_TWIPS = "120"
+
+# Order of <w:pPr> children required by the schema (ECMA-376 CT_PPr)
+PPR_ORDER = [
+    "pStyle", "keepNext", "keepLines", "pageBreakBefore", "framePr",
+    "widowControl", "numPr", "suppressLineNumbers", "pBdr", "shd", "tabs",
+    "suppressAutoHyphens", "kinsoku", "wordWrap", "overflowPunct",
+    "topLinePunct", "autoSpaceDE", "autoSpaceDN", "bidi", "adjustRightInd",
+    "snapToGrid", "spacing", "ind", "contextualSpacing", "mirrorIndents",
+    "suppressOverlap", "jc", "textDirection", "textAlignment",
+    "textboxTightWrap", "outlineLvl", "divId", "cnfStyle", "rPr", "sectPr",
+    "pPrChange",
+]
+PPR_RANK = {tag: i for i, tag in enumerate(PPR_ORDER)}
+
+# Paragraphs holding any of these are kept even when they have no text
+KEEP_EMPTY = {"drawing", "pict", "object", "sectPr"}
+
+# Media that is compressed already.  Deflating it again only wins a few
+# percent (about 5% on the sample book) for a full compression pass over
+# most of the file, so it is written ZIP_STORED
+PRECOMPRESSED = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".mp4", ".m4a", ".wdp", ".jxr")
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+def _local(el):
+    # Comments and processing instructions have a non-string tag
+    return el.tag.rpartition("}")[2] if isinstance(el.tag, str) else ""
+
+
+def _get_or_insert(ppr, tag):
+    """Returns ppr's <w:tag> child, creating it at its schema position if missing."""
+    el = ppr.find(_w(tag))
+    if el is not None:
+        return el
+
+    el = ppr.makeelement(_w(tag))
+    rank = PPR_RANK[tag]
+    for i, child in enumerate(ppr):
+        if PPR_RANK.get(_local(child), -1) > rank:
+            ppr.insert(i, el)
+            return el
+    ppr.append(el)
+    return el
+
+
+# ---------- XML transform ----------
+
+def clean_paragraph(p):
+    """
+    Turns off "Page Break Before" and standardizes spacing on one body-level
+    paragraph.  Returns False when the paragraph is empty and should be dropped.
+    """
+    ppr = p.find(_w("pPr"))
+    if ppr is None:
+        ppr = p.makeelement(_w("pPr"))
+        p.insert(0, ppr)
+
+    _get_or_insert(ppr, "pageBreakBefore").set(_w("val"), "0")
+
+    spacing = _get_or_insert(ppr, "spacing")
+    for attr in ("beforeAutospacing", "afterAutospacing"):
+        spacing.attrib.pop(_w(attr), None)
+    spacing.set(_w("before"), "0")
+    spacing.set(_w("after"), SPACE_AFTER_TWIPS)
+
+    has_text = any((t.text or "").strip() for t in p.iter(_w("t")))
+    if has_text:
+        return True
+    return any(_local(el) in KEEP_EMPTY for el in p.iter() if isinstance(el.tag, str))
+
+
+def remove_page_breaks(el):
+    for br in list(el.iter(_w("br"))):
+        if br.get(_w("type")) == "page":
+            br.getparent().remove(br)
+
+
+def _shell(root, body):
+    """
+    Serialized open/close tags for <w:document><w:body> with the original
+    namespace declarations and attributes.
+    """
+    from lxml import etree
+
+    doc = etree.Element(root.tag, attrib=dict(root.attrib), nsmap=root.nsmap)
+    stub = etree.SubElement(doc, body.tag, attrib=dict(body.attrib))
+    stub.text = "@@BODY@@"
+    xml = etree.tostring(doc, xml_declaration=True, encoding="UTF-8", standalone=True)
+    head, tail = xml.split(b"@@BODY@@")
+    return head, tail
+
+
+def _strip_inherited_ns(xml, declarations):
+    """
+    lxml repeats the document's namespace declarations on the start tag of
+    every element serialized on its own.  They are already on <w:document>,
+    so drop them from the first tag to keep the output as small as the input.
+    """
+    end = xml.index(b">")
+    start_tag = xml[:end]
+    for decl in declarations:
+        start_tag = start_tag.replace(decl, b"", 1)
+    return start_tag + xml[end:]
+
+
+def transform_document_xml(src, dst):
+    """
+    Single streaming pass over word/document.xml: every top-level body element
+    is parsed, cleaned and written out, then discarded.  Returns stats.
+    """
+    from lxml import etree
+
+    stats = {"paragraphs_removed": 0, "page_breaks_removed": 0}
+    depth = 0
+    root = body = None
+    tail = b""
+    declarations = []
+
+    for event, el in etree.iterparse(src, events=("start", "end")):
+        if event == "start":
+            if depth == 0:
+                root = el
+                declarations = [
+                    f' xmlns:{prefix}="{uri}"'.encode("utf-8") if prefix else f' xmlns="{uri}"'.encode("utf-8")
+                    for prefix, uri in el.nsmap.items()
+                ]
+            elif depth == 1 and el.tag == _w("body"):
+                body = el
+                head, tail = _shell(root, body)
+                dst.write(head)
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 2 or el.getparent() is not body:
+            continue
+
+        breaks_before = sum(1 for br in el.iter(_w("br")) if br.get(_w("type")) == "page")
+        remove_page_breaks(el)
+        stats["page_breaks_removed"] += breaks_before
+
+        keep = True
+        if el.tag == _w("p"):
+            keep = clean_paragraph(el)
+
+        if keep:
+            dst.write(_strip_inherited_ns(etree.tostring(el), declarations))
+        else:
+            stats["paragraphs_removed"] += 1
+
+        # Free what has been written so memory stays flat on huge books
+        el.clear()
+        body.remove(el)
+
+    dst.write(tail)
+    return stats
+
+
+# ---------- Zip rewrite ----------
+
+def copy_entry(zin, zout, info):
+    """
+    Copies one member through zipfile's public API, streamed in chunks so a
+    large image never sits in memory.  Keeps the name, timestamp and
+    attributes of the original.  zipfile cannot copy compressed bytes
+    verbatim, so the member is inflated; already-compressed media (most of
+    a book's bytes) is then written ZIP_STORED instead of being deflated
+    again, and only the small XML parts keep their original compression.
+    """
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    if info.filename.lower().endswith(PRECOMPRESSED):
+        new_info.compress_type = zipfile.ZIP_STORED
+    else:
+        new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.create_system = info.create_system
+    new_info.comment = info.comment
+    # Lets zipfile pick zip64 headers for members that need them
+    new_info.file_size = info.file_size
+    with zin.open(info) as src, zout.open(new_info, "w") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def shrink_docx(input_path, output_path):
+    tmp_path = output_path + ".tmp"
+    stats = {}
+    with zipfile.ZipFile(input_path) as zin, zipfile.ZipFile(tmp_path, "w") as zout:
+        for info in zin.infolist():
+            if info.filename != DOCUMENT_PART:
+                copy_entry(zin, zout, info)
+                continue
+
+            doc_info = zipfile.ZipInfo(DOCUMENT_PART, date_time=info.date_time)
+            doc_info.compress_type = zipfile.ZIP_DEFLATED
+            with zin.open(info) as src, zout.open(doc_info, "w", force_zip64=True) as dst:
+                stats = transform_document_xml(src, dst)
+
+    os.replace(tmp_path, output_path)
+    return stats
+
+
+# ---------- Batch driver ----------
 
 def clean_and_move_doc(input_filepath):
+    """
+    Process-pool worker.  Writes the cleaned copy to a 'shrinked' folder next
+    to the original, deletes the original and returns (filename, bytes, seconds, stats).
+    """
     # Ensure we have the absolute path
     input_filepath = os.path.abspath(input_filepath)
     filename = os.path.basename(input_filepath)
-    print(f"\n--- Processing: {filename} ---")
-    
-    try:
-        doc = docx.Document(input_filepath)
-    except Exception as e:
-        print(f"Error opening document {filename}: {e}")
-        return
-
-    empty_paragraph_count = 0
-    
-    # --- 1. CLEAN THE DOCUMENT SPACING ---
-    for paragraph in list(doc.paragraphs):
-        
-        # Remove manual page breaks
-        for run in paragraph.runs:
-            page_breaks = run._element.xpath('.//w:br[@w:type="page"]')
-            for pb in page_breaks:
-                pb.getparent().remove(pb)
-                
-        # Turn off "Page Break Before" and standardize line spacing
-        paragraph.paragraph_format.page_break_before = False
-        paragraph.paragraph_format.space_before = Pt(0)
-        paragraph.paragraph_format.space_after = Pt(6)
-        
-        # Remove empty paragraphs
-        if not paragraph.text.strip():
-            empty_paragraph_count += 1
-            if empty_paragraph_count > 0: 
-                p_element = paragraph._element
-                p_element.getparent().remove(p_element)
-        else:
-            empty_paragraph_count = 0
+    size = os.path.getsize(input_filepath)
+    started = time.perf_counter()
 
-    # --- 2. HANDLE FOLDERS AND FILES ---
-    base_dir = os.path.dirname(input_filepath)
-    
-    # Create the 'shrinked' directory in the same folder as the script/files
-    shrinked_dir = os.path.join(base_dir, 'shrinked')
+    # Create the 'shrinked' directory in the same folder as the file
+    shrinked_dir = os.path.join(os.path.dirname(input_filepath), 'shrinked')
     os.makedirs(shrinked_dir, exist_ok=True)
-    
-    # Define the new file path inside the 'shrinked' folder
     output_filepath = os.path.join(shrinked_dir, filename)
-    
-    # Save the cleaned document
-    doc.save(output_filepath)
-    print(f"Saved cleaned version to: shrinked/{filename}")
-    
+
+    stats = shrink_docx(input_filepath, output_filepath)
+
     # Delete the original file
     try:
         os.remove(input_filepath)
-        print(f"Deleted original file: {filename}")
     except Exception as e:
-        print(f"Warning: Could not delete the original file. Error: {e}")
+        print(f"Warning: Could not delete the original file {filename}. Error: {e}")
 
+    return filename, size, time.perf_counter() - started, stats
+
+
+def collect_docx(directory):
+    """All .docx files under directory, skipping Word temp files and 'shrinked' output folders."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != 'shrinked']
+        for f in files:
+            if f.lower().endswith(".docx") and not f.startswith("~$"):
+                found.append(os.path.join(root, f))
+    return sorted(found)
+
+
+def _mb(size):
+    return size / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strip page breaks and extra spacing from .docx files (recursive).")
+    parser.add_argument("directory", nargs="?", default=".", help="Folder to process (default: current folder)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel processes (default: CPU count)")
+    args = parser.parse_args()
+
+    print(f"Searching for .docx files under {os.path.abspath(args.directory)}...")
+    valid_files = collect_docx(args.directory)
 
-# --- Run the Batch Script ---
-if __name__ == "__main__":
-    print("Searching for .docx files in the current directory...")
-    
-    # Find all .docx files in the folder where the script is located
-    # This automatically ignores files already moved into the 'shrinked' subfolder
-    docx_files = glob.glob("*.docx")
-    
-    # Filter out temporary Word files (they start with "~$")
-    valid_files = [f for f in docx_files if not f.startswith("~$")]
-    
     if not valid_files:
         print("No valid Word documents (.docx) found in this directory.")
-    else:
-        print(f"Found {len(valid_files)} document(s). Starting cleanup...")
-        
-        # Loop through every file and run the cleaning function
-        for file in valid_files:
-            clean_and_move_doc(file)
-            
-        print("\nAll documents processed successfully!")
\ No newline at end of file
+        return
+
+    print(f"Found {len(valid_files)} document(s). Starting cleanup with {args.workers} worker(s)...")
+
+    started = time.perf_counter()
+    total_bytes = 0
+    failures = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        futures = {ex.submit(clean_and_move_doc, path): path for path in valid_files}
+        for f in as_completed(futures):
+            try:
+                filename, size, seconds, stats = f.result()
+            except Exception as e:
+                failures += 1
+                print(f"Error processing {futures[f]}: {e}")
+                continue
+
+            total_bytes += size
+            rate = _mb(size) / seconds if seconds else 0.0
+            print(
+                f"  ✔ {filename}: {_mb(size):.2f} MB in {seconds:.2f}s ({rate:.1f} MB/s), "
+                f"{stats['page_breaks_removed']} page break(s), "
+                f"{stats['paragraphs_removed']} empty paragraph(s) removed"
+            )
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"\nProcessed {len(valid_files) - failures}/{len(valid_files)} document(s): "
+        f"{_mb(total_bytes):.2f} MB in {elapsed:.2f}s ({_mb(total_bytes) / elapsed if elapsed else 0:.1f} MB/s)"
+    )
+    if failures:
+        sys.exit(1)
+    print("All documents processed successfully!")
+
+
+# --- Run the Batch Script ---
+if __name__ == "__main__":
+    main()
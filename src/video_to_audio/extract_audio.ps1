@@ -1,3 +1,6 @@
+# Superseded by src/audio_cli.py (parallel, stream-copies aac/opus, --profile speech):
+#   python audio_cli.py <folder> --recursive
+
 # SINGLE FOLDER
 Get-ChildItem -Path *.mp4, *.webm, *.mkv | ForEach-Object { ffmpeg -i $_.FullName -q:a 0 -map a "$($_.BaseName).mp3" }
 
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+Batch offline transcription of the downloaded audio.
+
+Each file is split on silence (ffmpeg silencedetect) into chunks of at
+most --max-chunk seconds.  The chunks of all files are transcribed in one
+process pool sized to the cores, then stitched back per file with
+timestamps and written as '<name>_transcribed.docx' (the layout
+merge_docs.py merges) and/or '<name>_transcribed.txt'.
+
+USAGE EXAMPLES:
+---------------
+1. Everything under Downloads/ with faster-whisper:
+   python transcribe.py
+
+2. One channel, Hindi, a larger model:
+   python transcribe.py "Downloads/Prakhar Gupta" --language hi --model small
+
+3. Dry run of the pipeline with the deterministic stub backend:
+   python transcribe.py Downloads --backend stub --format txt
+
+4. Text only, no timestamps, re-do existing transcripts:
+   python transcribe.py --format txt --no-timestamps --overwrite
+
+Note: Requires 'ffmpeg' in PATH; the whisper backends need their package
+('faster-whisper' or 'openai-whisper'), docx output needs 'python-docx'.
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus", ".wav", ".webm")
+OUTPUT_SUFFIX = "_transcribed"
+
+# Chunking: cut in the middle of silences, never exceed MAX_CHUNK seconds
+SILENCE_NOISE = "-35dB"
+SILENCE_MIN_SECONDS = 0.5
+MAX_CHUNK_SECONDS = 30.0
+MIN_CHUNK_SECONDS = 5.0
+
+SAMPLE_RATE = 16000
+
+
+# ---------- Backends ----------
+
+class StubBackend:
+    """
+    Deterministic stand-in: the "text" of a chunk is derived from its PCM
+    samples, so the same audio always gives the same transcript.  For
+    testing the pipeline without a model.
+    """
+
+    def __init__(self, model=None, language=None):
+        pass
+
+    def transcribe(self, wav_path):
+        with open(wav_path, "rb") as f:
+            digest = hashlib.blake2b(f.read()[44:], digest_size=4).hexdigest()
+        seconds = max(0, os.path.getsize(wav_path) - 44) / (SAMPLE_RATE * 2)
+        return f"stub {digest} ({seconds:.1f}s)"
+
+
+class FasterWhisperBackend:
+    def __init__(self, model="base", language=None):
+        from faster_whisper import WhisperModel
+
+        # One thread per worker: the pool already uses every core
+        self.model = WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=1)
+        self.language = language
+
+    def transcribe(self, wav_path):
+        segments, _ = self.model.transcribe(wav_path, language=self.language, beam_size=1)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+class WhisperBackend:
+    def __init__(self, model="base", language=None):
+        import torch
+        import whisper
+
+        torch.set_num_threads(1)
+        self.model = whisper.load_model(model, device="cpu")
+        self.language = language
+
+    def transcribe(self, wav_path):
+        result = self.model.transcribe(wav_path, language=self.language, fp16=False)
+        return result.get("text", "").strip()
+
+
+BACKENDS = {
+    "faster-whisper": FasterWhisperBackend,
+    "whisper": WhisperBackend,
+    "stub": StubBackend,
+}
+
+
+# ---------- Worker process ----------
+
+_backend = None
+
+
+def _init_worker(backend_name, model, language):
+    global _backend
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    _backend = BACKENDS[backend_name](model=model, language=language)
+
+
+def transcribe_chunk(path, index, start, end):
+    """Cuts [start, end) out of `path` as 16 kHz mono wav and transcribes it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, "chunk.wav")
+        cmd = [
+            "ffmpeg", "-y",
+            "-loglevel", "error",
+            "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+            "-i", path,
+            "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-c:a", "pcm_s16le",
+            wav_path,
+        ]
+        subprocess.run(cmd, check=True)
+        return path, index, start, _backend.transcribe(wav_path)
+
+
+# ---------- Silence-based chunking ----------
+
+SILENCE_RE = re.compile(r"silence_(start|end): (-?[\d.]+)")
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+
+def detect_silences(path, noise=SILENCE_NOISE, min_silence=SILENCE_MIN_SECONDS):
+    """Returns (duration, [(silence start, silence end)]) from one decode pass."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-i", path,
+        "-af", f"silencedetect=noise={noise}:d={min_silence}",
+        "-f", "null", "-",
+    ]
+    err = subprocess.run(cmd, capture_output=True, text=True, errors="replace").stderr
+
+    duration = 0.0
+    m = DURATION_RE.search(err)
+    if m:
+        duration = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+
+    silences, start = [], None
+    for kind, value in SILENCE_RE.findall(err):
+        if kind == "start":
+            start = max(0.0, float(value))
+        elif start is not None:
+            silences.append((start, float(value)))
+            start = None
+    if start is not None:
+        silences.append((start, duration))
+    return duration, silences
+
+
+def plan_chunks(duration, silences, max_chunk=MAX_CHUNK_SECONDS, min_chunk=MIN_CHUNK_SECONDS):
+    """
+    [(start, end)] covering the speech.  A chunk ends just inside the last
+    pause that starts between min_chunk and max_chunk into it (a hard cut
+    at max_chunk when there is none); the next chunk starts when the
+    pause ends, so silence is not transcribed.
+    """
+    def skip_silence(t):
+        for s, e in silences:
+            if s <= t + 0.01 < e:
+                return e
+        return t
+
+    # A pause running to the end of the file is not transcribed either
+    speech_end = min([s for s, e in silences if e >= duration - 0.01] + [duration])
+
+    chunks = []
+    pos = skip_silence(0.0)
+    while speech_end - pos > 0.2:
+        limit = pos + max_chunk
+        if speech_end <= limit:
+            end = resume = speech_end
+        else:
+            pauses = [(s, e) for s, e in silences if pos + min_chunk <= s < limit]
+            if pauses:
+                s, e = pauses[-1]
+                end, resume = min(s + 0.25, (s + e) / 2, limit), e
+            else:
+                end = resume = limit
+        chunks.append((pos, end))
+        pos = skip_silence(resume)
+    return chunks
+
+
+# ---------- Output ----------
+
+def fmt_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def stitch(pieces, timestamps=True):
+    """Orders (index, start, text) pieces and returns the transcript lines."""
+    lines = []
+    for _, start, text in sorted(pieces):
+        if not text:
+            continue
+        lines.append(f"[{fmt_timestamp(start)}] {text}" if timestamps else text)
+    return lines
+
+
+def output_base(path):
+    return os.path.splitext(path)[0] + OUTPUT_SUFFIX
+
+
+def write_txt(path, lines):
+    with open(output_base(path) + ".txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def write_docx(path, lines):
+    """A 'Source: <title>.' heading, then the text."""
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading(f"Source: {os.path.splitext(os.path.basename(path))[0]}.", level=1)
+    for line in lines:
+        doc.add_paragraph(line)
+    out = output_base(path) + ".docx"
+    tmp_path = out + ".tmp"
+    doc.save(tmp_path)
+    os.replace(tmp_path, out)
+
+
+def outputs_for(path, fmt):
+    base = output_base(path)
+    return [base + ext for ext in ((".docx", ".txt") if fmt == "both" else (f".{fmt}",))]
+
+
+def is_done(path, fmt):
+    """All requested outputs exist and are newer than the audio."""
+    return all(
+        os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(path)
+        for out in outputs_for(path, fmt)
+    )
+
+
+# ---------- Batch driver ----------
+
+def collect_audio(targets):
+    files = []
+    for target in targets:
+        if os.path.isfile(target):
+            files.append(os.path.abspath(target))
+            continue
+        for root, _, names in os.walk(target):
+            for name in names:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    files.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(set(files))
+
+
+BACKEND_PACKAGES = {"faster-whisper": "faster_whisper", "whisper": "whisper"}
+
+
+def check_dependencies(backend, fmt):
+    import importlib.util
+
+    if shutil.which("ffmpeg") is None:
+        print("❌ Error: 'ffmpeg' is not recognized. Install FFmpeg and add it to your PATH.")
+        sys.exit(1)
+    package = BACKEND_PACKAGES.get(backend)
+    if package and importlib.util.find_spec(package) is None:
+        print(f"❌ Error: the '{backend}' backend needs 'pip install {backend if backend != 'whisper' else 'openai-whisper'}'.")
+        sys.exit(1)
+    if fmt in ("docx", "both"):
+        try:
+            import docx  # noqa: F401
+        except ImportError:
+            print("❌ Error: docx output needs python-docx (pip install python-docx), or use --format txt.")
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe downloaded audio offline, in parallel.")
+    parser.add_argument("targets", nargs="*", default=["Downloads"], help="Audio files or folders (default: Downloads)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="faster-whisper", help="Speech-to-text backend (default: faster-whisper)")
+    parser.add_argument("--model", default="base", help="Model name for the whisper backends (default: base)")
+    parser.add_argument("--language", default=None, help="Spoken language code, e.g. en or hi (default: auto-detect)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel processes (default: CPU count)")
+    parser.add_argument("--format", choices=["docx", "txt", "both"], default="both", help="Output files (default: both)")
+    parser.add_argument("--max-chunk", type=float, default=MAX_CHUNK_SECONDS, help=f"Longest chunk in seconds (default: {MAX_CHUNK_SECONDS:.0f})")
+    parser.add_argument("--noise", default=SILENCE_NOISE, help=f"Silence threshold (default: {SILENCE_NOISE})")
+    parser.add_argument("--min-silence", type=float, default=SILENCE_MIN_SECONDS, help=f"Shortest pause to cut at, seconds (default: {SILENCE_MIN_SECONDS})")
+    parser.add_argument("--no-timestamps", action="store_true", help="Leave out the [hh:mm:ss] prefixes")
+    parser.add_argument("--overwrite", action="store_true", help="Transcribe again even if outputs are up to date")
+    args = parser.parse_args()
+
+    check_dependencies(args.backend, args.format)
+
+    files = collect_audio(args.targets)
+    todo = [p for p in files if args.overwrite or not is_done(p, args.format)]
+    print(f"🔍 Found {len(files)} audio file(s), {len(todo)} to transcribe.")
+    if not todo:
+        return
+
+    def save(path, lines):
+        if args.format in ("txt", "both"):
+            write_txt(path, lines)
+        if args.format in ("docx", "both"):
+            write_docx(path, lines)
+        print(f"   ✔ {os.path.basename(output_base(path))} ({len(lines)} line(s))")
+
+    started = time.perf_counter()
+    plans = {}
+    failed = set()
+    for path in todo:
+        duration, silences = detect_silences(path, args.noise, args.min_silence)
+        if duration <= 0:
+            # Unknown length (Duration: N/A) or undecodable: nothing to plan from
+            failed.add(path)
+            print(f"   ⚠️ {os.path.basename(path)}: could not read the duration; skipped")
+            continue
+        chunks = plan_chunks(duration, silences, max_chunk=args.max_chunk)
+        print(f"   ✂️ {os.path.basename(path)}: {duration:.0f}s → {len(chunks)} chunk(s)")
+        if chunks:
+            plans[path] = chunks
+        else:
+            # All silence: an empty transcript, so the next run sees it as done
+            save(path, [])
+
+    total = sum(len(c) for c in plans.values())
+    print(f"🎙️ Transcribing {total} chunk(s) with '{args.backend}' on {args.workers} worker(s)...")
+
+    pieces = {path: [] for path in plans}
+    remaining = {path: len(chunks) for path, chunks in plans.items()}
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.backend, args.model, args.language),
+    ) as ex:
+        futures = {}
+        # Chunks of all files share the pool, so short files don't leave cores idle
+        for path, chunks in plans.items():
+            for index, (start, end) in enumerate(chunks):
+                futures[ex.submit(transcribe_chunk, path, index, start, end)] = path
+
+        for f in as_completed(futures):
+            path = futures[f]
+            try:
+                _, index, start, text = f.result()
+                pieces[path].append((index, start, text))
+            except Exception as e:
+                failed.add(path)
+                print(f"⚠️ Chunk failed in {os.path.basename(path)}: {e}")
+
+            remaining[path] -= 1
+            if remaining[path] or path in failed:
+                continue
+
+            save(path, stitch(pieces[path], timestamps=not args.no_timestamps))
+
+    elapsed = time.perf_counter() - started
+    print(f"\n🎯 Done: {len(todo) - len(failed)}/{len(todo)} file(s) in {elapsed:.1f}s.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
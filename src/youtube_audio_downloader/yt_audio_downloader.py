@@ -1,11 +1,12 @@
 import time
-import yt_dlp
 
 def download_audio_batch(url, batch_size=20, cooldown_seconds=30):
     """
     Analyzes a YouTube URL (Single, Playlist, or Channel), extracts all video links,
     and downloads them as MP3s in safe batches to prevent IP bans.
     """
+    import yt_dlp  # slow to import; only needed once there is work to do
+
     print(f"🔍 Analyzing URL: {url}...")
     
     # Options just to extract the metadata/list of videos quickly
@@ -1,6 +1,4 @@
-from youtube_transcript_api import YouTubeTranscriptApi
 import argparse
-import pyperclip
 import urllib.request
 import json
 import os
@@ -46,6 +44,8 @@ def create_url_shortcut(folder_path, safe_title, video_id):
         f.write(f"URL={video_url}\n")
 
 def download_transcript(video_url, languages):
+    from youtube_transcript_api import YouTubeTranscriptApi
+
     video_id = get_video_id(video_url)
     api = YouTubeTranscriptApi()
 
@@ -98,6 +98,7 @@ if __name__ == "__main__":
 
     # Check CLI arguments first, then fallback to clipboard
     if not target_url:
+        import pyperclip
         clipboard_text = pyperclip.paste().strip()
         if "youtube.com" in clipboard_text or "youtu.be" in clipboard_text:
             print(f"📋 Found URL in clipboard: {clipboard_text}")
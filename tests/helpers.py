@@ -0,0 +1,56 @@
+"""Local servers and media fixtures shared by the tests."""
+import os
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+HAVE_FFMPEG = shutil.which("ffmpeg") is not None
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body: bytes, status: int = 200, content_type: str = "application/octet-stream"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@contextmanager
+def serve(handler):
+    """Runs `handler` on a free localhost port; yields the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def make_fmp4_segments(directory: str, seconds: int = 6):
+    """
+    Encodes a test pattern into 1s fMP4 HLS segments; returns
+    (init bytes, [segment bytes...]).
+    """
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=160x90:rate=10",
+         "-t", str(seconds), "-c:v", "libx264", "-g", "10", "-f", "hls", "-hls_time", "1",
+         "-hls_segment_type", "fmp4", "-hls_playlist_type", "vod",
+         os.path.join(directory, "idx.m3u8")],
+        check=True,
+    )
+    with open(os.path.join(directory, "init.mp4"), "rb") as f:
+        init = f.read()
+    segments = []
+    for i in range(seconds):
+        with open(os.path.join(directory, f"idx{i}.m4s"), "rb") as f:
+            segments.append(f.read())
+    return init, segments
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from aptools import COMMANDS, NO_OPTIONS, SRC_DIR
+
+
+class DispatcherHelpTest(unittest.TestCase):
+    def test_help_of_scripts_without_options_does_not_run_them(self):
+        for name in sorted(NO_OPTIONS):
+            with self.subTest(command=name), tempfile.TemporaryDirectory() as cwd:
+                proc = subprocess.run(
+                    [sys.executable, "-m", "aptools", name, "--help"],
+                    cwd=cwd, env=dict(os.environ, PYTHONPATH=SRC_DIR),
+                    capture_output=True, text=True, timeout=30,
+                )
+                self.assertEqual(proc.returncode, 0, proc.stderr)
+                self.assertIn(f"usage: python -m aptools {name}", proc.stdout)
+                self.assertIn(COMMANDS[name][2], proc.stdout)
+                # Nothing was started: course would have created its queue/ folders
+                self.assertEqual(os.listdir(cwd), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
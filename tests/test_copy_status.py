@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import check_copy_status as ccs
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class CopyStatusTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, "output_videos")
+        self.dest = os.path.join(tmp.name, "pendrive")
+        self.big = os.urandom(3 * 1024 * 1024 + 123)
+        write(os.path.join(self.source, "Course A", "1.intro.mp4"), b"intro" * 1000)
+        write(os.path.join(self.source, "Course A", "2.big.mp4"), self.big)
+        write(os.path.join(self.source, "Course B", "1.same.mp4"), b"same")
+        write(os.path.join(self.source, "Course B", "2.changed.mp4"), b"new content")
+        # The pendrive copy: one folder name with a stray space, one file
+        # missing, one cut short, one with the same size but other bytes
+        write(os.path.join(self.dest, "Course A ", "1.intro.mp4"), b"intro" * 1000)
+        write(os.path.join(self.dest, "Course A ", "2.big.mp4"), self.big[:1024 * 1024])
+        write(os.path.join(self.dest, "Course B", "2.changed.mp4"), b"old content")
+
+    def test_verify_reports_each_kind_of_difference(self):
+        diff = ccs.verify(self.source, self.dest, workers=2)
+        self.assertEqual([(status, rel) for status, rel, _ in diff], [
+            (ccs.SIZE_MISMATCH, "Course A/2.big.mp4"),
+            (ccs.MISSING, "Course B/1.same.mp4"),
+            (ccs.HASH_MISMATCH, "Course B/2.changed.mp4"),
+        ])
+
+    def test_unreadable_file_is_reported_not_fatal(self):
+        real_hash = ccs.hash_file
+        bad = os.path.join(self.dest, "Course A ", "1.intro.mp4")
+
+        def hash_file(path):
+            if path == bad:
+                raise OSError(5, "Input/output error")
+            return real_hash(path)
+
+        with mock.patch.object(ccs, "hash_file", hash_file):
+            diff = ccs.verify(self.source, self.dest, workers=2)
+        self.assertIn((ccs.UNREADABLE, "Course A/1.intro.mp4"), [(status, rel) for status, rel, _ in diff])
+        self.assertIn((ccs.HASH_MISMATCH, "Course B/2.changed.mp4"), [(status, rel) for status, rel, _ in diff])
+
+    def test_quick_compares_sizes_only(self):
+        statuses = {status for status, _, _ in ccs.verify(self.source, self.dest, quick=True)}
+        self.assertEqual(statuses, {ccs.SIZE_MISMATCH, ccs.MISSING})
+
+    def test_source_hashes_are_cached_between_runs(self):
+        ccs.verify(self.source, self.dest)
+        with mock.patch.object(ccs, "hash_file", wraps=ccs.hash_file) as hashed:
+            ccs.verify(self.source, self.dest)
+        # Only the destination side is hashed again (intro and changed)
+        self.assertEqual(sorted(os.path.basename(c.args[0]) for c in hashed.call_args_list),
+                         ["1.intro.mp4", "2.changed.mp4"])
+        self.assertTrue(all(c.args[0].startswith(self.dest) for c in hashed.call_args_list))
+
+    def test_copy_makes_the_folders_match_and_resumes_short_files(self):
+        diff = ccs.verify(self.source, self.dest)
+        with mock.patch.object(ccs, "COPY_BUFFER", 512 * 1024):
+            self.assertEqual(ccs.copy_missing(self.source, self.dest, diff), 0)
+
+        self.assertEqual(ccs.verify(self.source, self.dest), [])
+        self.assertEqual(read(os.path.join(self.dest, "Course A ", "2.big.mp4")), self.big)
+        copied = os.path.join(self.dest, "Course B", "1.same.mp4")
+        self.assertEqual(int(os.path.getmtime(copied)),
+                         int(os.path.getmtime(os.path.join(self.source, "Course B", "1.same.mp4"))))
+        leftovers = [f for _, _, files in os.walk(self.dest) for f in files if f.endswith(ccs.PART_SUFFIX)]
+        self.assertEqual(leftovers, [])
+
+    def test_resume_keeps_a_good_prefix_and_drops_a_bad_tail(self):
+        src = os.path.join(self.source, "Course A", "2.big.mp4")
+        part = os.path.join(self.dest, "partial.mp4.part")
+        write(part, self.big[:2 * 1024 * 1024])
+        self.assertEqual(ccs.resume_offset(src, part), 2 * 1024 * 1024)
+
+        write(part, self.big[:2 * 1024 * 1024 - 10] + b"\0" * 10)
+        self.assertEqual(ccs.resume_offset(src, part), 0)
+
+    def test_every_copy_mode_gives_the_same_bytes(self):
+        src = os.path.join(self.source, "Course A", "2.big.mp4")
+        for mode in ("copy_file_range", "sendfile", "buffered"):
+            if mode != "buffered" and not hasattr(os, mode):
+                continue
+            with self.subTest(mode=mode):
+                dst = os.path.join(self.dest, mode, "big.mp4")
+                batcher = ccs.FsyncBatcher()
+                written, _ = ccs.copy_file(src, dst, batcher, mode)
+                batcher.flush()
+                self.assertEqual(written, len(self.big))
+                self.assertEqual(read(dst), self.big)
+
+
+if __name__ == "__main__":
+    unittest.main()
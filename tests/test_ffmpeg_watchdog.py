@@ -0,0 +1,116 @@
+import os
+import stat
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import ap_core
+import downloader
+
+# Stands in for ffmpeg: logs each run, then hangs (with a child, like
+# ffmpeg's network helpers) or exits with an error
+FAKE_FFMPEG = f"""#!{sys.executable}
+import os, subprocess, sys, time
+log = os.environ["FAKE_FFMPEG_LOG"]
+if os.environ["FAKE_FFMPEG_MODE"] == "hang":
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+    with open(log, "a") as f:
+        f.write(f"{{os.getpid()}} {{child.pid}}\\n")
+    time.sleep(600)
+if os.environ["FAKE_FFMPEG_MODE"] == "encoders":
+    print(" V..... libx264              H.264\\n A..... aac                  AAC")
+    sys.exit(0)
+with open(log, "a") as f:
+    f.write(f"{{os.getpid()}}\\n")
+sys.exit(1)
+"""
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Killed but not reaped yet (the grandchild's parent is gone, init reaps it)
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@unittest.skipIf(os.name == "nt", "needs a POSIX shebang script")
+class FfmpegWatchdogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.binary = os.path.join(self.tmp.name, "ffmpeg")
+        with open(self.binary, "w") as f:
+            f.write(FAKE_FFMPEG)
+        os.chmod(self.binary, os.stat(self.binary).st_mode | stat.S_IEXEC)
+        self.log = os.path.join(self.tmp.name, "runs.log")
+        self.output = os.path.join(self.tmp.name, "out.mp4")
+        for patch in (
+            mock.patch.object(ap_core, "FFMPEG_BINARY", self.binary),
+            mock.patch.object(ap_core, "FFMPEG_BACKOFF_SECONDS", 0),
+            mock.patch.dict(os.environ, {"FAKE_FFMPEG_LOG": self.log}),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def runs(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return [[int(pid) for pid in line.split()] for line in f]
+
+    def test_hung_ffmpeg_is_killed_with_its_children_and_retried(self):
+        os.environ["FAKE_FFMPEG_MODE"] = "hang"
+        started = time.monotonic()
+        result = ap_core.run_ffmpeg(["ffmpeg", "-i", "x", self.output], self.output,
+                                    stall_seconds=1, retries=1)
+        self.assertFalse(result)
+        self.assertEqual((result.attempts, result.stalls), (2, 2))
+        self.assertIn("stalled", result.error)
+        self.assertLess(time.monotonic() - started, 30)
+
+        runs = self.runs()
+        self.assertEqual(len(runs), 2)
+        deadline = time.monotonic() + 5
+        while any(alive(pid) for run in runs for pid in run) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        for run in runs:
+            for pid in run:
+                self.assertFalse(alive(pid), f"process {pid} survived the watchdog")
+
+    def test_transfer_retries_failed_exits_unless_told_not_to(self):
+        os.environ["FAKE_FFMPEG_MODE"] = "fail"
+        self.assertEqual(ap_core.run_transfer(["ffmpeg", self.output], self.output, retries=2).attempts, 3)
+        self.assertEqual(ap_core.run_transfer(["ffmpeg", self.output], self.output, retries=2,
+                                              retry_errors=False).attempts, 1)
+
+    def test_failed_download_runs_ffmpeg_once_per_fetch_verified_attempt(self):
+        os.environ["FAKE_FFMPEG_MODE"] = "fail"
+        with mock.patch.object(ap_core, "FFMPEG_RETRIES", 2):
+            ok = downloader.fetch_verified("http://127.0.0.1:9/x.m3u8", self.output, "ffmpeg",
+                                           None, None, retries=2)
+        self.assertFalse(ok)
+        self.assertEqual(len(self.runs()), 3)
+
+
+    def test_configured_binary_does_the_work_not_the_one_on_path(self):
+        os.environ["FAKE_FFMPEG_MODE"] = "encoders"
+        with mock.patch.object(ap_core, "_encoders", {}):
+            self.assertEqual(ap_core.available_encoders(), {"libx264", "aac"})
+        os.environ["FAKE_FFMPEG_MODE"] = "fail"
+        pipe = ap_core.RemuxPipe(self.output)
+        self.assertFalse(pipe.close())
+        self.assertEqual(len(self.runs()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import ap_core
+from helpers import QuietHandler, serve
+
+SLOW_SECONDS = 3.0
+
+
+def origin(tag, slow=(), broken=(), trickle=()):
+    """
+    Segment server: answers '<tag>:<path>', stalls before the headers on
+    `slow` paths and in the middle of the body on `trickle` ones, 500s on
+    `broken` ones.
+    """
+    hits = []
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            name = self.path.rsplit("/", 1)[-1]
+            hits.append(name)
+            if name in broken:
+                return self.send_body(b"", status=500)
+            if name in slow:
+                time.sleep(SLOW_SECONDS)
+            body = f"{tag}:{name}".encode()
+            if name in trickle:
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:3])
+                self.wfile.flush()
+                time.sleep(SLOW_SECONDS)
+                self.wfile.write(body[3:])
+                return
+            self.send_body(body)
+
+    return Handler, hits
+
+
+def recording_http_get(attempts):
+    """ap_core.http_get that logs (url, seconds it ran, exception) of every call."""
+    real = ap_core.http_get
+
+    def http_get(url, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            data = real(url, *args, **kwargs)
+        except Exception as e:
+            attempts.append((url, time.monotonic() - started, e))
+            raise
+        attempts.append((url, time.monotonic() - started, None))
+        return data
+
+    return http_get
+
+
+class HedgedFetcherTest(unittest.TestCase):
+    def start(self, handler):
+        server = serve(handler)
+        base = server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        return base
+
+    def fetcher(self, primary, mirror, **kwargs):
+        fetcher = ap_core.HedgedFetcher(primary + "hls/", [mirror + "hls/"], **kwargs)
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    def warm_up(self, fetcher, primary, n=20):
+        for i in range(n):
+            fetcher.fetch(f"{primary}hls/warm{i}.ts")
+
+    def test_slow_segment_is_hedged_to_the_mirror(self):
+        primary_handler, _ = origin("primary", slow={"tail.ts"})
+        mirror_handler, mirror_hits = origin("mirror")
+        primary, mirror = self.start(primary_handler), self.start(mirror_handler)
+        fetcher = self.fetcher(primary, mirror)
+        self.warm_up(fetcher, primary)
+        self.assertEqual(mirror_hits, [])
+
+        started = time.monotonic()
+        data = fetcher.fetch(primary + "hls/tail.ts")
+        self.assertLess(time.monotonic() - started, SLOW_SECONDS / 2)
+        self.assertEqual(data, b"mirror:tail.ts")
+        self.assertEqual((fetcher.hedges, fetcher.hedge_wins), (1, 1))
+
+    def test_losing_attempts_give_up_their_thread_at_once(self):
+        for stall in ("slow", "trickle"):
+            with self.subTest(stall=stall):
+                primary_handler, _ = origin("primary", **{stall: {"tail.ts"}})
+                mirror_handler, _ = origin("mirror")
+                primary, mirror = self.start(primary_handler), self.start(mirror_handler)
+                fetcher = self.fetcher(primary, mirror)
+                self.warm_up(fetcher, primary)
+                attempts = []
+
+                with mock.patch.object(ap_core, "http_get", recording_http_get(attempts)):
+                    self.assertEqual(fetcher.fetch(primary + "hls/tail.ts"), b"mirror:tail.ts")
+                    deadline = time.monotonic() + SLOW_SECONDS
+                    while len(attempts) < 2 and time.monotonic() < deadline:
+                        time.sleep(0.02)
+                loser = [a for a in attempts if a[0].startswith(primary)]
+                self.assertEqual(len(loser), 1)
+                _, seconds, error = loser[0]
+                self.assertIsInstance(error, ap_core.CancelledFetch)
+                self.assertLess(seconds, SLOW_SECONDS / 2)
+
+    def test_no_hedging_before_there_is_a_latency_history(self):
+        primary_handler, _ = origin("primary", slow={"tail.ts"})
+        mirror_handler, mirror_hits = origin("mirror")
+        primary, mirror = self.start(primary_handler), self.start(mirror_handler)
+        fetcher = self.fetcher(primary, mirror)
+        self.assertEqual(fetcher.fetch(primary + "hls/tail.ts"), b"primary:tail.ts")
+        self.assertEqual((fetcher.hedges, mirror_hits), (0, []))
+
+    def test_failed_primary_fails_over_at_once(self):
+        primary_handler, _ = origin("primary", broken={"gone.ts"})
+        mirror_handler, _ = origin("mirror")
+        fetcher = self.fetcher(self.start(primary_handler), self.start(mirror_handler))
+        started = time.monotonic()
+        self.assertEqual(fetcher.fetch(fetcher.primary_base + "gone.ts"), b"mirror:gone.ts")
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_all_sources_failing_raises(self):
+        primary_handler, _ = origin("primary", broken={"gone.ts"})
+        mirror_handler, _ = origin("mirror", broken={"gone.ts"})
+        fetcher = self.fetcher(self.start(primary_handler), self.start(mirror_handler))
+        with self.assertRaises(IOError):
+            fetcher.fetch(fetcher.primary_base + "gone.ts")
+
+    def test_hedges_do_not_queue_behind_stuck_attempts(self):
+        workers = 4
+        stuck = {f"tail{i}.ts" for i in range(workers)}
+        primary_handler, _ = origin("primary", slow=stuck)
+        mirror_handler, _ = origin("mirror")
+        primary, mirror = self.start(primary_handler), self.start(mirror_handler)
+        fetcher = self.fetcher(primary, mirror, workers=workers)
+        self.warm_up(fetcher, primary)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            bodies = list(ex.map(fetcher.fetch, [f"{primary}hls/{name}" for name in sorted(stuck)]))
+        self.assertLess(time.monotonic() - started, SLOW_SECONDS / 2)
+        self.assertEqual(bodies, [f"mirror:{name}".encode() for name in sorted(stuck)])
+
+
+class InOrderTest(unittest.TestCase):
+    def test_yields_in_playlist_order_whatever_finishes_first(self):
+        delays = [0.3, 0.0, 0.2, 0.0, 0.1, 0.0, 0.05, 0.0]
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def fetch(uri):
+            with lock:
+                running.append(uri)
+                peak.append(len(running))
+            time.sleep(delays[int(uri)])
+            with lock:
+                running.remove(uri)
+            return uri.encode()
+
+        segments = [{"uri": str(i)} for i in range(len(delays))]
+        out = list(ap_core._in_order(fetch, segments, workers=3))
+        self.assertEqual(out, [str(i).encode() for i in range(len(delays))])
+        self.assertLessEqual(max(peak), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
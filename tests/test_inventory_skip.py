@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import downloader
+
+TASK = ("http://example.com/course/240p.m3u8", "1.Intro", "Course", None)
+
+
+class InventorySkipTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = mock.patch.object(downloader, "OUTPUT_ROOT", tmp.name)
+        root.start()
+        self.addCleanup(root.stop)
+        self.mp4 = downloader.task_paths(TASK)[2]
+        self.catalog = {"Course/1.Intro.mp4": True}
+
+    def download(self):
+        def fetch(url, mp4_path, *args):
+            with open(mp4_path, "wb") as f:
+                f.write(b"video")
+            return True
+
+        with mock.patch.object(downloader, "fetch_verified", side_effect=fetch) as fetched:
+            self.assertTrue(downloader.download_item(TASK, catalog=self.catalog))
+        return fetched.called
+
+    def test_complete_file_still_on_disk_is_skipped(self):
+        os.makedirs(os.path.dirname(self.mp4))
+        with open(self.mp4, "wb") as f:
+            f.write(b"old")
+        self.assertFalse(self.download())
+
+    def test_complete_file_deleted_since_the_scan_is_downloaded_again(self):
+        self.assertTrue(self.download())
+        self.assertTrue(os.path.exists(self.mp4))
+
+
+if __name__ == "__main__":
+    unittest.main()
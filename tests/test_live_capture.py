@@ -0,0 +1,79 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import ap_core
+from helpers import HAVE_FFMPEG, QuietHandler, make_fmp4_segments, serve
+
+
+def growing_playlist(init, segments, interval, endlist=True):
+    """Handler whose playlist lists one more segment every `interval` seconds."""
+    started = time.monotonic()
+
+    class Handler(QuietHandler):
+        def do_GET(self):
+            if self.path == "/init.mp4":
+                return self.send_body(init)
+            if self.path.startswith("/seg"):
+                return self.send_body(segments[int(self.path[4:].split(".")[0])])
+            listed = min(len(segments), 1 + int((time.monotonic() - started) / interval))
+            lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-TARGETDURATION:1",
+                     "#EXT-X-MEDIA-SEQUENCE:0", '#EXT-X-MAP:URI="init.mp4"']
+            for i in range(listed):
+                lines += ["#EXTINF:1.0,", f"seg{i}.m4s"]
+            if endlist and listed == len(segments):
+                lines.append("#EXT-X-ENDLIST")
+            self.send_body(("\n".join(lines) + "\n").encode(), content_type="application/vnd.apple.mpegurl")
+
+    return Handler
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "needs ffmpeg")
+class LiveCaptureTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fixtures = tempfile.TemporaryDirectory()
+        cls.init, cls.segments = make_fmp4_segments(cls.fixtures.name, seconds=6)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fixtures.cleanup()
+
+    def setUp(self):
+        self.out = tempfile.TemporaryDirectory()
+        self.mp4 = os.path.join(self.out.name, "live.mp4")
+
+    def tearDown(self):
+        self.out.cleanup()
+
+    def test_follows_playlist_until_endlist(self):
+        with serve(growing_playlist(self.init, self.segments, interval=0.4)) as base:
+            ok = ap_core.download_live(base + "index.m3u8", self.mp4, workers=2)
+        self.assertTrue(ok)
+        self.assertFalse(os.path.exists(ap_core.partial_path_for(self.mp4)))
+        self.assertAlmostEqual(ap_core.probe_duration(self.mp4), 6.0, delta=0.5)
+
+    def test_stop_event_ends_capture_from_another_thread(self):
+        stop = threading.Event()
+        result = {}
+        handler = growing_playlist(self.init, self.segments, interval=0.5, endlist=False)
+        with serve(handler) as base:
+            worker = threading.Thread(
+                target=lambda: result.setdefault("ok", ap_core.download_live(
+                    base + "index.m3u8", self.mp4, workers=2, stall_targets=60, stop=stop)))
+            worker.start()
+            time.sleep(1.5)
+            stop.set()
+            worker.join(timeout=10)
+        self.assertFalse(worker.is_alive())
+        self.assertTrue(result["ok"])
+        # Kept what was recorded before the stop, not the whole stream
+        duration = ap_core.probe_duration(self.mp4)
+        self.assertGreater(duration, 0)
+        self.assertLess(duration, 6.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
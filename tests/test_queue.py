@@ -0,0 +1,239 @@
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import ap_queue
+from ap_queue import Coordinator, QueueClient, make_handler
+from helpers import serve
+
+DOWNLOADER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "downloader.py")
+
+
+def tasks(n, prefix="http://example.com/v"):
+    return [{"url": f"{prefix}{i}.m3u8", "name": f"v{i}", "folder": "course"} for i in range(n)]
+
+
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "queue.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def coordinator(self, **kwargs):
+        coordinator = Coordinator(self.db_path, **kwargs)
+        self.addCleanup(coordinator.close)
+        return coordinator
+
+    def test_leases_in_the_order_tasks_were_added(self):
+        coordinator = self.coordinator()
+        batch = tasks(20)
+        # The URL digests are not in insertion order, so a hash tiebreak would show
+        self.assertNotEqual(sorted(ap_queue.task_id(t["url"]) for t in batch),
+                            [ap_queue.task_id(t["url"]) for t in batch])
+        coordinator.enqueue(batch[:10])
+        coordinator.enqueue(batch[5:])
+        names = [t["name"] for t in coordinator.lease("w", count=50)["tasks"]]
+        self.assertEqual(names, [t["name"] for t in batch])
+
+    def test_expired_lease_goes_back_to_the_queue(self):
+        coordinator = self.coordinator(lease_seconds=0.3, max_attempts=3)
+        coordinator.enqueue(tasks(1))
+        first = coordinator.lease("crashed")["tasks"][0]
+        self.assertEqual(coordinator.lease("other")["tasks"], [])
+        time.sleep(0.4)
+
+        second = coordinator.lease("other")["tasks"][0]
+        self.assertEqual(second["url"], first["url"])
+        self.assertFalse(coordinator.complete(first["lease"], True)["accepted"])
+        self.assertEqual(coordinator.complete(second["lease"], True), {"accepted": True, "state": "done"})
+        self.assertTrue(coordinator.lease("other")["drained"])
+
+    def test_task_is_parked_after_max_attempts(self):
+        coordinator = self.coordinator(lease_seconds=0.1, max_attempts=2)
+        coordinator.enqueue(tasks(1))
+        coordinator.lease("a")
+        time.sleep(0.2)
+        lease = coordinator.lease("b")["tasks"][0]["lease"]
+        self.assertEqual(coordinator.complete(lease, False, error="boom")["state"], "failed")
+        status = coordinator.status()
+        self.assertEqual(status["counts"], {"failed": 1})
+        self.assertEqual(status["failed"][0]["error"], "boom")
+
+
+class WorkersOverHttpTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def start(self, **kwargs):
+        coordinator = Coordinator(os.path.join(self.tmp.name, "queue.sqlite"), **kwargs)
+        self.addCleanup(coordinator.close)
+        server = serve(make_handler(coordinator, token="secret"))
+        base = server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        return coordinator, base
+
+    def client(self, base, name):
+        client = QueueClient(base, worker=name, token="secret")
+        self.addCleanup(client.close)
+        return client
+
+    def test_several_workers_share_the_queue_without_overlap(self):
+        coordinator, base = self.start()
+        self.client(base, "admin").enqueue(tasks(30))
+        done = {}
+        lock = threading.Lock()
+
+        def worker(name):
+            client = self.client(base, name)
+            while True:
+                reply = client.lease()
+                if not reply["tasks"]:
+                    if reply.get("drained"):
+                        return
+                    time.sleep(0.05)
+                    continue
+                t = reply["tasks"][0]
+                with lock:
+                    done.setdefault(t["url"], []).append(name)
+                self.assertTrue(client.complete(t["lease"], True, nbytes=1)["accepted"])
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+
+        self.assertEqual(sorted(done), sorted(t["url"] for t in tasks(30)))
+        self.assertTrue(all(len(workers) == 1 for workers in done.values()))
+        status = coordinator.status()
+        self.assertEqual(status["counts"], {"done": 30})
+        self.assertEqual(sum(w["done"] for w in status["workers"].values()), 30)
+
+    def test_bad_token_is_refused(self):
+        _, base = self.start()
+        with self.assertRaises(OSError):
+            QueueClient(base, token="wrong").status()
+
+    def test_heartbeat_keeps_a_lease_alive(self):
+        coordinator, base = self.start(lease_seconds=0.6)
+        coordinator.enqueue(tasks(1))
+        holder = self.client(base, "holder")
+        lease = holder.lease()["tasks"][0]["lease"]
+        time.sleep(1.5)
+        self.assertEqual(self.client(base, "other").lease()["tasks"], [])
+        self.assertTrue(holder.complete(lease, True)["accepted"])
+
+    def test_lost_lease_is_no_longer_renewed(self):
+        coordinator, base = self.start(lease_seconds=0.6)
+        coordinator.enqueue(tasks(1))
+        holder = self.client(base, "holder")
+        lease = holder.lease()["tasks"][0]["lease"]
+        # The holder was unreachable long enough for its lease to expire
+        with coordinator.db:
+            coordinator.db.execute("UPDATE tasks SET expires = 0")
+        self.assertEqual(len(self.client(base, "other").lease()["tasks"]), 1)
+
+        deadline = time.monotonic() + 5
+        while lease in holder._active and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertNotIn(lease, holder._active)
+        self.assertFalse(holder.complete(lease, True)["accepted"])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+# Stands in for ffmpeg in the worker processes: logs who fetched which URL,
+# takes a while, then writes the output file
+FAKE_FFMPEG = f"""#!{sys.executable}
+import os, sys, time
+args = sys.argv[1:]
+url = args[args.index("-i") + 1]
+with open(os.environ["FAKE_FFMPEG_LOG"], "a") as f:
+    f.write(f"{{os.getppid()}} {{url}}\\n")
+time.sleep(float(os.environ["FAKE_FFMPEG_DELAY"]))
+with open(args[-1], "wb") as f:
+    f.write(b"x" * 1000)
+"""
+
+
+@unittest.skipIf(os.name == "nt", "needs a POSIX shebang script")
+class DownloaderWorkerProcessesTest(unittest.TestCase):
+    """downloader.py --coordinator, run as separate worker processes."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        fake = os.path.join(self.tmp, "ffmpeg")
+        with open(fake, "w") as f:
+            f.write(FAKE_FFMPEG)
+        os.chmod(fake, os.stat(fake).st_mode | stat.S_IEXEC)
+        self.log = os.path.join(self.tmp, "runs.log")
+        self.env = dict(os.environ, AP_FFMPEG=fake, FAKE_FFMPEG_LOG=self.log, FAKE_FFMPEG_DELAY="0.3")
+
+    def start_coordinator(self, **kwargs):
+        coordinator = Coordinator(os.path.join(self.tmp, "queue.sqlite"), **kwargs)
+        self.addCleanup(coordinator.close)
+        server = serve(make_handler(coordinator))
+        base = server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        return coordinator, base
+
+    def spawn_worker(self, base, name):
+        workdir = os.path.join(self.tmp, name)
+        os.makedirs(workdir)
+        proc = subprocess.Popen(
+            [sys.executable, DOWNLOADER, "--coordinator", base, "--workers", "2", "--no-verify"],
+            cwd=workdir, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(lambda: proc.poll() is None and proc.kill())
+        return proc, workdir
+
+    def runs(self):
+        with open(self.log) as f:
+            return [line.split() for line in f]
+
+    def downloaded(self, workdir):
+        root = os.path.join(workdir, "output_videos")
+        return sorted(name for _, _, files in os.walk(root) for name in files if name.endswith(".mp4"))
+
+    def test_worker_processes_drain_the_queue_between_them(self):
+        coordinator, base = self.start_coordinator()
+        coordinator.enqueue(tasks(12))
+        workers = [self.spawn_worker(base, f"machine{i}") for i in range(2)]
+        for proc, _ in workers:
+            self.assertEqual(proc.wait(timeout=60), 0)
+
+        self.assertEqual(coordinator.status()["counts"], {"done": 12})
+        urls = [url for _, url in self.runs()]
+        self.assertEqual(sorted(urls), sorted(t["url"] for t in tasks(12)))
+        # Both machines took work, each into its own output_videos
+        files = [self.downloaded(workdir) for _, workdir in workers]
+        self.assertTrue(all(files))
+        self.assertEqual(sorted(files[0] + files[1]), sorted(f"{t['name']}.mp4" for t in tasks(12)))
+
+    def test_tasks_of_a_killed_worker_are_finished_by_the_other(self):
+        self.env["FAKE_FFMPEG_DELAY"] = "1"
+        coordinator, base = self.start_coordinator(lease_seconds=1.5)
+        coordinator.enqueue(tasks(6))
+        crashed, _ = self.spawn_worker(base, "crashed")
+        deadline = time.monotonic() + 20
+        while not (os.path.exists(self.log) and self.runs()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        crashed.kill()
+        crashed.wait()
+
+        survivor, workdir = self.spawn_worker(base, "survivor")
+        self.assertEqual(survivor.wait(timeout=60), 0)
+        self.assertEqual(coordinator.status()["counts"], {"done": 6})
+        self.assertEqual(self.downloaded(workdir), sorted(f"{t['name']}.mp4" for t in tasks(6)))
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import run_all
+
+MANIFEST = (
+    '# python downloader.py --folder "My Course" --file "my_course_manifest.jsonl"\n'
+    '{"url": "http://example.com/a/240p.m3u8", "name": "1.Intro", "folder": "My Course"}\n'
+    '# MISSING URL FOR: 2.Missing\n'
+    '{"url": "http://example.com/b/240p.m3u8", "name": "3.Outro", "folder": "My Course"}\n'
+)
+
+
+class ManifestCommandTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.manifest = os.path.join(self.dir, "my_course_manifest.jsonl")
+        with open(self.manifest, "w", encoding="utf-8") as f:
+            f.write(MANIFEST)
+        with open(os.path.join(self.dir, "old_course_command.txt"), "w", encoding="utf-8") as f:
+            f.write('python downloader.py \\\n  --folder "Old Course" \\\n  --url "http://example.com/c/240p.m3u8|1.A"')
+        open(os.path.join(self.dir, "notes.md"), "w").close()
+
+    def test_manifests_are_picked_up_next_to_command_files(self):
+        self.assertEqual(run_all.command_files(self.dir),
+                         ["my_course_manifest.jsonl", "old_course_command.txt"])
+
+    def test_manifest_runs_with_its_course_folder(self):
+        self.assertEqual(run_all.manifest_command(self.manifest),
+                         [sys.executable, run_all.DOWNLOADER, "--folder", "My Course", "--file", self.manifest])
+
+    def test_manifest_without_folders_runs_without_one(self):
+        with open(self.manifest, "w", encoding="utf-8") as f:
+            f.write("http://example.com/a/240p.m3u8|1.Intro\n")
+        self.assertEqual(run_all.manifest_command(self.manifest)[2:], ["--file", self.manifest])
+
+
+if __name__ == "__main__":
+    unittest.main()
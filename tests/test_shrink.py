@@ -0,0 +1,70 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+import zipfile
+
+SHRINK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "shrink book", "shrink.py")
+spec = importlib.util.spec_from_file_location("shrink", SHRINK)
+shrink = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(shrink)
+
+try:
+    import lxml  # noqa: F401
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+DOCUMENT = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:document xmlns:w="{shrink.W_NS}"><w:body>'
+    '<w:p><w:r><w:t>Kept</w:t></w:r></w:p>'
+    '<w:p></w:p>'
+    '<w:p><w:r><w:br w:type="page"/><w:t>After a break</w:t></w:r></w:p>'
+    '<w:sectPr/></w:body></w:document>'
+)
+
+
+class ShrinkZipTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.src = os.path.join(self.tmp.name, "book.docx")
+        with zipfile.ZipFile(self.src, "w") as z:
+            z.writestr(zipfile.ZipInfo("[Content_Types].xml", (2020, 1, 2, 3, 4, 6)), "<Types/>",
+                       compress_type=zipfile.ZIP_DEFLATED)
+            z.writestr(zipfile.ZipInfo(shrink.DOCUMENT_PART, (2020, 1, 2, 3, 4, 6)), DOCUMENT,
+                       compress_type=zipfile.ZIP_DEFLATED)
+            # Word deflates media too
+            z.writestr(zipfile.ZipInfo("word/media/image1.png", (2021, 5, 6, 7, 8, 10)),
+                       os.urandom(3 * 1024 * 1024), compress_type=zipfile.ZIP_DEFLATED)
+
+    def test_copy_entry_keeps_data_and_metadata(self):
+        out = os.path.join(self.tmp.name, "copy.zip")
+        with zipfile.ZipFile(self.src) as zin, zipfile.ZipFile(out, "w") as zout:
+            for info in zin.infolist():
+                shrink.copy_entry(zin, zout, info)
+
+        with zipfile.ZipFile(self.src) as a, zipfile.ZipFile(out) as b:
+            self.assertIsNone(b.testzip())
+            for x, y in zip(a.infolist(), b.infolist()):
+                self.assertEqual((x.filename, x.date_time, x.CRC), (y.filename, y.date_time, y.CRC))
+                self.assertEqual(a.read(x), b.read(y))
+            # Compressed media is stored, not deflated again; XML keeps its compression
+            self.assertEqual(b.getinfo("word/media/image1.png").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(b.getinfo(shrink.DOCUMENT_PART).compress_type, zipfile.ZIP_DEFLATED)
+
+    @unittest.skipUnless(HAVE_LXML, "needs lxml")
+    def test_shrink_docx_rewrites_only_the_document(self):
+        out = os.path.join(self.tmp.name, "small.docx")
+        stats = shrink.shrink_docx(self.src, out)
+        self.assertEqual(stats["page_breaks_removed"], 1)
+        self.assertEqual(stats["paragraphs_removed"], 1)
+        with zipfile.ZipFile(self.src) as a, zipfile.ZipFile(out) as b:
+            self.assertIsNone(b.testzip())
+            self.assertEqual(a.read("word/media/image1.png"), b.read("word/media/image1.png"))
+            self.assertNotIn(b"w:type=\"page\"", b.read(shrink.DOCUMENT_PART))
+
+
+if __name__ == "__main__":
+    unittest.main()